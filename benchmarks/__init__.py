@@ -0,0 +1,6 @@
+########################################
+# 性能测试工具：
+# generate.py：按指定规模生成与真实原始记录结构相同的测试数据（xlsm、图片、仪表性能数据、附加文档）
+# run.py：对生成的数据计时，运行结果保存为JSON，便于比较不同版本的性能
+# 需要在项目根目录下以模块方式运行，例如：python -m benchmarks.run
+########################################
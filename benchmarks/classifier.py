@@ -0,0 +1,320 @@
+import sys
+import time
+import random
+import logging
+import argparse
+import statistics
+from io import BytesIO
+from collections import Counter
+import openpyxl as xl
+from xlsx_reader import Area, open_reader, read_area
+from result_items import classify, result_table
+from benchmarks.generate import SCALES, write_results
+
+##########################################################
+# 检验结果的分类（result_items.classify）与原来的实现（多次遍历、字典）的比较：
+# 1、等价性：生成的原始记录和大量随机的行（包括各种不规范的数据），两种实现得到的 test_items
+#    （type、verdict、part、stub、counter 等所有字段）和“检验结果”表格（result_table）必须完全相同，否则返回非0；
+# 2、性能：比较两种实现的耗时。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.classifier --scale small large --cases 2000
+##########################################################
+log_show = logging.getLogger("report")
+
+RESULT_AREA = Area(min_row=2, max_row=None, min_col=1, max_col=7)
+# 随机生成行时各列的取值
+CHOICES = {
+    'num': ['第一部分', '第二部分', '1', '2', '1.1', '1.2.', '2.1.3', '$说明', '3', '*4', '5', ''],
+    'name': ['', '', '项目A', '项目B'],
+    'subname': ['', '', '子项a'],
+    'unit': ['', 'ms', '—'],
+    'require': ['', '要求', '图片 req.png'],
+    'result': ['', '通过', '10', '/', '--', '不支持', '图片 res.png'],
+    'comment': ['', '', '不合格', 'F', '说明'],
+}
+
+
+# 原来的实现（report_worker.Report.process_excel_data，图片处理由 resolve_images 代替），只用于比较
+def legacy_classify(data, resolve_images):
+    keys = ['num', 'name', 'subname', 'unit', 'require', 'result', 'comment', 'row']
+    lst = []  # 用于存储处理后的结果
+    for row in data:
+        lst.append(dict(zip(keys, row)))
+
+    # 1: 判断ti的类型：
+    i = 0  # 初始化指针
+    while i < len(lst):
+        if lst[i]['subname'] == '' and lst[i]['unit'] == '' and lst[i]['require'] == '':  # 标题或说明
+            if '$' in lst[i]['num']:
+                lst[i]['num'] = str(lst[i]['num']).replace('$', '')
+                lst[i]['type'] = 10  # 项目编号中含有'$'字符，不是标题，而是说明之类文字
+            else:
+                lst[i]['type'] = 2  # 为标题
+            i += 1  # 将指针向后移动
+        elif lst[i]['name'] and (not lst[i]['subname']):  # type = 11 or 12
+            if i == len(lst) - 1 or (i < len(lst) - 1 and lst[i + 1]['name']):  # 最后一个元素
+                lst[i]['type'] = 11
+                i += 1  # 将指针向后移动
+            else:
+                j = i + 1  # 初始化另一个指针
+                lst[i]['type'] = 12
+                while j < len(lst) and lst[j]['name'] == '' and lst[j]['subname'] == '':
+                    lst[j]['type'] = 120
+                    lst[j]['name'] = lst[i]['name']
+                    j += 1  # 将指针向后移动
+                i = j  # 将指针移动到下一个区间的起始位置
+        elif lst[i]['name'] and lst[i]['subname']:  # type=13
+            j = i + 1  # 初始化另一个指针
+            lst[i]['type'] = 13
+            while j < len(lst) and lst[j]['name'] == '' and lst[j]['subname']:
+                lst[j]['type'] = 130
+                lst[j]['name'] = lst[i]['name']
+                j += 1  # 将指针向后移动
+            i = j  # 将指针移动到下一个区间的起始位置
+        else:  # 如果该元组不符合以上任何一种情况,数据有误
+            lst[i]['type'] = 21
+            log_show.error(f"原始记录中第 {lst[i]['row']} 行的数据有误，请检查修改！")
+            i += 1  # 将指针向后移动
+
+    # 2：
+    # 判断检测要求和检验结果中是否有图片，以及图片路径是否合法
+    # 增加 verdict 字段：
+    for ti in lst:
+        if ti['type'] < 11:
+            ti['verdict'] = None
+        else:  # 该行不是标题
+            # 检查单位、标准要求及检验结果列是否有空白，如果有，提示后退出程序
+            if not all([ti['unit'], ti['require'], ti['result']]):
+                log_show.error(f"请检查原始记录中第 {ti['row']} 行，数据可能不完整！")
+
+            resolve_images(ti)
+
+            # # 根据序号（是否带*)判断是否为参考项目；根据 ’result‘ 填写 ’verdict‘
+            # verdict: ['合格', '不合格', '--', 'ref']  含义： ‘--’ 为不支持项
+            if ti['comment'] in ['不合格', 'F', 'Fail', 'Failed']:
+                ti['verdict'] = '不合格'
+            elif ti['result'] in ['/', '--', '不支持', '不适用', '允许不支持']:
+                ti['result'] = '不适用'
+                ti['verdict'] = '--'
+            elif '*' in ti['num']:
+                ti['verdict'] = 'ref'
+            else:
+                ti['verdict'] = '合格'
+
+    # 3: 增加 part 字段，判断标题层级：
+    part = 1
+    for ti in lst:
+        num = ti['num']
+        level = len(num.split('.')) if num.split('.')[-1] else (len(num.split('.')) - 1)
+        if ti['type'] < 10:
+            if '第一' in num:
+                ti['type'] = 0
+            elif '第二' in num:
+                ti['type'] = 0
+                part = 2
+            elif level < 2:  # 是一级标题
+                ti['type'] = 1
+            ti['counter'] = Counter()  # 所有的标题项都加入了‘counter’键，防止后续读取时出现‘key error’
+        ti['part'] = part
+
+    # 4: 增加 stub 字段，对于 stub 标题增加统计项目，并将全部未测试的标题项目删除；
+    # 测试项目中的num按照大排列重新编号
+    test_items = []
+    i = 0
+    seq = 1
+    while i < len(lst):
+        if i == len(lst) - 1:
+            lst[i]['stub'] = 0
+            test_items.append(lst[i])  # 最后一个元素直接加入结果列表
+            i += 1
+        elif lst[i]['type'] < 10 <= lst[i + 1]['type']:
+            j = i + 2
+            while j < len(lst) and lst[j]['type'] >= 10:
+                j += 1
+            cnt = Counter([cc['verdict'] for cc in lst[(i + 1):j]])
+            cnt['tested'] = cnt['合格'] + cnt['不合格'] + cnt['ref']  # 实测项目数 = 合格项目数 + 不合格项目数 + 参考项数
+            cnt['total'] = cnt['tested'] + cnt['--']  # 应测项目数 = 实测项目数 + 不支持项目数
+            if cnt['tested']:  # 有实际测试的项目时
+                lst[i]['counter'] = cnt
+                lst[i]['stub'] = 2
+                # 测试项目中的num按照大排列重新编号，参考项目序号前加“*”
+                ii = i + 1
+                while ii < j:
+                    if lst[ii]['type'] > 10:
+                        if lst[ii]['verdict'] == 'ref':
+                            lst[ii]['num'] = '*' + str(seq)
+                        else:
+                            lst[ii]['num'] = str(seq)
+                        seq += 1
+                    ii += 1
+                test_items.extend(lst[i:j].copy())
+            elif cnt['total']:  # 已测项目数为0，但应测项目数不为0的项目，stub赋值为1
+                lst[i]['counter'] = Counter()
+                lst[i]['stub'] = 1
+                test_items.append(lst[i])
+            else:  # 后面都是 type=10 的注释项目：
+                lst[i]['stub'] = 0
+                test_items.extend(lst[i:j].copy())
+            cnt = Counter()
+            i = j
+        else:
+            lst[i]['stub'] = 0
+            test_items.append(lst[i])  # 元素直接加入结果列表
+            i += 1
+
+    # 写入一级标题的统计数据：
+    i = 0
+    while i < len(test_items):
+        if test_items[i]['type'] == 1:  # 一级标题
+            j = i + 1
+            while j < len(test_items) and test_items[j]['type'] != 1:
+                j += 1
+            c1 = Counter([cc['verdict'] for cc in test_items[(i + 1):j] if cc['type'] > 10])
+            c1['tested'] = c1['合格'] + c1['不合格'] + c1['ref']  # 实测项目数 = 合格项目数 + 不合格项目数 + 参考项数
+            c1['total'] = c1['tested'] + c1['--'] if c1['tested'] else 0  # 应测项目数 = 实测项目数 + 不支持项目数
+            test_items[i]['counter'] = c1
+            i = j
+        else:
+            i += 1
+
+    return test_items
+
+
+def legacy_result_table(test_items):
+    # 初始化变量
+    tbl_result = []
+    tbl = {}
+    data_lst = []
+    i = 0
+    while i < len(test_items):
+        tbl['type'] = test_items[i]['type']
+        tbl['title'] = test_items[i]['name']
+        if tbl['type'] < 11:  # 标题或说明
+            tbl['num'] = test_items[i]['num']
+            tbl['data'] = []
+            i += 1
+        elif tbl['type'] == 11:
+            dic_temp = {key: test_items[i][key] for key in
+                        ['num', 'name', 'subname', 'unit', 'require', 'result', 'verdict', 'comment']}
+            if dic_temp['verdict'] == 'ref':
+                dic_temp['verdict'] = '--'
+            tbl['data'] = [dic_temp]
+            i += 1
+        elif tbl['type'] == 12 or tbl['type'] == 13:
+            j = i + 1
+            while j < len(test_items) and test_items[j]['type'] > 100:
+                j += 1
+            ii = i
+            while ii < j:
+                dic_temp = {key: test_items[ii][key] for key in
+                            ['num', 'name', 'subname', 'unit', 'require', 'result', 'verdict', 'comment']}
+                if dic_temp['verdict'] == 'ref':
+                    dic_temp['verdict'] = '--'
+                data_lst.append(dic_temp)
+                ii += 1
+            tbl['data'] = data_lst.copy()
+            data_lst = []
+            i = j
+
+        tbl_result.append(tbl.copy())
+        tbl = {}
+
+    return tbl_result
+
+
+# 两种实现共用的图片处理：只替换为标记，不查找文件
+def resolve_images(ti):
+    for key in ('require', 'result'):
+        if '图片' in ti[key]:
+            ti[key] = ('图片', ti[key].split('图片')[-1].strip())
+
+
+def record_rows(scale, seed=1):
+    wb = xl.Workbook()
+    write_results(wb.active, scale.items, ['result0.png'], random.Random(seed))
+    buffer = BytesIO()
+    wb.save(buffer)
+    reader = open_reader(buffer.getvalue())
+    try:
+        return read_area(reader, wb.active.title, RESULT_AREA)
+    finally:
+        reader.close()
+
+
+def random_rows(rnd, count):
+    rows = []
+    for row in range(2, 2 + count):
+        rows.append([rnd.choice(values) for values in CHOICES.values()] + [row])
+    return rows
+
+
+# 比较两种实现的结果，返回不同之处的说明（相同时为 None）
+def compare(rows):
+    old = legacy_classify([list(row) for row in rows], resolve_images)
+    new = classify([list(row) for row in rows], resolve_images)
+    old_items = [dict(ti) for ti in old]
+    new_items = [ti.as_dict() for ti in new]
+    if old_items != new_items:
+        for i, (a, b) in enumerate(zip(old_items, new_items)):
+            if a != b:
+                return f"第 {i} 项不同：{a} != {b}"
+        return f"项目数不同：{len(old_items)} != {len(new_items)}"
+    # 原来的表格生成遇到数据有误的行（type=21）时不会结束，这种情况只比较 test_items
+    if any(ti['type'] == 21 for ti in old_items):
+        return None
+    old_table = legacy_result_table(old_items)
+    if old_table != result_table(new):
+        return "“检验结果”表格不同"
+    return None
+
+
+def bench(rows, repeat):
+    times = {}
+    for name, func in (('原实现', legacy_classify), ('classify', classify)):
+        runs = []
+        for _ in range(repeat):
+            data = [list(row) for row in rows]
+            start = time.perf_counter()
+            func(data, resolve_images)
+            runs.append(time.perf_counter() - start)
+        times[name] = statistics.median(runs)
+    return times
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="检验结果分类的等价性检查和性能测试")
+    parser.add_argument('--scale', nargs='+', choices=SCALES.keys(), default=['small', 'large'])
+    parser.add_argument('--cases', type=int, default=2000, help="随机生成的检验结果数")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_show.disabled = True  # 随机数据中的错误行会输出大量日志
+    rnd = random.Random(args.seed)
+    failures = []
+    for case in range(args.cases):
+        rows = random_rows(rnd, rnd.randint(1, 40))
+        difference = compare(rows)
+        if difference:
+            failures.append((case, difference))
+    print(f"等价性：随机检验结果 {args.cases} 个，结果不同 {len(failures)} 个")
+    for case, difference in failures[:10]:
+        print(f"  第 {case} 个：{difference}")
+
+    print(f"{'数据':<14}{'行数':>8}{'原实现(ms)':>12}{'classify(ms)':>14}{'结果':>8}")
+    for name in args.scale:
+        rows = record_rows(SCALES[name], args.seed)
+        difference = compare(rows)
+        if difference:
+            failures.append((name, difference))
+        times = bench(rows, args.repeat)
+        print(f"{'原始记录 ' + name:<14}{len(rows):>8}{times['原实现'] * 1000:>12.1f}"
+              f"{times['classify'] * 1000:>14.1f}{'不同' if difference else '相同':>8}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+import sys
+import random
+import argparse
+from pathlib import Path
+from collections import namedtuple
+import openpyxl as xl
+from PIL import Image
+from docx import Document
+
+##########################################################
+# 生成性能测试用的原始记录：
+# 1、xlsm 中的sheet页及其布局与真实的原始记录模板一致（map、基本信息、检验结果、检验依据、检验人员、
+#    检验用仪表、传输性能、附件、检验样品照片）；
+# 2、images 目录下生成样品照片、检验结果中引用的图片和附件图片；data 目录下生成仪表导出的性能数据和附加文档；
+# 3、相同的参数和随机种子生成的数据完全相同，便于比较不同版本的性能。
+# 用法：python -m benchmarks.generate D:\bench\medium --items 300 --images 6
+##########################################################
+# 生成规模：检验项目数、样品照片数、检验依据条数、性能数据组数（最多5组）、附件图片数、附加文档数
+Scale = namedtuple("Scale", "items, images, criteria, perf, attach_images, attach_docs",
+                   defaults=(200, 4, 6, 1, 2, 2))
+
+# 预定义的规模
+SCALES = {
+    'small': Scale(items=50, images=2, criteria=3, perf=1, attach_images=1, attach_docs=1),
+    'medium': Scale(items=300, images=6, criteria=8, perf=2, attach_images=3, attach_docs=2),
+    'large': Scale(items=1500, images=12, criteria=12, perf=5, attach_images=8, attach_docs=4),
+}
+
+# 仪表类型：SPIRENT（TestCenter）和信而泰
+VENDORS = ('spirent', 'xinertai')
+
+# map 页中变量的中文名称和模板中的变量名
+MAP = [('报告编号', 'report_number'), ('委托单位', 'sender'), ('生产厂家', 'manufacturer'),
+       ('设备名称', 'equipment_type'), ('设备型号', 'equipment_model'), ('主检', 'tester'),
+       ('审核', 'auditor'), ('其他说明', 'toc_other'), ('拍摄时间', 'shooting_date'), ('拍摄地点', 'shooting_address')]
+BASIC_INFO = {'report_number': 'BG2025-001', 'sender': '测试委托单位', 'manufacturer': '测试设备技术有限公司',
+              'equipment_type': '路由器', 'equipment_model': 'BENCH-1000', 'tester': '张三', 'auditor': '李四',
+              'toc_other': '/'}
+FRAME_SIZES = (64, 128, 256, 512, 1024, 1280, 1518)
+RESULTS = ['通过', '通过', '通过', '通过', '不支持', '10']
+PHOTO_SIZE = (1600, 1200)
+
+
+# 生成一张近似照片的图片：低分辨率的随机色块放大后再保存，压缩后的大小与相机照片接近
+def make_photo(file, size=PHOTO_SIZE, rnd=random):
+    w, h = size
+    small = Image.frombytes('RGB', (w // 16, h // 16), rnd.randbytes((w // 16) * (h // 16) * 3))
+    small.resize(size, Image.BICUBIC).save(file, quality=90)
+
+
+def make_record(out_dir, scale=Scale(), vendor='spirent', seed=1, photo_size=PHOTO_SIZE):
+    rnd = random.Random(seed)
+    out_dir = Path(out_dir)
+    image_dir = out_dir / 'images'
+    data_dir = out_dir / 'data'
+    image_dir.mkdir(parents=True, exist_ok=True)
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    wb = xl.Workbook()
+    ws = wb.active
+    ws.title = 'map'
+    for row, (name, key) in enumerate(MAP, start=2):
+        ws.cell(row, 3, name)
+        ws.cell(row, 4, key)
+
+    ws = wb.create_sheet('基本信息')
+    for row, (name, key) in enumerate(MAP[:8], start=2):
+        ws.cell(row, 3, name)
+        ws.cell(row, 4, BASIC_INFO[key])
+    ws['D34'] = min(scale.criteria, 10)
+
+    ws = wb.create_sheet('检验样品照片')
+    ws.cell(2, 2, '拍摄时间')
+    ws.cell(2, 3, '2025-01-01')
+    ws.cell(3, 2, '拍摄地点')
+    ws.cell(3, 3, '北京')
+    for i in range(scale.images):
+        name = f'photo{i}.jpg'
+        make_photo(image_dir / name, photo_size, rnd)
+        ws.cell(6 + i, 2, f'样品照片{i + 1}')
+        ws.cell(6 + i, 3, name)
+        ws.cell(6 + i, 4, '是' if i % 3 == 2 else '否')
+    # 检验结果中引用的图片
+    result_images = []
+    for i in range(max(1, scale.items // 50)):
+        name = f'result{i}.png'
+        Image.new('RGB', (400, 300), (rnd.randrange(256), rnd.randrange(256), rnd.randrange(256))).save(
+            image_dir / name)
+        result_images.append(name)
+
+    ws = wb.create_sheet('检验依据')
+    for i in range(scale.criteria):
+        ws.cell(2 + i, 1, i + 1)
+        ws.cell(2 + i, 2, f'YD/T {1000 + i}-2020')
+        ws.cell(2 + i, 3, f'测试标准{i + 1}')
+
+    write_results(wb.create_sheet('检验结果'), scale.items, result_images, rnd)
+
+    ws = wb.create_sheet('检验人员')
+    ws.cell(2, 1, '第一部分')
+    ws.cell(2, 2, '网络信息安全')
+    for i in range(1, 4):
+        ws.cell(2 + i, 1, f'{i}')
+        ws.cell(2 + i, 2, f'一级标题{i}')
+        ws.cell(2 + i, 3, BASIC_INFO['tester'])
+        ws.cell(2 + i, 4, BASIC_INFO['auditor'])
+        ws.cell(2 + i, 5, '2025-01-02')
+
+    ws = wb.create_sheet('检验用仪表')
+    for i in range(3):
+        for col in range(1, 12):
+            ws.cell(2 + i, col, f'仪表{i + 1}-{col}')
+        ws.cell(2 + i, 10, '正常')
+
+    ws = wb.create_sheet('传输性能')
+    for i in range(min(scale.perf, 5)):
+        main, light = f'perf{i}.xlsx', f'light{i}.xlsx'
+        ws.cell(3 + i, 2, f'性能测试{i + 1}')
+        ws.cell(3 + i, 3, main)
+        ws.cell(3 + i, 4, light)
+        ws.cell(3 + i, 5, '2')
+        make_performance(data_dir / main, data_dir / light, vendor, rnd)
+
+    ws = wb.create_sheet('附件')
+    for i in range(min(scale.attach_images, 18)):
+        name = f'attach{i}.png'
+        Image.new('RGB', (800, 600), (10, 200 - i * 10, 10)).save(image_dir / name)
+        ws.cell(3 + i, 2, f'附图{i + 1}')
+        ws.cell(3 + i, 3, f'附图名称{i + 1}')
+        ws.cell(3 + i, 4, name)
+    for i in range(min(scale.attach_docs, 8)):
+        name = f'attach{i}.docx'
+        make_attach_document(data_dir / name, i)
+        ws.cell(23 + i, 2, f'附件{i + 1}')
+        ws.cell(23 + i, 3, f'附件名称{i + 1}')
+        ws.cell(23 + i, 4, name)
+        ws.cell(23 + i, 5, '是' if i % 2 else '否')
+
+    file = out_dir / 'record.xlsm'
+    wb.save(file)
+    return file
+
+
+# 检验结果：两个部分，每个一级标题下两个二级标题，每个二级标题下2~6个检验项目，
+# 项目类型包括单行（type 11）、多行（type 12）、多个子项（type 13），少量参考项目（*）、说明文字（$）和图片
+def write_results(ws, items, result_images, rnd):
+    row = 2
+
+    def write(*values):
+        nonlocal row
+        for col, value in enumerate(values, start=1):
+            if value:
+                ws.cell(row, col, value)
+        row += 1
+
+    def result():
+        if rnd.random() < 0.03:
+            return f'图片 {rnd.choice(result_images)}'
+        return rnd.choice(RESULTS)
+
+    write('第一部分', '网络信息安全')
+    count = 0
+    head = 0
+    while count < items:
+        head += 1
+        if head == max(2, items // 40):
+            write('第二部分', '性能测试')
+        write(f'{head}', f'一级标题{head}')
+        for sub in range(1, 3):
+            write(f'{head}.{sub}', f'二级标题{head}.{sub}')
+            if rnd.random() < 0.1:
+                write(f'$说明{head}.{sub}', '说明文字')
+            for _ in range(rnd.randint(2, 6)):
+                count += 1
+                num = f'*{count}' if rnd.random() < 0.05 else str(count)
+                require = '图片 1.png' if rnd.random() < 0.02 else f'检验要求{count}'
+                kind = rnd.random()
+                if kind < 0.6:
+                    write(num, f'检验项目{count}', '', '—', require, result())
+                elif kind < 0.8:
+                    write(num, f'检验项目{count}', '', 'ms', require, result())
+                    write('', '', '', 'ms', f'检验要求{count}-2', result())
+                else:
+                    write(num, f'检验项目{count}', '子项a', 'ms', require, result())
+                    write('', '', '子项b', 'ms', f'检验要求{count}-b', result(), '不合格' if rnd.random() < 0.05 else '')
+
+
+# 仪表导出的性能数据：吞吐量汇总表、高级汇总表（吞吐量下的时延、线速丢帧率），以及单独的轻载时延文件
+# ports：端口（流）数，多端口测试时每个端口都有一组各帧长的数据
+def make_performance(main, light, vendor='spirent', rnd=random, ports=1):
+    if vendor not in VENDORS:
+        raise ValueError(f"不支持的仪表类型：{vendor}，可选：{'、'.join(VENDORS)}")
+    summary, advanced = ('Test Summary Table', 'Advanced Test Summary Ta') if vendor == 'spirent' \
+        else ('测试汇总表', '高级测试汇总表')
+
+    wb = xl.Workbook()
+    ws = wb.active
+    ws.title = summary
+    loads = []
+    sizes = FRAME_SIZES * ports
+    for i, size in enumerate(sizes):
+        load = round(100 - rnd.randint(0, 8) * 0.125, 3)
+        loads.append(load)
+        row = 5 + i
+        if vendor == 'spirent':
+            # C：帧长，F：吞吐量（%），G：吞吐量（Mbps）；A、D：帧长和时延
+            ws.cell(row, 1, size)
+            ws.cell(row, 3, size)
+            ws.cell(row, 4, round(10 + rnd.random() * 5, 3))
+            ws.cell(row, 6, load)
+            ws.cell(row, 7, round(10000 * load / 100, 3))
+        else:
+            # A：帧长，D：吞吐量（%），E：吞吐量（Mbps）
+            ws.cell(row, 1, size)
+            ws.cell(row, 4, load)
+            ws.cell(row, 5, round(10000 * load / 100, 3))
+    ws = wb.create_sheet(advanced)
+    row = 5
+    for size, load in zip(sizes, loads):
+        for offered in sorted({100, load}, reverse=True):
+            ws.cell(row, 1, size)
+            ws.cell(row, 2, offered)
+            ws.cell(row, 3, offered)
+            ws.cell(row, 4, 0 if offered == load else round(rnd.random() / 10, 4))
+            ws.cell(row, 6, round(3 + rnd.random() * 20, 3))
+            row += 1
+    wb.save(main)
+
+    wb = xl.Workbook()
+    ws = wb.active
+    ws.title = summary
+    for i, size in enumerate(sizes):
+        ws.cell(5 + i, 1, size)
+        ws.cell(5 + i, 4, round(2 + rnd.random() * 3, 3))
+    wb.save(light)
+
+
+def make_attach_document(file, index):
+    doc = Document()
+    doc.add_heading(f'附件文档{index + 1}', 1)
+    for i in range(20):
+        doc.add_paragraph(f'附件内容第{i + 1}段。' * 10)
+    table = doc.add_table(rows=10, cols=4)
+    for r, row in enumerate(table.rows):
+        for c, cell in enumerate(row.cells):
+            cell.text = f'{r}-{c}'
+    doc.save(file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="生成性能测试用的原始记录")
+    parser.add_argument('out_dir', help="输出目录")
+    parser.add_argument('--scale', choices=SCALES.keys(), help="预定义的规模，指定后忽略其他规模参数")
+    for field, default in zip(Scale._fields, Scale._field_defaults.values()):
+        parser.add_argument(f"--{field.replace('_', '-')}", type=int, default=default)
+    parser.add_argument('--vendor', choices=VENDORS, default='spirent', help="性能数据的仪表类型")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scale = SCALES[args.scale] if args.scale else Scale(*(getattr(args, f) for f in Scale._fields))
+    print(make_record(args.out_dir, scale, args.vendor, args.seed))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,53 @@
+import sys
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+from instrument_parsers import read_performance
+from benchmarks.generate import VENDORS, FRAME_SIZES, make_performance
+
+##########################################################
+# 仪表性能数据解析的性能测试：生成不同端口数的RFC 2544导出文件，计时 read_performance
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.parsers --ports 1 16 64 --repeat 5
+##########################################################
+
+
+def bench(vendor, ports, repeat, seed=1):
+    with tempfile.TemporaryDirectory(prefix='report_parsers_') as tmp:
+        main, light = Path(tmp, 'perf.xlsx'), Path(tmp, 'light.xlsx')
+        make_performance(main, light, vendor, random.Random(seed), ports=ports)
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = read_performance(main, light)
+            times.append(time.perf_counter() - start)
+    throughput, latency, frame_loss, latency10, rows_read = result
+    if len(throughput) != len(FRAME_SIZES) * ports:
+        raise RuntimeError(f"{vendor} {ports} 端口：吞吐量只读取了 {len(throughput)} 行")
+    return {'vendor': vendor, 'ports': ports, 'rows': rows_read,
+            'median': statistics.median(times), 'min': min(times)}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="仪表性能数据解析的性能测试")
+    parser.add_argument('--ports', nargs='+', type=int, default=[1, 16, 64], help="端口数，可以指定多个")
+    parser.add_argument('--vendor', nargs='+', choices=VENDORS, default=list(VENDORS))
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    print(f"{'仪表':<10}{'端口数':>8}{'行数':>8}{'中位数(ms)':>12}{'最小(ms)':>12}")
+    for vendor in args.vendor:
+        for ports in args.ports:
+            r = bench(vendor, ports, args.repeat)
+            print(f"{r['vendor']:<10}{r['ports']:>8}{r['rows']:>8}{r['median'] * 1000:>12.1f}{r['min'] * 1000:>12.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
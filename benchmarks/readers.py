@@ -0,0 +1,80 @@
+import sys
+import time
+import random
+import argparse
+import statistics
+import tempfile
+from pathlib import Path
+from xlsx_reader import Area, READERS, read_area
+from benchmarks.generate import SCALES, make_record, make_performance
+
+##########################################################
+# 读取Excel表格的两个后端（stream、openpyxl）的比较：
+# 1、原始记录：打开工作簿并读取生成时用到的所有sheet页；
+# 2、仪表导出的性能数据：不使用表格记录的范围，读到数据结束。
+# 两个后端读取的结果必须完全相同，否则返回非0。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.readers --scale small large --ports 1 64 --repeat 5
+##########################################################
+RECORD_AREAS = [('map', Area(2, None, 3, 4)), ('基本信息', Area(2, None, 3, 4)), ('检验样品照片', Area(6, None, 2, 4)),
+                ('检验结果', Area(2, None, 1, 7)), ('检验依据', Area(2, None, 1, 3)), ('检验人员', Area(2, None, 1, 5)),
+                ('检验用仪表', Area(2, None, 1, 11)), ('传输性能', Area(3, 7, 2, 5)), ('附件', Area(3, 30, 2, 5))]
+PERF_AREAS = [('Test Summary Table', Area(5, None, 1, 7)), ('Advanced Test Summary Ta', Area(5, None, 1, 6))]
+
+
+def read_all(backend, file, areas, use_dimension):
+    reader = READERS[backend](file)
+    try:
+        return [read_area(reader, sheet, area, use_dimension) for sheet, area in areas if reader.has_sheet(sheet)]
+    finally:
+        reader.close()
+
+
+# 返回 {后端: 耗时的中位数}，以及两个后端的结果是否相同
+def bench(file, areas, use_dimension, repeat):
+    times = {}
+    results = {}
+    for backend in READERS:
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            results[backend] = read_all(backend, file, areas, use_dimension)
+            runs.append(time.perf_counter() - start)
+        times[backend] = statistics.median(runs)
+    same = all(result == results['openpyxl'] for result in results.values())
+    return times, same, sum(len(rows) for rows in results['openpyxl'])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="读取Excel表格的后端比较")
+    parser.add_argument('--scale', nargs='+', choices=SCALES.keys(), default=['small', 'large'])
+    parser.add_argument('--ports', nargs='+', type=int, default=[1, 64], help="仪表数据的端口数")
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='report_readers_') as tmp:
+        tmp = Path(tmp)
+        for name in args.scale:
+            record = make_record(tmp / name, SCALES[name])
+            cases.append((f"原始记录 {name}", record, RECORD_AREAS, True))
+        for ports in args.ports:
+            main_file = tmp / f'perf_{ports}.xlsx'
+            make_performance(main_file, tmp / f'light_{ports}.xlsx', 'spirent', random.Random(1), ports=ports)
+            cases.append((f"性能数据 {ports}端口", main_file, PERF_AREAS, False))
+
+        failed = False
+        print(f"{'数据':<16}{'行数':>8}" + ''.join(f"{b + '(ms)':>16}" for b in READERS) + f"{'加速比':>10}{'结果':>8}")
+        for title, file, areas, use_dimension in cases:
+            times, same, rows = bench(file, areas, use_dimension, args.repeat)
+            failed |= not same
+            print(f"{title:<16}{rows:>8}" + ''.join(f"{times[b] * 1000:>16.1f}" for b in READERS) +
+                  f"{times['openpyxl'] / times['stream']:>10.2f}{'相同' if same else '不同':>8}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
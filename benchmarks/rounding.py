@@ -0,0 +1,134 @@
+import sys
+import math
+import time
+import random
+import argparse
+from fractions import Fraction
+from rounding import round_half_even, round_column
+
+##########################################################
+# 修约（四舍六入五成双）的正确性检查和性能测试：
+# 1、正确性：随机生成大量数值（重点是恰好“五”的情况、负数、科学计数法、浮点数输入），
+#    与基于分数的精确参考实现逐个比较，必须完全一致；
+# 2、性能：与原来基于浮点运算的实现比较逐个修约和按列修约的耗时，并统计原实现因浮点误差产生的错误。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.rounding --cases 200000 --seed 1
+##########################################################
+
+
+# 参考实现：用分数精确计算，结果格式与 round_half_even 相同
+def reference(num, poi=0):
+    value = Fraction(repr(num) if isinstance(num, float) else str(num).strip())
+    scaled = value * 10 ** poi
+    floor = math.floor(scaled)
+    rest = scaled - floor
+    if rest > Fraction(1, 2) or (rest == Fraction(1, 2) and floor % 2 == 1):
+        floor += 1
+    if poi == 0:
+        return floor
+    sign = '-' if floor < 0 else ''
+    digits = str(abs(floor)).rjust(poi + 1, '0')
+    return f"{sign}{digits[:-poi]}.{digits[-poi:]}"
+
+
+# 原来的实现（浮点运算），只用于比较
+def legacy(num, poi=0):
+    num = float(num)
+    num = num * pow(10, poi + 1)
+    num_fir = num % 10
+    num_sec = int(num / 10 % 10)
+    if num_fir < 5 or num_fir > 5:
+        if num_fir > 5:
+            num += 10
+    elif num_sec % 2 == 1:
+        num += 10
+    num = float(math.trunc((num - num_fir) / 10))
+    num = num / pow(10, poi)
+    if poi == 0:
+        return round(num)
+    return format(num, '.' + str(poi) + 'f')
+
+
+# 随机生成一个待修约的值和保留的小数位数
+def random_case(rnd):
+    poi = rnd.choice((0, 1, 2, 3))
+    kind = rnd.random()
+    if kind < 0.4:  # 恰好在修约位的下一位是5（可能带有更多位）
+        digits = rnd.randint(0, 10 ** 6) * 10 + 5
+        places = poi + 1
+        if rnd.random() < 0.3:
+            extra = rnd.randint(1, 4)
+            digits = digits * 10 ** extra + rnd.randint(0, 10 ** extra - 1)
+            places += extra
+        text = str(digits).rjust(places + 1, '0')
+        value = f"{text[:-places]}.{text[-places:]}"
+    elif kind < 0.7:  # 一般的小数
+        places = rnd.randint(0, 6)
+        value = f"{rnd.randint(0, 10 ** 8) / 10 ** places:.{places}f}"
+    elif kind < 0.8:  # 浮点数输入（单元格中的数字）
+        value = round(rnd.uniform(0, 10000), rnd.randint(0, 5))
+    elif kind < 0.9:  # 科学计数法
+        value = f"{rnd.randint(1, 99999)}e{rnd.randint(-8, 3)}"
+    else:  # 负数
+        value = f"-{rnd.randint(0, 10 ** 6) / 1000:.3f}"
+    if isinstance(value, str) and rnd.random() < 0.2:
+        value = f" {value} "  # 单元格中带空格
+    return value, poi
+
+
+def check(cases, seed=1):
+    rnd = random.Random(seed)
+    failures = []
+    for _ in range(cases):
+        value, poi = random_case(rnd)
+        expected = reference(value, poi)
+        got = round_half_even(value, poi)
+        if got != expected:
+            failures.append((value, poi, expected, got))
+    return failures
+
+
+def bench(cases, seed=1):
+    rnd = random.Random(seed)
+    # 仪表数据的特点：同一列中有大量重复值（帧长、负载、丢帧率等）
+    frames = [str(rnd.choice((64, 128, 256, 512, 1024, 1280, 1518))) for _ in range(cases)]
+    delays = [f"{rnd.uniform(1, 30):.4f}" for _ in range(cases)]
+    results = {}
+    for name, column in (('帧长', frames), ('时延', delays)):
+        poi = 0 if name == '帧长' else 2
+        start = time.perf_counter()
+        old = [legacy(v, poi) for v in column]
+        t_legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        [round_half_even(v, poi) for v in column]
+        t_scalar = time.perf_counter() - start
+        start = time.perf_counter()
+        new = round_column(column, poi)
+        t_column = time.perf_counter() - start
+        wrong = sum(a != b for a, b in zip(old, new))
+        results[name] = (t_legacy, t_scalar, t_column, wrong)
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="修约的正确性检查和性能测试")
+    parser.add_argument('--cases', type=int, default=200000, help="随机检查的数值个数")
+    parser.add_argument('--seed', type=int, default=1)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    failures = check(args.cases, args.seed)
+    print(f"正确性：检查 {args.cases} 个数值，与参考实现不一致 {len(failures)} 个")
+    for value, poi, expected, got in failures[:10]:
+        print(f"  {value!r} 保留 {poi} 位：应为 {expected!r}，结果为 {got!r}")
+
+    print(f"{'列':<6}{'原实现(ms)':>12}{'逐个(ms)':>12}{'按列(ms)':>12}{'原实现错误':>12}")
+    for name, (t_legacy, t_scalar, t_column, wrong) in bench(args.cases, args.seed).items():
+        print(f"{name:<6}{t_legacy * 1000:>12.1f}{t_scalar * 1000:>12.1f}{t_column * 1000:>12.1f}{wrong:>12}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
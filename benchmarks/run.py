@@ -0,0 +1,171 @@
+import sys
+import json
+import time
+import shutil
+import logging
+import platform
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from report_worker import Report, CRITICAL_ERROR
+from word_fields import NullFieldBackend
+from benchmarks.generate import SCALES, VENDORS, make_record
+
+##########################################################
+# 性能测试：对不同规模的原始记录计时 Report.generate_report（端到端及各阶段）
+# 1、Word更新域使用 NullFieldBackend 代替，不需要安装Word，结果只反映本程序的耗时；
+# 2、每次运行都使用一份新的测试数据（生成过程会重命名原始记录、创建输出目录）；
+# 3、结果保存为JSON，可以使用 --compare 比较两次运行（例如两个版本）的结果。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.run --scale small medium --repeat 3
+#   python -m benchmarks.run --compare benchmarks/results/old.json benchmarks/results/new.json
+##########################################################
+logger = logging.getLogger("report")
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+DOCUMENTS = {'record': [False], 'report': [True], 'both': [True, False]}
+
+
+# 运行一次：返回每个文档的端到端耗时和各阶段耗时
+def run_once(fixture, work_dir, task):
+    shutil.copytree(fixture, work_dir)
+    report = Report(work_dir / 'record.xlsm', task_type=2, is_revision_mode=True,
+                    field_backend=NullFieldBackend(), trace_dir=work_dir / 'trace')
+    documents = []
+    try:
+        for is_report in DOCUMENTS[task]:
+            report.is_report = is_report
+            start = time.perf_counter()
+            result = report.generate_report()
+            wall = time.perf_counter() - start
+            if result == CRITICAL_ERROR:
+                raise RuntimeError(f"生成{report.doc_name}失败，请使用 -v 查看日志")
+            trace = report.trace.to_dict()
+            documents.append({'name': report.doc_name, 'wall': wall, 'stages': trace['stages'],
+                              'counters': trace['counters']})
+    finally:
+        report.close_session()
+    return documents
+
+
+# 多次运行的结果汇总：端到端耗时取最小值、中位数和平均值，各阶段耗时取中位数
+def summarize(runs):
+    summary = []
+    for docs in zip(*runs):
+        walls = [d['wall'] for d in docs]
+        stages = {}
+        for d in docs:
+            for s in d['stages']:
+                stages.setdefault(s['stage'], {'wall': [], 'cpu': []})
+                stages[s['stage']]['wall'].append(s['wall'])
+                stages[s['stage']]['cpu'].append(s['cpu'])
+        summary.append({
+            'name': docs[0]['name'],
+            'wall': {'min': round(min(walls), 4), 'median': round(statistics.median(walls), 4),
+                     'mean': round(statistics.mean(walls), 4), 'runs': [round(w, 4) for w in walls]},
+            'stages': {name: {'wall': round(statistics.median(v['wall']), 4),
+                              'cpu': round(statistics.median(v['cpu']), 4)}
+                       for name, v in stages.items()},
+            'counters': docs[0]['counters'],
+        })
+    return summary
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=Path(__file__).parent, check=True).stdout.strip()
+    except Exception:
+        return ''
+
+
+def run_benchmarks(scales, task='both', repeat=3, vendor='spirent', seed=1, warmup=True):
+    results = []
+    with tempfile.TemporaryDirectory(prefix='report_bench_') as tmp:
+        tmp = Path(tmp)
+        for name in scales:
+            fixture = tmp / f'fixture_{name}'
+            start = time.perf_counter()
+            make_record(fixture, SCALES[name], vendor, seed)
+            print(f"[{name}] 生成测试数据 {SCALES[name]}，耗时 {time.perf_counter() - start:.1f} 秒", file=sys.stderr)
+            if warmup:
+                # 第一次运行包含模块导入、模板解析等一次性开销，不计入结果
+                run_once(fixture, tmp / f'{name}_warmup', task)
+            runs = []
+            for i in range(repeat):
+                runs.append(run_once(fixture, tmp / f'{name}_{i}', task))
+                print(f"[{name}] 第 {i + 1} 次：" + '，'.join(f"{d['name']} {d['wall']:.3f} 秒" for d in runs[-1]),
+                      file=sys.stderr)
+            results.append({'scale': name, 'params': SCALES[name]._asdict(), 'documents': summarize(runs)})
+    return {
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'task': task,
+        'vendor': vendor,
+        'repeat': repeat,
+        'results': results,
+    }
+
+
+# 比较两次运行的结果：按规模、文档输出端到端耗时的中位数及变化
+def compare(old_file, new_file):
+    old = json.loads(Path(old_file).read_text(encoding='utf-8'))
+    new = json.loads(Path(new_file).read_text(encoding='utf-8'))
+    old_docs = {(r['scale'], d['name']): d for r in old['results'] for d in r['documents']}
+    print(f"{'规模':<8}{'文档':<8}{old.get('revision') or '旧':>12}{new.get('revision') or '新':>12}{'变化':>10}")
+    for r in new['results']:
+        for d in r['documents']:
+            before = old_docs.get((r['scale'], d['name']))
+            if not before:
+                continue
+            a, b = before['wall']['median'], d['wall']['median']
+            print(f"{r['scale']:<8}{d['name']:<8}{a:>12.3f}{b:>12.3f}{(b - a) / a:>+10.1%}")
+            for stage, v in d['stages'].items():
+                if stage in before['stages']:
+                    a, b = before['stages'][stage]['wall'], v['wall']
+                    change = f"{(b - a) / a:>+10.1%}" if a else f"{'':>10}"
+                    print(f"{'':<8}  {stage:<30}{a:>8.3f}{b:>12.3f}{change}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="报告生成的性能测试")
+    parser.add_argument('--scale', nargs='+', choices=SCALES.keys(), default=['small', 'medium'],
+                        help="测试数据的规模，可以指定多个")
+    parser.add_argument('-t', '--type', choices=DOCUMENTS.keys(), default='both', help="生成的文档类型")
+    parser.add_argument('-n', '--repeat', type=int, default=3, help="每个规模运行的次数")
+    parser.add_argument('--vendor', choices=VENDORS, default='spirent', help="性能数据的仪表类型")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-warmup', action='store_true', help="不进行预热运行")
+    parser.add_argument('-o', '--output', help="结果文件，默认保存在 benchmarks/results 目录下")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="比较两个结果文件，不运行测试")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出生成过程的日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.compare:
+        compare(*args.compare)
+        return 0
+
+    logging.basicConfig(format='%(levelname)s %(message)s')
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    data = run_benchmarks(args.scale, args.type, args.repeat, args.vendor, args.seed, not args.no_warmup)
+
+    output = Path(args.output) if args.output else \
+        RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}_{data['revision'] or 'local'}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+    for r in data['results']:
+        for d in r['documents']:
+            print(f"{r['scale']:<8}{d['name']:<8} 中位数 {d['wall']['median']:.3f} 秒（最小 {d['wall']['min']:.3f} 秒）")
+    print(f"结果已保存到：{output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+import os
+import sys
+import time
+import shutil
+import logging
+import argparse
+import subprocess
+import tempfile
+from pathlib import Path
+from service import JobService, Job, OK, FINISHED
+from main_cli import TASK_TYPES
+from benchmarks.generate import SCALES, make_record
+
+##########################################################
+# 服务模式的吞吐量：同一批原始记录分别
+# 1、每个任务启动一个新的进程（python main_cli.py，相当于每个工程师在各自电脑上运行程序，包含导入模块等开销）；
+# 2、提交给服务的任务队列（service.JobService，不经过HTTP），工作进程数分别为 --workers 中的各个值，
+#    工作进程已预先启动（常驻服务的状态）；
+# 比较完成全部任务的耗时和吞吐量（每分钟任务数）；任一任务失败时返回非0。
+# Word更新域使用 none，不需要安装Word。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.service --scale small --jobs 8 --workers 1 2 4
+##########################################################
+ROOT = Path(__file__).resolve().parent.parent
+logger = logging.getLogger("report")
+
+
+# 准备 jobs 份测试数据，返回各原始记录
+def copies(fixture, work_dir, jobs):
+    records = []
+    for i in range(jobs):
+        shutil.copytree(fixture, work_dir / f'job{i}')
+        records.append(work_dir / f'job{i}' / 'record.xlsm')
+    return records
+
+
+# 每个任务一个新进程：返回 (总耗时, 失败数)
+def run_cold(records, task):
+    failed = 0
+    start = time.perf_counter()
+    for record in records:
+        proc = subprocess.run([sys.executable, 'main_cli.py', str(record), '--type', task, '--fields', 'none',
+                               '--summary', os.devnull], cwd=ROOT, capture_output=True)
+        failed += proc.returncode != 0
+    return time.perf_counter() - start, failed
+
+
+# 提交给任务队列：返回 (总耗时, 失败数, 统计)
+def run_service(records, task, workers, warmup):
+    service = JobService(workers=workers, log_level=logging.WARNING, fields='none')
+    service.start()
+    try:
+        job = service.submit(Job(warmup, TASK_TYPES[task], True))  # 等待工作进程启动并导入模块
+        while job.status not in FINISHED:
+            time.sleep(0.05)
+        start = time.perf_counter()
+        jobs = [service.submit(Job(record, TASK_TYPES[task], True)) for record in records]
+        while any(job.status not in FINISHED for job in jobs):
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        return elapsed, sum(job.status != OK for job in jobs), service.stats()
+    finally:
+        service.close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="服务模式与每个任务启动新进程的吞吐量比较")
+    parser.add_argument('--scale', choices=SCALES.keys(), default='small')
+    parser.add_argument('--jobs', type=int, default=8, help="任务数")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="服务的工作进程数")
+    parser.add_argument('-t', '--type', choices=TASK_TYPES.keys(), default='both')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(levelname)s %(message)s')
+    logger.setLevel(logging.WARNING)
+    failed = 0
+    with tempfile.TemporaryDirectory(prefix='report_service_') as tmp:
+        tmp = Path(tmp)
+        fixture = tmp / 'fixture'
+        make_record(fixture, SCALES[args.scale])
+        print(f"[{args.scale}] {args.jobs} 个任务，类型 {args.type}，CPU {os.cpu_count()} 个")
+        print(f"{'方式':<20}{'总耗时(s)':>10}{'每分钟任务数':>14}{'生成耗时p50(s)':>16}{'排队耗时p95(s)':>16}")
+
+        elapsed, errors = run_cold(copies(fixture, tmp / 'cold', args.jobs), args.type)
+        failed += errors
+        print(f"{'每个任务一个新进程':<20}{elapsed:>10.2f}{args.jobs * 60 / elapsed:>14.1f}{'':>16}{'':>16}")
+
+        for workers in args.workers:
+            warmup = copies(fixture, tmp / f'warmup{workers}', 1)[0]
+            records = copies(fixture, tmp / f'service{workers}', args.jobs)
+            elapsed, errors, stats = run_service(records, args.type, workers, warmup)
+            failed += errors
+            run, wait = stats['run'] or {'p50': 0.0}, stats['wait'] or {'p95': 0.0}  # 全部失败时没有生成耗时
+            print(f"{f'服务（{workers} 个工作进程）':<20}{elapsed:>10.2f}{args.jobs * 60 / elapsed:>14.1f}"
+                  f"{run['p50']:>16.2f}{wait['p95']:>16.2f}")
+    if failed:
+        print(f"{failed} 个任务失败")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
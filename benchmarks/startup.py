@@ -0,0 +1,117 @@
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+##########################################################
+# GUI启动耗时：
+# 1、窗口显示耗时：启动新的Python进程，导入 main_gui、创建窗口并显示（root.update）后，由本进程计时（包含解释器启动）；
+#    需要图形界面（Windows），无法显示窗口时只输出导入耗时；
+# 2、各模块的导入耗时：每个模块在新进程中使用 python -X importtime 单独导入，取累计耗时；
+#    report_worker 及 openpyxl、docxtpl 等只在生成进程中导入，列出以便比较。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.startup --repeat 5 --top 10
+##########################################################
+ROOT = Path(__file__).resolve().parent.parent
+MODULES = ['main_gui', 'job_process', 'tkinter', 'report_worker', 'openpyxl', 'docxtpl', 'docx',
+           'docxcompose.composer', 'win32com.client']
+
+# 在子进程中创建并显示窗口，输出 JSON：{'import': 导入 main_gui 的耗时, 'window': 显示窗口的耗时} 或 {'error': ...}
+WINDOW_SCRIPT = '''
+import json, time
+start = time.perf_counter()
+import tkinter as tk
+import main_gui
+imported = time.perf_counter()
+try:
+    root = tk.Tk()
+    app = main_gui.GUI(root, version=main_gui.VERSION)
+    root.update()
+    shown = time.perf_counter()
+    root.destroy()
+    print(json.dumps({'import': imported - start, 'window': shown - start}), flush=True)
+except tk.TclError as e:
+    print(json.dumps({'import': imported - start, 'error': str(e)}), flush=True)
+'''
+
+
+# 显示窗口一次：返回 (从启动进程到窗口显示的耗时或 None, 子进程中的结果)
+def first_window():
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, '-c', WINDOW_SCRIPT], cwd=ROOT, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline()
+    elapsed = time.perf_counter() - start
+    proc.communicate()
+    result = json.loads(line) if line.strip() else {'error': f'返回码 {proc.returncode}'}
+    return (None if 'error' in result else elapsed), result
+
+
+# python -X importtime 的输出：[(模块名, 自身耗时, 累计耗时, 层级)]，耗时单位为秒
+def import_times(module):
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'], cwd=ROOT,
+                          capture_output=True, text=True)
+    if proc.returncode:
+        return None
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(own) / 1e6, int(cumulative) / 1e6, (len(name) - len(name.lstrip())) // 2))
+    return rows
+
+
+# 单独导入 module 的累计耗时（取中位数），无法导入时返回 None
+def module_time(module, repeat):
+    runs = []
+    for _ in range(repeat):
+        rows = import_times(module)
+        if rows is None:
+            return None
+        runs.append(next(c for name, _, c, _ in reversed(rows) if name == module))
+    return statistics.median(runs)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="GUI启动耗时")
+    parser.add_argument('-n', '--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help="列出导入 main_gui 时耗时最多的模块数")
+    parser.add_argument('--modules', nargs='+', default=MODULES, help="单独计时的模块")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    windows, imports, error = [], [], None
+    for _ in range(args.repeat):
+        elapsed, result = first_window()
+        if 'import' in result:
+            imports.append(result['import'])
+        if elapsed is None:
+            error = result['error']
+        else:
+            windows.append(elapsed)
+    if windows:
+        print(f"窗口显示耗时（含解释器启动）：{statistics.median(windows):.3f} 秒")
+    else:
+        print(f"无法显示窗口（{error}），只统计导入耗时")
+    if imports:
+        print(f"导入 main_gui 耗时：{statistics.median(imports):.3f} 秒")
+
+    print("\n导入 main_gui 时耗时最多的模块（累计）：")
+    rows = import_times('main_gui') or []
+    for name, own, cumulative, depth in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"  {name:<40}{cumulative * 1000:>10.1f} ms")
+
+    print(f"\n{'模块':<24}{'单独导入(ms)':>14}")
+    for module in args.modules:
+        seconds = module_time(module, args.repeat)
+        print(f"{module:<24}" + (f"{seconds * 1000:>14.1f}" if seconds is not None else f"{'无法导入':>14}"))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+import sys
+import time
+import shutil
+import logging
+import zipfile
+import argparse
+import statistics
+import tempfile
+import tracemalloc
+from pathlib import Path
+from report_worker import Report, CRITICAL_ERROR, TABLE_WRITERS
+from word_fields import NullFieldBackend
+from benchmarks.generate import SCALES, make_record
+
+##########################################################
+# “检验结果”大表格两种生成方式（jinja、stream）的比较：
+# 1、对生成的原始记录分别用两种方式生成报告和记录，计时模板渲染阶段（render）和端到端耗时；
+# 2、--memory 时另外各运行一次，用 tracemalloc 统计生成过程中Python对象占用内存的峰值；
+# 3、两种方式生成的文档（docx中的每个文件）必须逐字节相同，否则返回非0。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.tables --scale large --items 5000 --repeat 3 --memory
+##########################################################
+logger = logging.getLogger("report")
+
+
+# 运行一次：返回 {文档名: (端到端耗时, 渲染耗时, 快速生成的行数, 输出文件)}
+def run_once(fixture, work_dir, writer):
+    shutil.copytree(fixture, work_dir)
+    report = Report(work_dir / 'record.xlsm', task_type=2, is_revision_mode=True, field_backend=NullFieldBackend(),
+                    trace_dir=work_dir / 'trace', table_writer=writer)
+    documents = {}
+    try:
+        for is_report in (True, False):
+            report.is_report = is_report
+            start = time.perf_counter()
+            if report.generate_report() == CRITICAL_ERROR:
+                raise RuntimeError(f"生成{report.doc_name}失败，请使用 -v 查看日志")
+            wall = time.perf_counter() - start
+            trace = report.trace.to_dict()
+            render = sum(s['wall'] for s in trace['stages'] if s['stage'] == 'render')
+            documents[report.doc_name] = (wall, render, trace['counters'].get('table_rows_fast', 0),
+                                          Path(report.output_name))
+    finally:
+        report.close_session()
+    return documents
+
+
+# 两个docx中内容不同的文件
+def docx_differences(a, b):
+    with zipfile.ZipFile(a) as za, zipfile.ZipFile(b) as zb:
+        names = sorted(set(za.namelist()) | set(zb.namelist()))
+        return [n for n in names if n not in za.namelist() or n not in zb.namelist() or za.read(n) != zb.read(n)]
+
+
+def peak_memory(fixture, work_dir, writer):
+    tracemalloc.start()
+    try:
+        run_once(fixture, work_dir, writer)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="“检验结果”表格两种生成方式的比较")
+    parser.add_argument('--scale', nargs='+', choices=SCALES.keys(), default=['medium', 'large'])
+    parser.add_argument('--items', type=int, help="检验项目数（代替规模中的设置）")
+    parser.add_argument('-n', '--repeat', type=int, default=3)
+    parser.add_argument('--memory', action='store_true', help="统计内存占用的峰值（较慢）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出生成过程的日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(levelname)s %(message)s')
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    failed = False
+    with tempfile.TemporaryDirectory(prefix='report_tables_') as tmp:
+        tmp = Path(tmp)
+        for name in args.scale:
+            scale = SCALES[name]._replace(items=args.items) if args.items else SCALES[name]
+            fixture = tmp / f'fixture_{name}'
+            make_record(fixture, scale)
+            run_once(fixture, tmp / f'{name}_warmup', 'stream')  # 模块导入、模板编译等一次性开销
+            results = {}
+            for writer in TABLE_WRITERS:
+                runs = [run_once(fixture, tmp / f'{name}_{writer}_{i}', writer) for i in range(args.repeat)]
+                memory = peak_memory(fixture, tmp / f'{name}_{writer}_memory', writer) if args.memory else None
+                results[writer] = (runs, memory)
+
+            print(f"[{name}] 检验项目 {scale.items} 个")
+            print(f"{'文档':<8}{'方式':<8}{'快速生成行数':>12}{'渲染(s)':>10}{'端到端(s)':>12}" +
+                  (f"{'内存峰值(MB)':>14}" if args.memory else ''))  # 内存峰值为报告+记录整个过程的峰值
+            for doc in results['jinja'][0][0]:
+                for writer, (runs, memory) in results.items():
+                    render = statistics.median(r[doc][1] for r in runs)
+                    wall = statistics.median(r[doc][0] for r in runs)
+                    print(f"{doc:<8}{writer:<8}{runs[0][doc][2]:>12}{render:>10.3f}{wall:>12.3f}" +
+                          (f"{memory / 2 ** 20:>14.1f}" if memory else ''))
+                differences = docx_differences(results['jinja'][0][0][doc][3], results['stream'][0][0][doc][3])
+                if differences:
+                    failed = True
+                    print(f"  {doc}：两种方式生成的文档不同：{'、'.join(differences)}")
+                else:
+                    print(f"  {doc}：两种方式生成的文档相同")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
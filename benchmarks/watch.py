@@ -0,0 +1,122 @@
+import sys
+import time
+import random
+import shutil
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+import openpyxl as xl
+from PIL import Image
+from report_worker import Report, ReuseState, CRITICAL_ERROR
+from word_fields import NullFieldBackend
+from benchmarks.generate import SCALES, make_record, make_performance
+from benchmarks.tables import docx_differences
+
+##########################################################
+# 监视模式的重新生成（report_worker.ReuseState）与完整生成的比较：
+# 先生成一次，再依次模拟以下修改，每次修改后分别：
+# 1、使用上次保留的内容重新生成（监视模式）；2、在同样修改过的另一份数据上完整生成（新的 Report）；
+# 比较两者的耗时；两种方式生成的文档（docx中的每个文件）必须逐字节相同，否则返回非0。
+# 为了比较生成的文档，两种方式都忽略生成结果的缓存（force）。
+# 用法（在项目根目录下运行）：
+#   python -m benchmarks.watch --scale medium large
+##########################################################
+logger = logging.getLogger("report")
+
+
+# 各种修改：参数为原始记录（会被重命名，每次都不同）
+def resave(xlsm_file):
+    xl.load_workbook(xlsm_file).save(xlsm_file)
+
+
+def edit_result(xlsm_file):
+    wb = xl.load_workbook(xlsm_file)
+    ws = wb['检验结果']
+    for row in range(2, ws.max_row + 1):
+        value = ws.cell(row, 6).value
+        if value and '图片' not in str(value):
+            ws.cell(row, 6, f'{value}（复测）')
+            break
+    wb.save(xlsm_file)
+
+
+def edit_image(xlsm_file):
+    Image.new('RGB', (400, 300), (1, 2, 3)).save(Path(xlsm_file).parent / 'images' / 'result0.png')
+
+
+def edit_data(xlsm_file):
+    data_dir = Path(xlsm_file).parent / 'data'
+    make_performance(data_dir / 'perf0.xlsx', data_dir / 'light0.xlsx', 'spirent', random.Random(99))
+
+
+def edit_model(xlsm_file):
+    wb = xl.load_workbook(xlsm_file)
+    ws = wb['基本信息']
+    for row in range(2, ws.max_row + 1):
+        if ws.cell(row, 3).value == '设备型号':
+            ws.cell(row, 4, f'{ws.cell(row, 4).value}-B')
+    wb.save(xlsm_file)
+
+
+CHANGES = [('重新保存原始记录', resave), ('修改检验结果', edit_result), ('修改结果中的图片', edit_image),
+           ('修改仪表数据', edit_data), ('修改设备型号（输出目录变化）', edit_model)]
+
+
+# 生成一次，返回 (耗时, 生成后的原始记录, {文档名: 输出文件})
+def run(xlsm_file, work_dir, reuse=None):
+    report = Report(xlsm_file, task_type=2, is_revision_mode=True, field_backend=NullFieldBackend(), force=True,
+                    trace_dir=work_dir / 'trace', reuse=reuse)
+    outputs = {}
+    start = time.perf_counter()
+    original = report.generate_report
+    def generate_report():  # 记录每个文档的输出文件
+        result = original()
+        outputs[report.doc_name] = Path(report.output_name)
+        return result
+    report.generate_report = generate_report
+    report.run()
+    if report.run_result == CRITICAL_ERROR:
+        raise RuntimeError(f"生成失败：{xlsm_file}，请使用 -v 查看日志")
+    return time.perf_counter() - start, report.xlsm_file, outputs
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="监视模式的重新生成与完整生成的比较")
+    parser.add_argument('--scale', nargs='+', choices=SCALES.keys(), default=['medium', 'large'])
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出生成过程的日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(format='%(levelname)s %(message)s')
+    logger.setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    failed = False
+    with tempfile.TemporaryDirectory(prefix='report_watch_') as tmp:
+        tmp = Path(tmp)
+        for name in args.scale:
+            watch_dir = tmp / f'{name}_watch'
+            xlsm_file = make_record(watch_dir, SCALES[name])
+            reuse = ReuseState()
+            seconds, xlsm_file, _ = run(xlsm_file, watch_dir, reuse)
+            print(f"[{name}] 第一次生成 {seconds:.2f} 秒")
+            print(f"{'修改':<24}{'监视模式(s)':>12}{'完整生成(s)':>12}{'加速比':>8}  结果")
+            for i, (title, change) in enumerate(CHANGES):
+                change(xlsm_file)
+                full_dir = tmp / f'{name}_full{i}'
+                shutil.copytree(watch_dir, full_dir)
+                full_xlsm = full_dir / xlsm_file.name
+                incremental, xlsm_file, watch_outputs = run(xlsm_file, watch_dir, reuse)
+                full, _, full_outputs = run(full_xlsm, full_dir)
+                differences = [f"{doc}：{'、'.join(docx_differences(file, full_outputs[doc]))}"
+                               for doc, file in watch_outputs.items() if docx_differences(file, full_outputs[doc])]
+                failed |= bool(differences)
+                print(f"{title:<24}{incremental:>12.2f}{full:>12.2f}{full / incremental:>8.2f}  " +
+                      ('文档相同' if not differences else '文档不同 ' + '；'.join(differences)))
+            reuse.clear()
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
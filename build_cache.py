@@ -0,0 +1,96 @@
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+
+########################################
+# 生成结果的缓存清单：原始记录及其引用的文件都没有变化时，直接使用上次生成的文档
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_hash(file):
+    digest = hashlib.sha256()
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# 生成一个文档的缓存记录：key 为与文件无关的输入（原始记录和模板的哈希、程序版本、生成选项等），
+# inputs 为通过 get_file 查找的所有文件（找不到的文件哈希为 None，之后添加了此文件时需要重新生成），
+# output 为生成的文档（记录其哈希，文档被修改后需要重新生成）
+def make_entry(key, inputs, output):
+    return {
+        'key': key,
+        'inputs': {str(file): file_hash(file) if Path(file).is_file() else None for file in inputs},
+        'output': str(output),
+        'output_hash': file_hash(output),
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+    }
+
+
+##########################################################
+# 缓存清单文件（JSON），保存在输出目录旁边，报告和记录各有一条记录：
+# {"documents": {"检验报告": {"key": {...}, "inputs": {文件: 哈希或null}, "output": 文件, "output_hash": 哈希}, ...}}
+##########################################################
+class BuildCache:
+    def __init__(self, manifest_file):
+        self.file = Path(manifest_file)
+        self.entries = {}
+        self._hashes = {}  # 同一任务中文件的哈希只计算一次
+        if self.file.exists():
+            try:
+                self.entries = json.loads(self.file.read_text(encoding='utf-8')).get('documents', {})
+            except (ValueError, OSError) as e:
+                log_show.warning(f"读取缓存清单失败，将重新生成：{e}")
+
+    def _hash(self, file):
+        file = str(file)
+        if file not in self._hashes:
+            self._hashes[file] = file_hash(file)
+        return self._hashes[file]
+
+    # 返回可以直接使用的输出文件；需要重新生成时返回None
+    def lookup(self, name, key):
+        entry = self.entries.get(name)
+        if not entry:
+            return None
+        if entry.get('key') != key:
+            changed = [k for k in key if entry['key'].get(k) != key[k]]
+            log_show.debug(f"{name}需要重新生成：{'、'.join(changed)} 已变化")
+            return None
+        output = Path(entry['output'])
+        if not output.exists() or file_hash(output) != entry['output_hash']:
+            log_show.debug(f"{name}需要重新生成：上次生成的文件已被删除或修改")
+            return None
+        for file, digest in entry['inputs'].items():
+            if digest is None:  # 上次生成时找不到的文件
+                if Path(file).is_file():
+                    log_show.debug(f"{name}需要重新生成：引用的文件“{file}”已添加")
+                    return None
+            elif not Path(file).exists() or self._hash(file) != digest:
+                log_show.debug(f"{name}需要重新生成：引用的文件“{file}”已变化")
+                return None
+        return output
+
+    def record(self, name, entry):
+        self.entries[name] = entry
+        self.save()
+
+    def discard(self, name):
+        if self.entries.pop(name, None) is not None:
+            self.save()
+
+    def save(self):
+        data = {'documents': self.entries}
+        tmp = self.file.with_name(self.file.name + '.tmp')
+        try:
+            tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+            tmp.replace(self.file)
+        except OSError as e:
+            log_show.warning(f"保存缓存清单失败：{e}")
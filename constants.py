@@ -0,0 +1,13 @@
+########################################
+# 各模块共用的常量（原在 report_worker.py 中定义，report_worker 中仍可导入）：
+# 此模块不导入其他模块，GUI进程启动时只需导入此模块，不必加载 openpyxl、docxtpl 等生成文档使用的模块
+########################################
+
+# 线程结束时发送到 log_queue
+TASK_FINISH = "##任务完成##"
+
+# 程序版本（显示在GUI标题中，版本变化后缓存的生成结果失效）
+VERSION = 'V20250723'
+
+# error Code
+CRITICAL_ERROR = 'critical'
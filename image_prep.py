@@ -0,0 +1,103 @@
+import os
+import math
+import logging
+import threading
+from pathlib import Path
+from collections import namedtuple
+from concurrent.futures import Future
+from PIL import Image, ImageOps
+from build_cache import file_hash
+from template_cache import default_cache_dir
+
+########################################
+# 插入Word之前对图片进行预处理：
+# 1、按图片在文档中的显示宽度和指定的DPI缩小图片（相机拍摄的照片通常有10~20MB，但在文档中只显示130mm或20mm宽）；
+# 2、按EXIF中的方向信息旋转图片（Word不识别EXIF方向，竖拍的照片会横着显示）；
+# 3、重新压缩：JPEG照片使用指定的质量重新压缩，其他格式（截图等）保存为优化过的PNG；
+# 4、处理结果按“原图内容的哈希 + 目标像素宽度 + 质量”保存在磁盘缓存中，再次生成时直接使用。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+# 默认的图片分辨率（打印质量足够，且明显小于相机原图）和JPEG压缩质量
+DEFAULT_IMAGE_DPI = 220
+JPEG_QUALITY = 85
+EMU_PER_INCH = 914400
+
+# 预处理的结果：插入文档使用的文件、原图大小、处理后大小（字节）
+PreparedImage = namedtuple("PreparedImage", "file, original_size, size")
+
+
+class ImagePreparer:
+    def __init__(self, dpi=DEFAULT_IMAGE_DPI, quality=JPEG_QUALITY, cache_dir=None):
+        self.dpi = dpi
+        self.quality = quality
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir('images')
+        # 同一进程中，同一图片、同一宽度只处理一次；多个线程同时处理同一图片时，后来的线程等待先开始的线程的结果
+        self._results = {}  # key -> Future
+        self._lock = threading.Lock()
+
+    # 返回插入文档时使用的图片；无需处理或处理失败时返回原图（可以在多个线程中同时调用）
+    def prepare(self, file, width):
+        file = Path(file)
+        stat = file.stat()
+        key = (str(file), int(width), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            future = self._results.get(key)
+            owner = future is None
+            if owner:
+                future = self._results[key] = Future()
+        if not owner:
+            return future.result()
+        try:
+            result = self._prepare(file, int(width), stat.st_size)
+        except Exception as e:
+            log_show.debug(f"图片“{file.name}”无法预处理，使用原图：{e}")
+            result = PreparedImage(file, stat.st_size, stat.st_size)
+        future.set_result(result)
+        return result
+
+    def _prepare(self, file, width, original_size):
+        original = PreparedImage(file, original_size, original_size)
+        # 目标像素宽度：显示宽度（英寸）× DPI
+        target = math.ceil(width / EMU_PER_INCH * self.dpi)
+        with Image.open(file) as img:
+            orientation = img.getexif().get(0x0112, 1)  # EXIF Orientation
+            if getattr(img, 'n_frames', 1) > 1:
+                return original  # 动画等多帧图片不处理
+            if img.width <= target and orientation in (0, 1):
+                return original
+            is_jpeg = img.format == 'JPEG'
+
+        suffix = '.jpg' if is_jpeg else '.png'
+        dest = self.cache_dir / f"{file_hash(file)[:40]}_{target}_{self.quality}{suffix}"
+        if not dest.exists():
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with Image.open(file) as img:
+                img = ImageOps.exif_transpose(img)
+                if img.width > target:
+                    height = max(1, round(img.height * target / img.width))
+                    img = img.resize((target, height), Image.LANCZOS)
+                tmp = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                if is_jpeg:
+                    img.convert('RGB').save(tmp, 'JPEG', quality=self.quality, optimize=True)
+                else:
+                    img.save(tmp, 'PNG', optimize=True)
+                tmp.replace(dest)
+
+        size = dest.stat().st_size
+        if size >= original_size and orientation in (0, 1):
+            return original  # 重新压缩后反而更大（原图已经足够小）
+        return PreparedImage(dest, original_size, size)
+
+
+# 进程内共用的图片预处理对象（按DPI和质量区分）
+_preparers = {}
+_preparers_lock = threading.Lock()
+
+
+def get_image_preparer(dpi=DEFAULT_IMAGE_DPI, quality=JPEG_QUALITY):
+    with _preparers_lock:
+        if (dpi, quality) not in _preparers:
+            _preparers[(dpi, quality)] = ImagePreparer(dpi, quality)
+        return _preparers[(dpi, quality)]
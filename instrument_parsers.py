@@ -0,0 +1,182 @@
+import sys
+import logging
+import importlib.util
+from pathlib import Path
+from collections import namedtuple
+from rounding import round_column
+from xlsx_reader import Area, DEFAULT_BACKEND, open_reader, read_area
+
+########################################
+# 仪表导出的性能数据（RFC 2544：吞吐量、吞吐量下的时延、线速丢帧率、轻载时延）的解析：
+# 1、按主文件中的sheet页名称识别仪表类型，每种仪表对应一个解析器；
+# 2、每个文件只打开一次，一次读取所需的所有sheet页；
+# 3、忽略表格中记录的行数（仪表生成的表格经常是A1:A1），一直读到数据真正结束的位置；
+# 4、新的仪表类型可以作为插件加入：在 plugins 目录下的 .py 文件中定义 InstrumentParser 的子类并用 register_parser 注册。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+# 要读取的区域：sheet页名称、起始行、起止列（不限制结束行）
+SheetArea = namedtuple("SheetArea", "sheet, min_row, min_col, max_col")
+
+# 插件目录：打包后为exe所在目录下的 plugins，否则为本文件所在目录下的 plugins
+if getattr(sys, 'frozen', False):
+    PLUGIN_DIR = Path(sys.executable).parent / 'plugins'
+else:
+    PLUGIN_DIR = Path(__file__).parent / 'plugins'
+
+
+##########################################################
+# 仪表解析器的基类，子类只需定义识别用的sheet页和各项数据所在的区域：
+# throughput：   每行 [帧长, ..., 吞吐量（%）, 吞吐量（Mbps）]，分别为区域内的第0、3、4列
+# latency：      每行 [帧长, 负载（%）, 吞吐量（%）, 丢帧率, ..., 时延]，分别为区域内的第0、1、2、3、5列
+# latency10：    轻载时延文件中，每行 [帧长, ..., 时延]，分别为区域内的第0、3列
+# 数据格式不同的仪表可以重写 parse
+##########################################################
+class InstrumentParser:
+    name = ''
+    signature = ()  # 主文件中必须包含的sheet页
+    throughput = None
+    latency = None
+    latency10 = None
+
+    def matches(self, sheetnames):
+        return bool(self.signature) and all(sheet in sheetnames for sheet in self.signature)
+
+    # 主文件需要读取的区域
+    def main_areas(self):
+        return [area for area in (self.throughput, self.latency) if area]
+
+    # main、light 为 {SheetArea: 行列表}，行的格式与 Report.get_excel_data 相同
+    # 返回 (吞吐量, 吞吐量下的时延, 线速丢帧率, 轻载时延)
+    def parse(self, main, light=None):
+        throughput = []
+        latency = []
+        frame_loss = []
+        log_show.info('读取性能数据中的吞吐量值')
+        rows = main.get(self.throughput)
+        throughput_set = set()
+        if rows:
+            throughput = [list(t) for t in zip(round_column(column(rows, 0)), round_column(column(rows, 4)),
+                                               round_column(column(rows, 3), 2))]
+            throughput_set = set(column(rows, 3))
+
+        log_show.info('读取性能数据中的吞吐量下时延和丢帧率')
+        rows = main.get(self.latency)
+        if rows:
+            frames = round_column(column(rows, 0))
+            losses = round_column(column(rows, 3), 3)
+            log_show.info('读取性能数据中的线速丢帧率')
+            loads = round_column(column(rows, 1))
+            frame_loss = [[frame, loss] for frame, loss, load in zip(frames, losses, loads) if load == 100]
+            # 读取吞吐量值在前面汇总的结果中、同时丢包率是0的数据：
+            log_show.info('读取性能数据中的时延')
+            selected = [i for i, row in enumerate(rows) if row[2] in throughput_set and losses[i] == '0.000']
+            delays = round_column((rows[i][5] for i in selected), 2)
+            latency = [[frames[i], delay] for i, delay in zip(selected, delays)]
+
+        latency10 = None
+        rows = light.get(self.latency10) if light else None
+        if rows:
+            log_show.info('读取轻载时延数据')
+            latency10 = [list(t) for t in zip(round_column(column(rows, 0)), round_column(column(rows, 3), 2))]
+        return throughput, latency, frame_loss, latency10
+
+
+# 行列表中的一列
+def column(rows, index):
+    return [row[index] for row in rows]
+
+
+PARSERS = []
+
+
+# 注册解析器（可用作类装饰器）；识别时按注册的先后顺序匹配
+def register_parser(parser_cls):
+    PARSERS.append(parser_cls())
+    return parser_cls
+
+
+@register_parser
+class SpirentParser(InstrumentParser):
+    name = 'SPIRENT'
+    signature = ('Test Summary Table',)
+    throughput = SheetArea('Test Summary Table', min_row=5, min_col=3, max_col=7)
+    latency = SheetArea('Advanced Test Summary Ta', min_row=5, min_col=1, max_col=6)
+    latency10 = SheetArea('Test Summary Table', min_row=5, min_col=1, max_col=4)
+
+
+@register_parser
+class XinertaiParser(InstrumentParser):
+    name = '信而泰'
+    signature = ('测试汇总表',)
+    throughput = SheetArea('测试汇总表', min_row=5, min_col=1, max_col=5)
+    latency = SheetArea('高级测试汇总表', min_row=5, min_col=1, max_col=6)
+    latency10 = SheetArea('测试汇总表', min_row=5, min_col=1, max_col=4)
+
+
+_plugins_loaded = False
+
+
+# 加载插件目录下的所有 .py 文件（只加载一次），插件在导入时调用 register_parser
+def load_plugins(plugin_dir=PLUGIN_DIR):
+    global _plugins_loaded
+    if _plugins_loaded:
+        return
+    _plugins_loaded = True
+    plugin_dir = Path(plugin_dir)
+    if not plugin_dir.is_dir():
+        return
+    for file in sorted(plugin_dir.glob('*.py')):
+        try:
+            spec = importlib.util.spec_from_file_location(f'instrument_plugin_{file.stem}', file)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            log_show.debug(f"加载了仪表解析插件：{file.name}")
+        except Exception as e:
+            log_show.warning(f"加载仪表解析插件“{file.name}”失败：{e}")
+
+
+def detect_parser(sheetnames):
+    load_plugins()
+    for parser in PARSERS:
+        if parser.matches(sheetnames):
+            return parser
+    return None
+
+
+# 读取一个表格中的多个区域，返回 {SheetArea: 行列表}，不存在的sheet页不包含在结果中
+def read_areas(reader, areas):
+    data = {}
+    for area in dict.fromkeys(areas):
+        if not reader.has_sheet(area.sheet):
+            log_show.warning(f"找不到“{area.sheet}” sheet页！")
+            continue
+        # 不使用表格中记录的范围，读到数据结束为止
+        data[area] = read_area(reader, area.sheet, Area(area.min_row, None, area.min_col, area.max_col),
+                               use_dimension=False)
+    return data
+
+
+# 解析性能数据：返回 (吞吐量, 吞吐量下的时延, 线速丢帧率, 轻载时延, 读取的行数)；无法识别仪表类型时返回 None
+def read_performance(file_main, file_light=None, backend=DEFAULT_BACKEND):
+    reader = open_reader(file_main, backend)
+    try:
+        parser = detect_parser(reader.sheetnames)
+        if parser is None:
+            return None
+        log_show.debug(f"使用了{parser.name}的仪表测试性能")
+        main = read_areas(reader, parser.main_areas())
+    finally:
+        reader.close()
+
+    light = None
+    if file_light and Path(file_light).exists() and parser.latency10:
+        reader = open_reader(file_light, backend)
+        try:
+            light = read_areas(reader, [parser.latency10])
+        finally:
+            reader.close()
+
+    rows_read = sum(len(rows) for rows in main.values()) + sum(len(rows) for rows in (light or {}).values())
+    return (*parser.parse(main, light), rows_read)
@@ -0,0 +1,107 @@
+import time
+import logging
+import multiprocessing
+from logging.handlers import QueueListener
+from constants import TASK_FINISH, CRITICAL_ERROR
+from process_logging import init_process_logging, LoggerForwarder
+
+########################################
+# GUI使用的常驻生成进程：
+# 1、生成任务（解析、模板渲染、docx打包等）在子进程中执行，不占用GUI进程的GIL，窗口和日志轮询不再卡顿；
+# 2、日志记录（包括任务完成的 TASK_FINISH 消息）通过 multiprocessing 队列发送回GUI进程，
+#    由 QueueListener 交给名字为“report”的Logger，与原来在线程中生成时的显示方式相同；
+# 3、子进程启动（spawn）后一直保留，后续任务不再重复导入模块，模板编译缓存等也继续有效；
+#    子进程意外退出后，下次提交任务时自动重新启动；
+# 4、GUI进程不导入 report_worker（openpyxl、docxtpl、docx、win32com 等），这些模块只在子进程启动时导入，
+#    GUI在窗口显示后即启动子进程（start），第一次生成时模块已经加载完成；
+# 5、监视模式的任务（watch=True）在两次生成之间保留解析结果（report_worker.ReuseState），只重新执行受影响的部分。
+########################################
+log_show = logging.getLogger("report")
+
+
+# 子进程的主循环：依次执行任务队列中的任务，收到 None 时退出
+def job_loop(job_queue, log_queue):
+    init_process_logging(log_queue)
+    start = time.perf_counter()
+    from report_worker import Report, ReuseState  # 生成文档使用的模块只在子进程中导入
+    log_show.debug(f"生成进程已就绪，导入模块耗时 {time.perf_counter() - start:.2f} 秒")
+    reuse = ReuseState()
+    while True:
+        job = job_queue.get()
+        if job is None:
+            break
+        watch = job.pop('watch', False)
+        if not watch:
+            reuse.clear()  # 不是监视模式的任务时不保留上次的内容
+        try:
+            # Report.run 自身会捕获生成过程中的异常并发送 TASK_FINISH，这里处理创建 Report 时的错误
+            Report(**job, reuse=reuse if watch else None).run()
+        except Exception as e:
+            log_show.critical(f"发生了严重错误：{e}")
+            log_show.info(f"{TASK_FINISH}{CRITICAL_ERROR}")
+
+
+##########################################################
+# 常驻生成进程：
+# worker = JobProcess()
+# worker.start()                                     启动子进程并导入模块（submit 时也会自动启动）
+# worker.submit(xlsm_file=..., task_type=..., ...)   参数与 Report 相同（另有 watch），结果通过日志中的 TASK_FINISH 返回
+# worker.is_alive()                                  子进程是否在运行
+# worker.close()                                     退出时调用，等待当前任务完成（超时后强制结束）
+##########################################################
+class JobProcess:
+    def __init__(self, logger=log_show):
+        self.logger = logger
+        self.ctx = multiprocessing.get_context('spawn')
+        self.process = None
+        self.job_queue = None
+        self.log_queue = None
+        self.listener = None
+        # 子进程的启动次数和已提交的任务数
+        self.starts = 0
+        self.jobs = 0
+
+    def is_alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def start(self):
+        if self.is_alive():
+            return
+        if self.process is not None:
+            log_show.warning("生成进程已意外退出，重新启动")
+            self._stop_listener(timeout=1)
+        self.job_queue = self.ctx.Queue()
+        self.log_queue = self.ctx.Queue()
+        self.listener = QueueListener(self.log_queue, LoggerForwarder(self.logger))
+        self.listener.start()
+        self.process = self.ctx.Process(target=job_loop, args=(self.job_queue, self.log_queue),
+                                        name='report-job', daemon=True)
+        self.process.start()
+        self.starts += 1
+
+    def submit(self, **job):
+        self.start()
+        self.job_queue.put(job)
+        self.jobs += 1
+
+    def close(self, timeout=5):
+        if self.process is None:
+            return
+        if self.process.is_alive():
+            self.job_queue.put(None)
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join()
+        self._stop_listener()
+        self.process = None
+
+    # 子进程在发送日志的过程中被结束时，队列中可能留下不完整的数据，监听线程一直等待而无法退出，
+    # 超过 timeout 秒后放弃这个队列（监听线程为守护线程，进程退出时也不再等待队列的发送线程）
+    def _stop_listener(self, timeout=None):
+        if self.listener is not None:
+            self.listener.enqueue_sentinel()
+            self.listener._thread.join(timeout)
+            if self.listener._thread.is_alive():
+                self.listener.queue.cancel_join_thread()
+            self.listener = None
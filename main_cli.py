@@ -0,0 +1,261 @@
+import sys
+import glob
+import json
+import time
+import logging
+import argparse
+import multiprocessing
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from report_worker import Report, ReuseState, DocumentLogFilter, CRITICAL_ERROR, TABLE_WRITERS
+from word_fields import FIELD_BACKENDS
+from image_prep import DEFAULT_IMAGE_DPI
+from xlsx_reader import DEFAULT_BACKEND, READERS
+from watch import DEBOUNCE, RecordWatcher, describe
+
+########################################
+# 命令行批量生成：不启动GUI，对多个原始记录依次（或使用进程池并行）生成报告/记录
+# 用法示例：
+#   python main_cli.py D:\Report\*.xlsm D:\Report\2025-06 --jobs 4 --type both --summary summary.json
+#   python main_cli.py D:\Report\记录.xlsm --watch        （监视模式：原始记录等修改后自动重新生成）
+########################################
+logger = logging.getLogger("report")
+
+# 命令行中的输出类型与 Report.task_type 的对应关系
+TASK_TYPES = {'record': 0, 'report': 1, 'both': 2}
+
+LOG_FORMAT = '%(asctime)s [%(levelname)s]: %(message)s'
+LOG_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+
+# 查找输入的原始记录：支持文件、目录（目录下的 *.xlsm）和通配符，去掉Excel打开时产生的 ~$ 临时文件
+def collect_inputs(inputs, recursive=False):
+    files = []
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            pattern = '**/*.xlsm' if recursive else '*.xlsm'
+            found = sorted(path.glob(pattern))
+        elif path.is_file():
+            found = [path]
+        else:
+            found = sorted(Path(f) for f in glob.glob(item, recursive=True))
+            if not found:
+                logger.warning(f"找不到与“{item}”匹配的原始记录文件")
+        for file in found:
+            if file.is_file() and not file.name.startswith('~$'):
+                file = file.resolve()
+                if file not in files:
+                    files.append(file)
+    return files
+
+
+def setup_logging(level, name=''):
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT))
+    if name:
+        handler.addFilter(DocumentLogFilter(name))
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(level)
+
+
+# 收集任务中的错误信息，写入汇总结果
+class ErrorCollector(logging.Handler):
+    def __init__(self):
+        super().__init__(level=logging.ERROR)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+##########################################################
+# 执行一个原始记录的生成任务，返回汇总信息（字典）
+# 在进程池的子进程中执行时，需要定义在模块顶层
+##########################################################
+def run_job(xlsm_file, task_type, is_revision_mode, parallel=False, fields=None, log_level=logging.INFO,
+            in_worker=False, trace_dir=None, force=False, image_dpi=DEFAULT_IMAGE_DPI, reader=DEFAULT_BACKEND,
+            table_writer='stream', reuse=None, file_roots=None):
+    if in_worker:
+        setup_logging(log_level, f"{Path(xlsm_file).parent.name}/{Path(xlsm_file).name}")
+    collector = ErrorCollector()
+    logger.addHandler(collector)
+    start = time.perf_counter()
+    result = {'input': str(xlsm_file), 'status': 'ok', 'output': None, 'duration': 0.0, 'error': None, 'trace': None,
+              'cached': [], 'record': str(xlsm_file)}
+    try:
+        report = Report(xlsm_file=xlsm_file, task_type=task_type, is_revision_mode=is_revision_mode,
+                        parallel=parallel, field_backend=fields, trace_dir=trace_dir, force=force,
+                        image_dpi=image_dpi, reader_backend=reader, table_writer=table_writer, reuse=reuse,
+                        file_roots=file_roots)
+        report.run()  # 直接在当前进程中执行，不启动线程
+        result['record'] = str(report.xlsm_file)  # 生成成功后原始记录会被重命名
+        result['trace'] = str(report.trace_file) if report.trace_file else None
+        result['cached'] = report.cached  # 未修改、直接使用上次生成结果的文档
+        if report.run_result == CRITICAL_ERROR:
+            result['status'] = 'failed'
+            result['error'] = collector.messages[-1] if collector.messages else '生成失败'
+        else:
+            result['output'] = str(report.output_name) if report.output_name else None
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    finally:
+        logger.removeHandler(collector)
+    result['duration'] = round(time.perf_counter() - start, 3)
+    return result
+
+
+def run_batch(files, task_type, is_revision_mode, jobs=1, fail_fast=False, parallel=False, fields=None,
+              log_level=logging.INFO, trace_dir=None, force=False, image_dpi=DEFAULT_IMAGE_DPI,
+              reader=DEFAULT_BACKEND, table_writer='stream'):
+    results = {str(f): {'input': str(f), 'status': 'skipped', 'output': None, 'duration': 0.0, 'error': None,
+                        'trace': None, 'cached': [], 'record': str(f)}
+               for f in files}
+
+    if jobs <= 1:
+        # 单进程时直接在当前进程中依次执行
+        for file in files:
+            logger.info(f"开始处理：{file}")
+            result = run_job(str(file), task_type, is_revision_mode, parallel, fields, log_level, trace_dir=trace_dir,
+                             force=force, image_dpi=image_dpi, reader=reader, table_writer=table_writer)
+            results[str(file)] = result
+            if fail_fast and result['status'] != 'ok':
+                logger.error("出现失败的任务，停止执行后续任务（--fail-fast）")
+                break
+        return list(results.values())
+
+    ctx = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=ctx) as pool:
+        futures = {pool.submit(run_job, str(f), task_type, is_revision_mode, False, fields, log_level, True,
+                               trace_dir, force, image_dpi, reader, table_writer): str(f)
+                   for f in files}
+        for future in as_completed(futures):
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:  # 工作进程崩溃（BrokenProcessPool）等：此任务记为失败，继续收集其他任务的结果
+                message = "工作进程异常退出" if isinstance(e, BrokenProcessPool) else "执行任务时发生错误"
+                result = dict(results[futures[future]], status='failed', error=f"{message}：{e}")
+            results[futures[future]] = result
+            logger.info(f"[{result['status']}] {result['input']} ({result['duration']} 秒)")
+            if fail_fast and result['status'] != 'ok':
+                logger.error("出现失败的任务，取消尚未开始的任务（--fail-fast）")
+                for f in futures:
+                    f.cancel()
+    return list(results.values())
+
+
+##########################################################
+# 监视模式：先生成一次，之后原始记录或 images、data 文件夹中的文件修改后自动重新生成（只执行受影响的部分），
+# 按 Ctrl+C 退出。每次生成的结果输出一行日志
+##########################################################
+def watch_job(xlsm_file, task_type, is_revision_mode, debounce=DEBOUNCE, **options):
+    reuse = ReuseState()
+    watcher = RecordWatcher(xlsm_file, debounce=debounce)
+    logger.info("监视模式：原始记录及 images、data 文件夹中的文件修改后自动重新生成，按 Ctrl+C 退出")
+    try:
+        while True:
+            result = run_job(str(watcher.xlsm_file), task_type, is_revision_mode, reuse=reuse, **options)
+            cached = f"，直接使用缓存：{'、'.join(result['cached'])}" if result['cached'] else ''
+            logger.info(f"[{result['status']}] {result['output'] or result['error']} ({result['duration']} 秒{cached})")
+            watcher.retarget(result['record'])
+            logger.info("等待原始记录等文件的修改...")
+            change = watcher.wait()
+            logger.info(f"检测到修改：{describe(change)}，重新生成")
+    except KeyboardInterrupt:
+        logger.info("退出监视模式")
+    finally:
+        reuse.clear()
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="报告自动化生成工具（命令行批量模式）")
+    parser.add_argument('inputs', nargs='+', help="原始记录xlsm文件、目录或通配符")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="并行执行的进程数，默认为1")
+    parser.add_argument('-t', '--type', choices=TASK_TYPES.keys(), default='both',
+                        help="生成的文件类型：record=原始记录，report=检验报告，both=报告+记录（默认）")
+    parser.add_argument('-r', '--recursive', action='store_true', help="输入为目录时，递归查找子目录中的xlsm文件")
+    parser.add_argument('--no-revision', action='store_true', help="不打开原始记录的修订模式")
+    parser.add_argument('--parallel', action='store_true',
+                        help="“报告+记录”时在两个子进程中同时生成报告和记录（仅在 --jobs 1 时有效）")
+    parser.add_argument('--fields', choices=FIELD_BACKENDS.keys(),
+                        help="更新Word域的方式：word=调用Word更新，dirty=标记后由Word打开时更新，none=不更新；"
+                             "默认在Windows上使用Word，其他系统使用dirty")
+    policy = parser.add_mutually_exclusive_group()
+    policy.add_argument('--fail-fast', action='store_true', help="任一任务失败后不再执行后续任务")
+    policy.add_argument('--keep-going', action='store_true', help="任务失败后继续执行其他任务（默认）")
+    parser.add_argument('--force', action='store_true', help="忽略缓存，即使原始记录及引用的文件都没有修改也重新生成")
+    parser.add_argument('--image-dpi', type=int, default=DEFAULT_IMAGE_DPI,
+                        help=f"插入的图片按显示宽度和此分辨率缩小、重新压缩，默认为{DEFAULT_IMAGE_DPI}，0表示插入原图")
+    parser.add_argument('--reader', choices=READERS.keys(), default=DEFAULT_BACKEND,
+                        help="读取Excel表格的方式：stream=直接流式解析（默认），openpyxl=使用openpyxl")
+    parser.add_argument('--table-writer', choices=TABLE_WRITERS, default='stream',
+                        help="“检验结果”表格的生成方式：stream=由行的XML骨架直接生成（默认），jinja=由模板逐行渲染")
+    parser.add_argument('--trace-dir', help="各阶段耗时记录（JSON）的保存目录，默认为 %%LOCALAPPDATA%%\\ReportWorker\\traces")
+    parser.add_argument('-w', '--watch', action='store_true',
+                        help="监视模式：只能指定一个原始记录，文件修改后自动重新生成，按 Ctrl+C 退出")
+    parser.add_argument('--debounce', type=float, default=DEBOUNCE,
+                        help=f"监视模式下文件不再变化多少秒后重新生成，默认为{DEBOUNCE}")
+    parser.add_argument('-s', '--summary', help="汇总结果（JSON）的保存路径，默认输出到标准输出")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出调试日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    setup_logging(log_level)
+
+    files = collect_inputs(args.inputs, args.recursive)
+    if not files:
+        logger.error("没有找到需要处理的原始记录文件！")
+        return 2
+
+    if args.watch:
+        if len(files) != 1:
+            logger.error("监视模式只能指定一个原始记录文件！")
+            return 2
+        return watch_job(files[0], TASK_TYPES[args.type], not args.no_revision, debounce=args.debounce,
+                         parallel=args.parallel, fields=args.fields, log_level=log_level, trace_dir=args.trace_dir,
+                         force=args.force, image_dpi=args.image_dpi, reader=args.reader,
+                         table_writer=args.table_writer)
+
+    jobs = max(1, min(args.jobs, len(files)))
+    logger.info(f"共找到 {len(files)} 个原始记录，使用 {jobs} 个进程处理")
+    start = time.perf_counter()
+    results = run_batch(files, TASK_TYPES[args.type], not args.no_revision, jobs=jobs, fail_fast=args.fail_fast,
+                        parallel=args.parallel, fields=args.fields, log_level=log_level, trace_dir=args.trace_dir,
+                        force=args.force, image_dpi=args.image_dpi, reader=args.reader,
+                        table_writer=args.table_writer)
+    summary = {
+        'type': args.type,
+        'jobs': jobs,
+        'total': len(results),
+        'ok': sum(1 for r in results if r['status'] == 'ok'),
+        'failed': sum(1 for r in results if r['status'] == 'failed'),
+        'skipped': sum(1 for r in results if r['status'] == 'skipped'),
+        'cached': sum(len(r['cached']) for r in results),
+        'duration': round(time.perf_counter() - start, 3),
+        'results': results,
+    }
+
+    text = json.dumps(summary, ensure_ascii=False, indent=2)
+    if args.summary:
+        Path(args.summary).write_text(text, encoding='utf-8')
+        logger.info(f"汇总结果已保存到：{args.summary}")
+    else:
+        print(text)
+    logger.info(f"完成：成功 {summary['ok']} 个，失败 {summary['failed']} 个，跳过 {summary['skipped']} 个，"
+                f"共耗时 {summary['duration']} 秒")
+    return 0 if summary['failed'] == 0 and summary['skipped'] == 0 else 1
+
+
+if __name__ == "__main__":
+    # 打包为exe后，进程池使用的子进程需要此调用
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -1,12 +1,16 @@
 import os
 import sys
+import multiprocessing
 import tkinter as tk
 from tkinter import ttk, filedialog, scrolledtext, messagebox
 from pathlib import Path
-from PIL import Image, ImageTk
 import logging
-from queue import Queue
-from report_worker import Report, TASK_FINISH, CRITICAL_ERROR
+from logging.handlers import RotatingFileHandler
+from queue import Queue, Empty
+# 只导入轻量的模块：生成文档使用的 report_worker（openpyxl、docxtpl 等）只在生成进程中导入，见 job_process.py
+from constants import TASK_FINISH, CRITICAL_ERROR, VERSION
+from job_process import JobProcess
+from watch import RecordWatcher, describe
 
 # 全局变量，控制日志写入的到滚动文本框中：
 logger = logging.getLogger("report")
@@ -17,6 +21,57 @@ if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
 else:
     EXE_DIR = Path.cwd()
 
+# 每次轮询最多处理的日志条数（剩余的在下一次轮询中处理，轮询间隔缩短为 LOG_BUSY_POLL 毫秒）
+LOG_BATCH = 500
+LOG_POLL = 100
+LOG_BUSY_POLL = 10
+# 日志框中保留的最多行数，超出后删除最早的日志；完整的日志保存在日志文件中
+MAX_LOG_LINES = 3000
+# 日志文件：Windows 上为 %LOCALAPPDATA%\ReportWorker\logs\report.log，按大小轮转
+LOG_FILE_BYTES = 5 * 2 ** 20
+LOG_FILE_COUNT = 3
+# 窗口显示后延迟多少毫秒启动生成进程（在后台导入生成文档使用的模块）
+WARM_DELAY = 200
+# 状态栏的Logo：预先缩小的图片由Tk直接读取，启动时不需要导入PIL
+LOGO_SIZE = (190, 20)
+LOGO_FILE = 'potin_logo.png'
+COPYRIGHT = "版权声明： 本工具仅限【博鼎实华（北京）技术有限公司】内部员工使用\n"
+
+
+def default_log_file():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base, 'ReportWorker', 'logs', 'report.log')
+
+
+# 完整日志写入轮转的日志文件，无法写入时返回 None（只在日志框中显示）
+def open_log_file(formatter, file=None):
+    file = Path(file) if file else default_log_file()
+    try:
+        file.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(file, maxBytes=LOG_FILE_BYTES, backupCount=LOG_FILE_COUNT, encoding='utf-8')
+    except OSError:
+        return None
+    handler.setFormatter(formatter)
+    return handler
+
+
+# 由 potin.png 缩小生成状态栏的Logo（PIL），file 不为空时保存：
+# templates/potin_logo.png 即由 make_logo(...) 生成，更换 potin.png 后需重新生成
+def make_logo(file=None):
+    from PIL import Image
+    image = Image.open(Path(EXE_DIR, 'templates', 'potin.png')).resize(LOGO_SIZE, Image.LANCZOS)
+    if file:
+        image.save(file, optimize=True)
+    return image
+
+
+def load_logo():
+    logo = Path(EXE_DIR, 'templates', LOGO_FILE)
+    if logo.is_file():
+        return tk.PhotoImage(file=str(logo))
+    from PIL import ImageTk
+    return ImageTk.PhotoImage(make_logo())
+
 
 class QueueHandler(logging.Handler):
     """Class to send logging records to a queue
@@ -39,8 +94,7 @@ class GUI:
         self.version = version
 
         # 初始化图像，此变量需要与 root.mainloop 同级别
-        potin_pic = str(Path(EXE_DIR, r'templates', 'potin.png'))
-        self.logo = ImageTk.PhotoImage(Image.open(potin_pic).resize((190, 20), Image.LANCZOS))
+        self.logo = load_logo()
 
         # 原始记录xlsm文件路径
         self.xlsm_file = tk.StringVar()
@@ -53,9 +107,23 @@ class GUI:
         # 是否打开原始记录的修订模式
         self.is_revision_mode = tk.BooleanVar(value=True)
 
+        # 是否忽略缓存，强制重新生成
+        self.force = tk.BooleanVar(value=False)
+
+        # 监视模式：原始记录及 images、data 文件夹中的文件修改后自动重新生成（见 watch.py）
+        self.watch = tk.BooleanVar(value=False)
+        self.watcher = None
+        self.watch_changes = Queue()
+        self.watch_pending = False  # 生成过程中检测到修改，完成后再重新生成
+        self.auto_job = False  # 当前任务由监视模式自动启动（完成后不弹出对话框）
+
         # 最终生成的输出文件（包含全路径的字符串）
         self.output_name = ''
 
+        # 常驻的生成进程（第一次生成时启动），以及是否有正在执行的任务
+        self.worker = JobProcess(logger)
+        self.running = False
+
         # Create a logging handler using a queue
         self.log_queue = Queue()
         self.queue_handler = QueueHandler(self.log_queue)
@@ -70,12 +138,18 @@ class GUI:
         )
         self.queue_handler.setFormatter(formatter)
         logger.addHandler(self.queue_handler)
+        self.file_handler = open_log_file(formatter)
+        if self.file_handler:
+            logger.addHandler(self.file_handler)
 
         # 创建界面 Widgets
         self.create_ui()
 
         # Start polling messages from the queue
-        self.root.after(100, self.poll_log_queue)
+        self.root.after(LOG_POLL, self.poll_log_queue)
+
+        # 窗口显示后在后台启动生成进程，第一次生成时不再等待模块导入
+        self.root.after(WARM_DELAY, self.worker.start)
 
         # 开始窗口循环：
         # self.root.mainloop()
@@ -148,7 +222,12 @@ class GUI:
 
         # 选择是否打开记录修订模式：
         ttk.Checkbutton(option_frame, variable=self.is_revision_mode, text="打开修订模式").pack(side=tk.LEFT,
-                                                                                                padx=(20, 40))
+                                                                                                padx=(20, 10))
+        # 原始记录未修改时直接使用上次的生成结果，勾选后总是重新生成：
+        ttk.Checkbutton(option_frame, variable=self.force, text="强制重新生成").pack(side=tk.LEFT, padx=(10, 10))
+        # 保存原始记录等文件后自动重新生成：
+        ttk.Checkbutton(option_frame, variable=self.watch, text="监视修改", command=self.on_watch).pack(side=tk.LEFT,
+                                                                                                        padx=(0, 10))
 
         # 生成按钮
         self.generate_btn = tk.Button(
@@ -210,7 +289,7 @@ class GUI:
 
         # 日志框插入 Copyright 信息：
         self.log_text.configure(state='normal')
-        self.log_text.insert(1.0, "版权声明： 本工具仅限【博鼎实华（北京）技术有限公司】内部员工使用\n")
+        self.log_text.insert(1.0, COPYRIGHT)
         self.log_text.configure(state='disabled')
 
         # #######################################
@@ -225,39 +304,113 @@ class GUI:
         # 注册窗口退出程序：
         # self.root.protocol('WM_DELETE_WINDOW', self.quit)
 
-    # 让滚动文本框及时显示内容
-    def log_display(self, record):
-        # 未被格式化的原始log信息：record.msg
-        # 判断一下任务是否已经完成：
-        if TASK_FINISH in record.msg:
-            # print(record.msg)
-            temp_msg = record.msg[len(TASK_FINISH):]
-            if temp_msg != CRITICAL_ERROR:
-                self.output_name = temp_msg
-                new_name = Path(self.output_name).stem
-                output_excel = Path(self.xlsm_file.get()).parent / (new_name + '.xlsm')
-                self.xlsm_file.set(str(output_excel))
-                if (messagebox.askyesno("查看生成结果", "   任务已完成，是否立即查看生成的文档？\n\n（后续也可通过双击左下角博鼎Logo查看）")):
-                    self.open_dir(Path(output_excel.parent))
-            # 修改“生成” 按钮的文字和状态
+    # 在滚动文本框中显示一批日志：连续的同级别日志合并为一次插入，整批只滚动一次
+    def log_display(self, records):
+        pending = []  # [(级别, [格式化后的日志])]
+        for record in records:
+            # 未被格式化的原始log信息：record.msg，判断一下任务是否已经完成：
+            if TASK_FINISH in str(record.msg):
+                self.write_log(pending)
+                pending = []
+                self.task_finished(str(record.msg)[len(TASK_FINISH):])
+            elif pending and pending[-1][0] == record.levelname:
+                pending[-1][1].append(self.queue_handler.format(record))
+            else:
+                pending.append((record.levelname, [self.queue_handler.format(record)]))
+        self.write_log(pending)
+
+    def write_log(self, pending):
+        if not pending:
+            return
+        self.log_text.configure(state='normal')
+        for levelname, lines in pending:
+            self.log_text.insert(tk.END, '\n'.join(lines) + '\n', levelname)
+        # 只保留最近的 MAX_LOG_LINES 行（第一行的版权声明除外）
+        excess = int(self.log_text.index('end-1c').split('.')[0]) - 2 - MAX_LOG_LINES
+        if excess > 0:
+            self.log_text.delete('2.0', f'{excess + 2}.0')
+        self.log_text.configure(state='disabled')
+        # Autoscroll to the bottom
+        self.log_text.see(tk.END)
+
+    # 任务完成：temp_msg 为生成文档的完整路径，或者 CRITICAL_ERROR
+    def task_finished(self, temp_msg):
+        if temp_msg != CRITICAL_ERROR:
+            self.output_name = temp_msg
+            new_name = Path(self.output_name).stem
+            output_excel = Path(self.xlsm_file.get()).parent / (new_name + '.xlsm')
+            self.xlsm_file.set(str(output_excel))
+            if self.watcher is not None:
+                self.watcher.retarget(output_excel)  # 原始记录已重命名
+            if not self.auto_job and (messagebox.askyesno("查看生成结果", "   任务已完成，是否立即查看生成的文档？\n\n（后续也可通过双击左下角博鼎Logo查看）")):
+                self.open_dir(Path(output_excel.parent))
+        # 修改“生成” 按钮的文字和状态
+        self.running = False
+        self.generate_btn.configure(text="开始生成", state=tk.NORMAL)
+        if self.watch_pending:
+            self.watch_pending = False
+            self.start_job(auto=True)
+
+    # 轮询queue队列，每次最多取出 LOG_BATCH 条日志，调用 log_display 在滚动文本框中显示：
+    def poll_log_queue(self):
+        records = []
+        while len(records) < LOG_BATCH:
+            try:
+                records.append(self.log_queue.get(block=False))
+            except Empty:
+                break
+        if records:
+            self.log_display(records)
+        self.poll_watch()
+
+        # 生成进程在任务执行过程中意外退出时，恢复“生成”按钮
+        if self.running and not records and not self.worker.is_alive():
+            self.running = False
+            logger.error("生成进程意外退出，请重新生成！")
             self.generate_btn.configure(text="开始生成", state=tk.NORMAL)
 
+        # 队列中还有日志时尽快继续处理
+        self.root.after(LOG_BUSY_POLL if len(records) == LOG_BATCH else LOG_POLL, self.poll_log_queue)
+
+    # 监视模式检测到修改时自动重新生成（正在生成时，完成后再重新生成）
+    def poll_watch(self):
+        try:
+            change = self.watch_changes.get(block=False)
+        except Empty:
+            return
+        logger.info(f"检测到修改：{describe(change)}")
+        if self.running:
+            self.watch_pending = True
         else:
-            # 格式化化后的log信息：
-            msg = self.queue_handler.format(record)
-            self.log_text.configure(state='normal')
-            self.log_text.insert(tk.END, msg + '\n', record.levelname)
-            self.log_text.configure(state='disabled')
-            # Autoscroll to the bottom
-            self.log_text.see(tk.END)
-
-    # 轮询queue队列，如果有消息就调用log_display 在滚动文本框中显示：
-    def poll_log_queue(self):
-        # Check every 100ms if there is a new message in the queue to display
-        while not self.log_queue.empty():
-            self.log_display(self.log_queue.get(block=False))
+            self.start_job(auto=True)
 
-        self.root.after(100, self.poll_log_queue)
+    def on_watch(self):
+        if self.watch.get():
+            self.start_watch()
+        else:
+            self.stop_watch()
+            logger.info("已停止监视原始记录的修改")
+
+    def start_watch(self):
+        self.stop_watch()
+        xlsm_file = self.xlsm_file.get()
+        if not Path(xlsm_file).is_file():
+            logger.warning("请选择原始记录，选择后开始监视")
+            return
+        self.watcher = RecordWatcher(xlsm_file)
+        self.watcher.start(self.watch_changes.put)
+        logger.info("开始监视原始记录及 images、data 文件夹，保存修改后自动重新生成")
+
+    def stop_watch(self):
+        if self.watcher is not None:
+            self.watcher.stop()
+            self.watcher = None
+        self.watch_pending = False
+        while True:
+            try:
+                self.watch_changes.get(block=False)
+            except Empty:
+                break
 
     # 获取xlsm格式的原始记录路径：
     def on_get(self):
@@ -269,28 +422,36 @@ class GUI:
             self.xlsm_file.set(file_get.name)
             logger.info(f"已选择文件: {file_get.name}")
             self.generate_btn.configure(state='normal')
+            if self.watch.get():
+                self.start_watch()
         else:
             logger.warning("未选择有效的记录文件！")
             if not Path(self.xlsm_file.get()).is_file():
                 self.generate_btn.configure(state='disabled')
 
     def on_generate(self):
+        self.start_job()
+
+    # auto：由监视模式自动启动
+    def start_job(self, auto=False):
         self.generate_btn.configure(state=tk.DISABLED)
         task_type = self._type_lst.index(self.task_type.get())
 
-        self.report_worker = Report(xlsm_file=self.xlsm_file.get(),
-                                    task_type=task_type,
-                                    is_revision_mode=self.is_revision_mode.get()
-                                    )
-        # 修改自动出报告模块中的日志输出为全局变量logger
-        # clock_test.report_logger = logger
-        self.report_worker.start()
+        # 在常驻的生成进程中执行，日志和任务完成的消息通过 log_queue 返回
+        self.running = True
+        self.auto_job = auto
+        self.worker.submit(xlsm_file=self.xlsm_file.get(),
+                           task_type=task_type,
+                           is_revision_mode=self.is_revision_mode.get(),
+                           force=self.force.get(),
+                           watch=self.watcher is not None  # 监视模式下保留解析结果，只重新执行受影响的部分
+                           )
 
     def on_clear(self):
         """清空日志框"""
         self.log_text.configure(state="normal")
         self.log_text.delete(1.0, tk.END)
-        self.log_text.insert(1.0, "版权声明： 本工具仅限【博鼎实华（北京）技术有限公司】内部员工使用\n")
+        self.log_text.insert(1.0, COPYRIGHT)
         self.log_text.update()
         self.log_text.configure(state="disabled")
 
@@ -307,9 +468,16 @@ class GUI:
 def main():
     root = tk.Tk()
     logger.setLevel(level=logging.DEBUG)
-    app = GUI(root, version='V20250723')
+    app = GUI(root, version=VERSION)
     root.mainloop()
+    app.stop_watch()
+    app.worker.close()
+    if app.file_handler:
+        logger.removeHandler(app.file_handler)
+        app.file_handler.close()
 
 
 if __name__ == "__main__":
+    # 打包为exe后，并行模式使用的子进程需要此调用
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import json
+import time
+import shutil
+import logging
+import threading
+from pathlib import Path
+from collections import Counter
+from build_cache import file_hash
+
+########################################
+# 输出目录下'others'文件夹的文件存放：
+# 原始记录引用的图片和数据文件每次生成都要拷贝到'others'文件夹，原始记录在网络共享目录上时拷贝很慢。
+# 1、目标文件已存在且内容（哈希）相同时跳过；
+# 2、源文件和目标在同一文件系统上时，优先使用reflink（写时复制，Linux的Btrfs/XFS等），其次使用硬链接；
+# 3、都不可用时才拷贝。
+# 每个文件的处理方式记录下来，任务结束后写入报告文件。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+# 处理方式：跳过、reflink、硬链接、拷贝
+SKIP, REFLINK, LINK, COPY = 'skip', 'reflink', 'link', 'copy'
+FICLONE = 0x40049409  # Linux ioctl，克隆整个文件
+
+
+def same_device(src, dest_dir):
+    try:
+        return os.stat(src).st_dev == os.stat(dest_dir).st_dev
+    except OSError:
+        return False
+
+
+def reflink(src, dest):
+    if not sys.platform.startswith('linux'):
+        raise OSError("reflink is only supported on Linux")
+    import fcntl
+    with open(src, 'rb') as s, open(dest, 'wb') as d:
+        fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+
+
+##########################################################
+# 一个输出目录的'others'文件夹，put 可以在多个线程中同时调用
+##########################################################
+class OthersStore:
+    def __init__(self, dest_dir):
+        self.dest_dir = Path(dest_dir)
+        self.records = []  # [{'source':, 'dest':, 'action':, 'bytes':}, ...]
+        self._links = True  # 硬链接或reflink失败一次后不再尝试
+        self._lock = threading.Lock()
+
+    # 将 src 存放为 dest_dir/name，返回处理方式
+    def put(self, src, name):
+        src = Path(src)
+        dest = self.dest_dir / name
+        self.dest_dir.mkdir(parents=True, exist_ok=True)
+        size = src.stat().st_size
+        if self._is_same(src, dest, size):
+            action = SKIP
+        else:
+            action = self._place(src, dest)
+        with self._lock:
+            self.records.append({'source': str(src), 'dest': str(dest), 'action': action, 'bytes': size})
+        return action
+
+    @staticmethod
+    def _is_same(src, dest, size):
+        try:
+            if not dest.exists() or dest.stat().st_size != size:
+                return False
+            return os.path.samefile(src, dest) or file_hash(src) == file_hash(dest)
+        except OSError:
+            return False
+
+    def _place(self, src, dest):
+        # 先生成临时文件再替换，目标文件是已存在的硬链接时不会修改到源文件
+        tmp = dest.with_name(f"{dest.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            if self._links and same_device(src, self.dest_dir):
+                for action, func in ((REFLINK, reflink), (LINK, os.link)):
+                    try:
+                        func(src, tmp)
+                        tmp.replace(dest)
+                        return action
+                    except OSError:
+                        tmp.unlink(missing_ok=True)
+                self._links = False
+            shutil.copy(src, tmp)
+            tmp.replace(dest)
+            return COPY
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def extend(self, records):
+        with self._lock:
+            self.records.extend(records)
+
+    def summary(self):
+        count = Counter(r['action'] for r in self.records)
+        size = Counter()
+        for r in self.records:
+            size[r['action']] += r['bytes']
+        return count, size
+
+    def summary_line(self):
+        count, size = self.summary()
+        names = {SKIP: '跳过', REFLINK: 'reflink', LINK: '硬链接', COPY: '拷贝'}
+        return '，'.join(f"{names[a]} {count[a]} 个（{size[a] / 1024 / 1024:.1f} MB）"
+                        for a in (SKIP, REFLINK, LINK, COPY) if count[a])
+
+    # 报告文件：任务信息、各处理方式的文件数和字节数，以及每个文件的处理方式
+    def write_report(self, file, job=None):
+        count, size = self.summary()
+        data = {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'job': job or {},
+            'dest_dir': str(self.dest_dir),
+            'summary': {a: {'files': count[a], 'bytes': size[a]} for a in count},
+            'files': self.records,
+        }
+        file = Path(file)
+        tmp = file.with_name(file.name + '.tmp')
+        tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding='utf-8')
+        tmp.replace(file)
+        return file
@@ -0,0 +1,49 @@
+import logging
+from logging.handlers import QueueHandler
+
+########################################
+# 子进程的日志处理（原在 report_worker.py 中定义，report_worker 中仍可导入）：
+# 子进程中的日志通过队列发送回主进程，主进程由 LoggerForwarder 交给名字为“report”的Logger处理；
+# 此模块只使用标准库，GUI进程使用时不必加载生成文档的模块
+########################################
+log_show = logging.getLogger("report")
+
+# 子进程中的日志处理器：日志通过队列发送回主进程
+_process_log_handler = None
+
+
+# level 为主进程中“report”的日志级别，低于此级别的日志不再发送回主进程
+def init_process_logging(log_queue, level=logging.DEBUG):
+    global _process_log_handler
+    _process_log_handler = QueueHandler(log_queue)
+    log_show.handlers = [_process_log_handler]
+    log_show.propagate = False
+    log_show.setLevel(level)
+
+
+# init_process_logging 设置的日志处理器
+def process_log_handler():
+    return _process_log_handler
+
+
+# 在日志前加上文档名称，以区分同时生成的两个文档的日志
+class DocumentLogFilter(logging.Filter):
+    def __init__(self, name):
+        super().__init__()
+        self.prefix = f"[{name}] "
+
+    def filter(self, record):
+        record.msg = self.prefix + str(record.msg)
+        return True
+
+
+# 主进程中把子进程发送回来的日志记录交给 logger 处理（最终显示在GUI的日志框中）；
+# logger.handle 不检查日志级别，低于 logger 当前级别的日志在此丢弃（子进程启动后主进程的级别可能已改变）
+class LoggerForwarder(logging.Handler):
+    def __init__(self, logger):
+        super().__init__()
+        self.logger = logger
+
+    def emit(self, record):
+        if self.logger.isEnabledFor(record.levelno):
+            self.logger.handle(record)
@@ -1,20 +1,33 @@
 import sys
-import openpyxl as xl
 import re
-import math
-import shutil
+import hashlib
 import threading
 import time
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from logging.handlers import QueueListener
 from pathlib import Path
 from collections import namedtuple, Counter
-from docxtpl import DocxTemplate, InlineImage
+from docxtpl import InlineImage
 from docx import Document
-from docx.shared import Mm
+from docx.shared import Mm, Emu
 from docxcompose.composer import Composer
 from docx.oxml import parse_xml
 from docx.oxml.ns import nsdecls
-import win32com.client as win32
+from word_fields import FieldBackend, FieldEvaluator, get_field_backend
+from stage_trace import StageTrace, write_trace
+from build_cache import BuildCache, make_entry, file_hash
+from template_cache import CachedDocxTemplate, get_template_cache
+from image_prep import DEFAULT_IMAGE_DPI, get_image_preparer
+from output_store import OthersStore, COPY
+from instrument_parsers import read_performance
+from rounding import round_liug  # 原有的修约函数，已移到 rounding.py
+from result_items import VerdictIndex, classify, number_runs, result_table
+from xlsx_reader import Area, DEFAULT_BACKEND, open_reader, read_area
+# 任务完成的消息、程序版本、错误码，以及子进程的日志处理（GUI进程只导入这两个模块）
+from constants import TASK_FINISH, VERSION, CRITICAL_ERROR
+from process_logging import init_process_logging, process_log_handler, DocumentLogFilter, LoggerForwarder
 
 ########################################
 # 将日志信息输出到采用queue的Logger中
@@ -23,30 +36,6 @@ import win32com.client as win32
 log_show = logging.getLogger("report")
 
 
-########################################
-# 我国科学技术委员会正式颁布的《数字修约规则》，通常称为“四舍六入五成双”法则,即四舍六入五考虑。
-# 当[尾数]≤4时舍去，尾数为6时进位。当尾数为5时，则应看末位数是奇数还是偶数，5前为偶数应将5舍去，5前为奇数应将5进位。
-########################################
-def round_liug(num, poi=0):
-    num = float(num)
-    num = num * pow(10, poi + 1)
-    num_fir = num % 10
-    num_sec = int(num / 10 % 10)
-    if num_fir < 5 or num_fir > 5:
-        if num_fir > 5:  # 大于五进位 小于五无视
-            num += 10
-    elif num_sec % 2 == 1:  # 保留数最后一位是奇数 进位，偶数无视
-        num += 10
-    num = float(math.trunc((num - num_fir) / 10))
-    num = num / pow(10, poi)
-    if poi == 0:
-        num = round(num)
-    else:
-        ff = '.' + str(poi) + 'f'
-        num = format(num, ff)
-    return num
-
-
 ##########################################################
 # 格式化字符串函数
 # 输入为字符串，内容为包含正整数序列的列表（可能包含*字符），输出为字符串：
@@ -54,18 +43,14 @@ def round_liug(num, poi=0):
 # 2、对于大于等于3个以上的连续数字，合并为“最小值~最大值”的形式输出，例如：
 # 输入：[1,3,4,5,6,13,14,19,29,30,31,32,34,40]
 # 输出str：“1、3~5、6、13、14、19、29~34、40"
+# 连续序号段的计算见 result_items.number_runs，VerdictIndex 中保存了预先计算的结果（见 format_runs）
 ##########################################################
 def format_lst(lst_str):
-    lst = [int(s.replace('*', '')) for s in lst_str]
-    ret = []
-    start = end = lst[0]
-    for num in lst[1:]:
-        if num == end + 1:
-            end = num
-        else:
-            ret.append((start, end))
-            start = end = num
-    ret.append((start, end))
+    return format_runs(number_runs(lst_str))
+
+
+# 格式化连续序号段 [(start, end), ...]
+def format_runs(ret):
     # 下述一行代码会将两个连续数字的序列表示为 “7~8”，而不是“7、8”，
     # ret = ','.join(str(start) if start == end else f'{start}~{end}' for (start, end) in ret)
     out = []
@@ -81,16 +66,50 @@ def format_lst(lst_str):
     return ret
 
 
+##########################################################
+# 生成规范化的输出目录名和文件名（不含后缀）：报告编号_厂家_设备名称_设备型号，文件名中的非法字符用‘-’替换
+# info 为包含 report_number、manufacturer、equipment_type、equipment_model 的任务基本信息
+##########################################################
+def formal_names(info, is_report):
+    report_number = info['report_number']
+    manufacturer = info['manufacturer']
+    equipment_type = info['equipment_type']
+    equipment_model = info['equipment_model']
+
+    # 去除设备厂商名称中的“技术有限公司“、”技术公司”等信息以简化报告名称：
+    removal = ["科技发展股份有限公司", "科技股份有限公司", "技术股份有限公司", "产业股份有限公司",
+               "科技有限责任公司", "科技有限公司", "技术有限公司", "股份有限公司", "有限责任公司", "有限公司"]
+    for string in removal:
+        manufacturer = manufacturer.replace(string, "")
+
+    dst_dir = report_number + '_' + manufacturer + '_' + equipment_type + '_' + equipment_model
+    if is_report:
+        new_name = report_number + '_报告'
+    else:
+        new_name = report_number + '_记录'
+    new_name = new_name + '_' + manufacturer + '_' + equipment_type + '_' + equipment_model
+    # 去掉文件名中的非法字符,用‘-’替换
+    dst_dir = re.sub(r'[/:*?"<>|+\\\s]', '-', dst_dir)
+    new_name = re.sub(r'[/:*?"<>|+\\\s]', '-', new_name)
+    return dst_dir, new_name
+
+
 ##########################################################
 # 定义类中所用到的数据结构和常量
 ##########################################################
-Area = namedtuple("Area", "min_row, max_row, min_col, max_col", defaults=(1, None, 1, None))
+# 检验结果中引用的图片，InlineImage 与具体的模板绑定，所以解析结果中只保存图片文件和宽度，渲染前再生成 InlineImage
+# 宽度使用 Emu 保存：Mm 等长度类型经过 pickle 传递到子进程后数值会被再次换算
+ImageRef = namedtuple("ImageRef", "file, width")
 # 定义图片的宽度
 WIDTH_REQ = Mm(54)
 WIDTH_RESULT = Mm(20)
 WIDTH_IMAGE = Mm(130)
 WIDTH_ATTACH = Mm(155)
-MAX_ROW = 100  # 当读取性能等EXEL文件时，由于返回的最大行数经常错误（maxrow=1），所以使用最大值
+# 并行预处理图片的线程数（图片的读取、解码、缩放和拷贝大部分时间不占用GIL）
+IMAGE_WORKERS = 8
+# “检验结果”大表格的生成方式：'stream' 由行的XML骨架直接生成（见 table_writer.py），'jinja' 由模板逐行渲染
+TABLE_WRITERS = ('stream', 'jinja')
+FAST_TABLES = ['tbl_result']
 
 # 定义报告结论页中“检验依据”的最大标准数目。
 # 如果超出这个数目，将会把“检验依据”另起一页。
@@ -98,18 +117,223 @@ MAX_CRITERIA = 10
 # 一览表中最后的不适用项目说明的默认值：
 NotSurport_comment = '被测设备不适用'
 
-# 线程结束时发送到 log_queue
-TASK_FINISH = "##任务完成##"
-
-# error Code
-CRITICAL_ERROR = 'critical'
-
 # 程序的执行目录
 if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
     EXE_DIR = sys._MEIPASS
 else:
     EXE_DIR = Path.cwd()
 
+
+##########################################################
+# 原始记录工作簿会话：每个任务只读取并解析一次xlsm文件
+# 1、文件内容一次性读入内存后以只读方式打开，不占用文件句柄，生成结束时可以正常重命名原始记录；
+# 2、同一sheet页、同一区域的数据只读取一次，后续直接返回缓存的结果；
+# 3、统计节省的工作簿解析次数（以前每次读取sheet页都会重新 load_workbook 一次）。
+##########################################################
+class WorkbookSession:
+    def __init__(self, file, backend=DEFAULT_BACKEND):
+        self.file = Path(file)
+        self.backend = backend
+        self._reader = None
+        self._open()
+        self.sheetnames = self._reader.sheetnames
+        self._cache = {}
+        # 以前的实现中，每次读取都需要重新解析一次工作簿：
+        self.requests = 0
+
+    def _open(self):
+        with open(self.file, 'rb') as f:
+            content = f.read()
+        # 文件内容的哈希，用于判断原始记录是否修改过（见 build_cache.py）
+        self.digest = hashlib.sha256(content).hexdigest()
+        self._reader = open_reader(content, self.backend)
+
+    # 并行模式下会话需要传递给子进程：只传递已缓存的数据，子进程中遇到未缓存的内容时再重新打开工作簿
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_reader'] = None
+        return state
+
+    @property
+    def parses_saved(self):
+        return max(self.requests - 1, 0)
+
+    def _get_reader(self, sheet):
+        if self._reader is None:
+            self._open()
+        return self._reader if self._reader.has_sheet(sheet) else None
+
+    # 与 Report.get_excel_data 的返回值相同：非空行的字符串列表，每行最后附加行号；sheet页不存在时返回None
+    def get_data(self, sheet, area):
+        self.requests += 1
+        key = (sheet, tuple(area))
+        if key in self._cache:
+            return self._cache[key]
+
+        reader = self._get_reader(sheet)
+        if reader is None:
+            return None
+        data = read_area(reader, sheet, area)
+        self._cache[key] = data
+        return data
+
+    # 读取单个单元格的值，例如：cell('基本信息', 'D34')
+    def cell(self, sheet, coordinate):
+        self.requests += 1
+        key = (sheet, coordinate)
+        if key not in self._cache:
+            reader = self._get_reader(sheet)
+            self._cache[key] = reader.cell(sheet, coordinate) if reader is not None else None
+        return self._cache[key]
+
+    def close(self):
+        if self._reader:
+            self._reader.close()
+            self._reader = None
+        self._cache = {}
+
+
+# 文件的状态（修改时间、大小），文件不存在时为 None
+def file_state(file):
+    try:
+        stat = Path(file).stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+##########################################################
+# 共用解析结果（get_shared）的依赖，在计算过程中自动记录：
+# reads：读取的原始记录区域及读取的数据；files：读取了内容的文件（仪表数据等）及其状态；
+# paths：通过 get_file 查找的文件是否存在（结果中只保存路径，与内容无关；文件的拷贝和图片处理另外进行）；
+# inputs：get_file 查找的文件，包括找不到的（复用结果时重新记入当前文档的缓存记录）；keys：使用的其他共用结果
+##########################################################
+class Dependencies:
+    def __init__(self, keys=()):
+        self.reads = {}  # (sheet, tuple(area)) -> (area, data)
+        self.files = {}  # 文件 -> file_state
+        self.paths = {}  # 文件 -> 是否存在
+        self.inputs = []
+        self.keys = list(keys)
+
+    # 依赖都没有变化时结果仍然有效；shared 为已确认有效的共用结果
+    def valid(self, session, shared):
+        return (all(key in shared for key in self.keys)
+                and all(file_state(file) == state for file, state in self.files.items())
+                and all(Path(file).exists() == exists for file, exists in self.paths.items())
+                and all(session.get_data(sheet, area) == data for (sheet, _), (area, data) in self.reads.items()))
+
+
+##########################################################
+# 监视模式（见 watch.py）下两次生成之间保留的内容，原始记录或引用的文件修改后只重新执行受影响的部分：
+# 1、原始记录未修改（只修改了图片、数据文件）时，直接使用上次的工作簿会话，不再重新读取xlsm文件；
+# 2、共用解析结果（检验结果、仪表性能数据等）的依赖（见 Dependencies）都没有变化时直接复用，否则重新解析；
+# 3、图片等文件的查找和拷贝结果（file_cache）在文件未修改、输出目录不变时复用；
+# 模板编译缓存、图片预处理的结果本来就保留在进程中。Report.run 开始时调用 restore，结束时调用 save。
+##########################################################
+class ReuseState:
+    def __init__(self):
+        self.xlsm_file = None
+        self.xlsm_state = None
+        self.session = None
+        self.shared = {}
+        self.deps = {}
+        self.file_cache = {}
+        self.file_states = {}
+        self.output_dir = None
+        self.runs = 0
+
+    def restore(self, report):
+        xlsm_file = Path(report.xlsm_file)
+        if self.xlsm_file != xlsm_file or file_state(xlsm_file) is None:
+            self.clear()
+            return
+        try:
+            if self.session is not None and file_state(xlsm_file) == self.xlsm_state:
+                log_show.info("原始记录未修改，使用上次读取的内容")
+                report.session, self.session = self.session, None
+            else:
+                self.close_session()
+                report.session = WorkbookSession(xlsm_file, report.reader_backend)
+            reused, changed = [], []
+            for key, deps in self.deps.items():
+                if deps.valid(report.session, report.shared):
+                    report.shared[key] = self.shared[key]
+                    report.shared_deps[key] = deps
+                    reused.append(key)
+                else:
+                    changed.append(key)
+        except Exception as e:  # 原始记录正在保存等，生成时再报告错误
+            log_show.debug(f"无法复用上次的解析结果：{e}")
+            report.shared.clear()
+            report.shared_deps.clear()
+            self.clear()
+            return
+        report.file_cache.update((key, file) for key, file in self.file_cache.items()
+                                 if file_state(file) == self.file_states.get(key))
+        report.file_cache_dir = self.output_dir
+        log_show.info(f"监视模式：复用上次的解析结果 {len(reused)} 项，重新解析 {len(changed)} 项，"
+                      f"复用文件 {len(report.file_cache)} 个")
+        if changed:
+            log_show.debug(f"重新解析：{'、'.join(str(key) for key in changed)}")
+
+    # 保留本次生成的内容（只保留本次用到的共用结果），工作簿会话由此对象接管，不再关闭
+    def save(self, report):
+        if self.session is not report.session:
+            self.close_session()
+        self.xlsm_file = Path(report.xlsm_file)
+        self.xlsm_state = file_state(self.xlsm_file)
+        self.session, report.session = report.session, None
+        self.deps = {key: deps for key, deps in report.shared_deps.items()
+                     if key in report.shared_used and key in report.shared}
+        self.shared = {key: report.shared[key] for key in self.deps}
+        self.file_cache = {key: file for key, file in report.file_cache.items() if file}
+        self.file_states = {key: file_state(file) for key, file in self.file_cache.items()}
+        self.output_dir = report.output_dir
+        self.runs += 1
+
+    def close_session(self):
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def clear(self):
+        self.close_session()
+        self.__init__()
+
+
+##########################################################
+# 并行模式下子进程使用的函数（子进程采用spawn方式启动，这些函数必须定义在模块顶层）
+##########################################################
+# 在子进程中生成一个文档，返回 (执行结果, 输出文件名, 耗时, 耗时记录, 缓存记录, others文件夹的处理记录)
+def render_in_process(xlsm_file, is_report, is_revision_mode, field_backend, image_dpi, reader_backend, table_writer,
+                      file_roots, state):
+    start = time.perf_counter()
+    report = Report(xlsm_file, task_type=1 if is_report else 0, is_revision_mode=is_revision_mode,
+                    field_backend=field_backend, image_dpi=image_dpi, reader_backend=reader_backend,
+                    table_writer=table_writer, file_roots=file_roots)
+    report.is_report = is_report
+    report.session, report.shared, report.shared_deps, report.file_cache = state
+
+    prefix = DocumentLogFilter(report.doc_name)
+    handler = process_log_handler()
+    handler.addFilter(prefix)
+    entry = None
+    try:
+        result = report.build_context()
+        if result != CRITICAL_ERROR:
+            result = report.render_document()
+        if result != CRITICAL_ERROR:
+            entry = report.build_entry()
+    finally:
+        report.close_session()
+        handler.removeFilter(prefix)
+    output_name = str(report.output_name) if report.output_name else ''
+    trace = report.trace.to_dict() if report.trace else None
+    others = report.others_store.records if report.others_store else []
+    return result, output_name, time.perf_counter() - start, trace, entry, others
+
+
 # Word 中的换行符: \a   换页符：\f
 # Report类继承自Thread对象，方便主模块将此作为线程使用
 class Report(threading.Thread):
@@ -134,7 +358,9 @@ class Report(threading.Thread):
         #################################################################
     '''
 
-    def __init__(self, xlsm_file, task_type=2, is_revision_mode=False):
+    def __init__(self, xlsm_file, task_type=2, is_revision_mode=False, parallel=False, field_backend=None,
+                 trace_dir=None, force=False, image_dpi=DEFAULT_IMAGE_DPI, reader_backend=DEFAULT_BACKEND,
+                 table_writer='stream', reuse=None, file_roots=None):
         super().__init__()
         self.daemon = True
         self._stop_event = threading.Event()
@@ -146,17 +372,68 @@ class Report(threading.Thread):
         self.task_type = task_type
         self.is_report = True
         self.is_revision_mode = is_revision_mode
+        # “报告+记录”时，是否在两个子进程中并行生成报告和记录
+        self.parallel = parallel
+        # 更新Word文档域的方式：FieldBackend对象，或者后端名称（'word'、'dirty'、'none'），为空时自动选择
+        if isinstance(field_backend, FieldBackend):
+            self.field_backend = field_backend
+        else:
+            self.field_backend = get_field_backend(field_backend)
+        # 各阶段耗时记录的保存目录，为空时保存在原始记录所在目录的“trace”文件夹中
+        self.trace_dir = trace_dir
+        # 为True时忽略缓存，总是重新生成
+        self.force = force
+        # 插入文档的图片按显示宽度和此分辨率缩小、重新压缩，为0时直接插入原图
+        self.image_dpi = image_dpi
+        self.image_preparer = get_image_preparer(image_dpi) if image_dpi else None
+        # 读取Excel表格的后端（见 xlsx_reader.py）：'stream' 或 'openpyxl'
+        self.reader_backend = reader_backend
+        # “检验结果”大表格的生成方式（见 TABLE_WRITERS），两种方式生成的文档相同
+        self.table_writer = table_writer
+        # 监视模式下两次生成之间保留的内容（ReuseState），为空时每次都重新解析
+        self.reuse = reuse
+        # 原始记录引用的文件（图片、数据、附件）只能在这些目录或模板目录中，为空时不限制（服务模式下使用）
+        self.file_roots = [Path(root).resolve() for root in file_roots] if file_roots else None
 
         # 其他暂时还无法赋值的参数：
         self.xlsm_dir = ''
         self.tpl = None
         self.template_dir = ''
-        self.workbook = None
+        self.session = None  # WorkbookSession类型，每个任务只解析一次原始记录
         self.context = {}
         self.output_name = None  # PATH类型
         self.output_dir = None  # PATH类型
         # 2023年新增加的变量：
         self.test_items = []
+        self.verdicts = None  # VerdictIndex类型，test_items 的统计索引
+        # run() 的执行结果，CRITICAL_ERROR 表示失败
+        self.run_result = None
+        # 各阶段的计数器：docx文件的解析和写入次数、读取的行数、插入的图片数、写入的字节数等
+        self.counters = Counter()
+        # 当前文档的耗时记录，以及本次任务中所有文档的耗时记录
+        self.trace = None
+        self.traces = []
+        self.trace_file = None
+        # “报告+记录”任务中两次生成共用的解析结果（与文档类型无关的内容只解析一次）：
+        self.shared = {}
+        self.file_cache = {}
+        # 共用解析结果的依赖（Dependencies）、本次任务用到的共用结果、正在计算的共用结果的依赖（可能嵌套）
+        self.shared_deps = {}
+        self.shared_used = set()
+        self._tracking = []
+        # file_cache 中的文件拷贝到的输出目录（监视模式下输出目录变化时需要重新拷贝）
+        self.file_cache_dir = None
+        # 生成结果的缓存清单，当前文档通过 get_file 引用的文件，更新域是否成功，直接使用缓存结果的文档
+        self.build_cache = None
+        self.inputs = {}
+        # 预先在线程池中处理的图片：get_file 的参数 -> Future（结果为 _get_file 的返回值）
+        self._prefetch = {}
+        self._counters_lock = threading.Lock()
+        # 输出目录下的'others'文件夹（跳过相同的文件，优先使用链接，最后才拷贝）
+        self.others_store = None
+        self.others_report = None
+        self.fields_updated = True
+        self.cached = []
 
 
 
@@ -174,19 +451,39 @@ class Report(threading.Thread):
 
         # 判断最后的执行状态(结果为CRITICAL_ERROR的不是正常退出，其他都是）
         run_result = None
+        start = time.perf_counter()
+        self.traces = []
+        if self.reuse is not None:
+            self.reuse.restore(self)
         try:
             while not self._stop_event.is_set():
-                for state in task_lst:
-                    self.is_report = state
-                    if self.generate_report() == CRITICAL_ERROR:
+                # 原始记录及引用的文件都没有变化的文档直接使用上次的生成结果：
+                fresh = {state: self.find_cached_output(state) for state in task_lst}
+                if self.parallel and len(task_lst) > 1 and not any(fresh.values()):
+                    if self.generate_parallel(task_lst) == CRITICAL_ERROR:
                         run_result = CRITICAL_ERROR
-                        self.stop()     # 发生错误时立即退出
+                else:
+                    for state in task_lst:
+                        self.is_report = state
+                        if fresh[state]:
+                            self.use_cached_output(fresh[state])
+                        elif self.generate_report() == CRITICAL_ERROR:
+                            run_result = CRITICAL_ERROR
+                            self.stop()     # 发生错误时立即退出
                 self.stop()     # 正常完成时退出
         except Exception as e:
             run_result = CRITICAL_ERROR
             log_show.critical(f"发生了严重错误：{e}")
             self.stop()     # 发生未被程序考虑的错误时立即退出
-
+        finally:
+            if self.reuse is not None:
+                self.reuse.save(self)
+            self.close_session()
+        self.save_trace(run_result, time.perf_counter() - start)
+        self.save_others_report(run_result)
+
+        # 保存执行结果，供命令行等不通过 log_queue 获取结果的调用方使用
+        self.run_result = run_result
         # 向 log_queue 发送任务完成的信号，同时将生成报告的完整路径名传递给主线程
         if run_result == CRITICAL_ERROR:
             msg = f"{TASK_FINISH}{CRITICAL_ERROR}"
@@ -198,25 +495,115 @@ class Report(threading.Thread):
     # 将所有任务串联起来，生成最终的报告或记录：
     ####################################################
     def generate_report(self):
-        # 根据输入的参数准备其他要用到的变量：
-        if self.is_report:
-            tpl_path = str(Path(EXE_DIR, r'templates', 'TestReport.docx'))
-            name = "检验报告"
+        if self.build_context() == CRITICAL_ERROR:
+            return CRITICAL_ERROR
+        if self.render_document() == CRITICAL_ERROR:
+            self.record_build(None)
+            return CRITICAL_ERROR
+        self.record_build(self.build_entry())
+        # 重命名原始记录
+        with self.trace.stage('rename_xlsm', '重命名原始记录'):
+            self.rename_xlsm()
+        self.trace.finish()
+
+    # 当前生成的文档名称
+    @property
+    def doc_name(self):
+        return "检验报告" if self.is_report else "原始记录"
+
+    # 当前文档使用的Word模板
+    @property
+    def tpl_path(self):
+        return Path(EXE_DIR, r'templates', 'TestReport.docx' if self.is_report else 'TestRecord.docx')
+
+    # 决定生成结果的输入（除 get_file 引用的文件之外）：任一项变化后都需要重新生成
+    def build_key(self):
+        return {
+            'version': VERSION,
+            'xlsm': self.session.digest,
+            'template': file_hash(self.tpl_path),
+            'revision_mode': self.is_revision_mode and not self.is_report,
+            'field_backend': self.field_backend.name,
+            'image_dpi': self.image_dpi,
+        }
+
+    # 当前文档的缓存记录；更新域失败时不缓存（下次需要重新生成）
+    def build_entry(self):
+        if not self.fields_updated:
+            return None
+        try:
+            return make_entry(self.build_key(), self.inputs, self.output_name)
+        except OSError as e:
+            log_show.warning(f"生成缓存记录失败：{e}")
+            return None
+
+    # 保存（entry 为None时删除）当前文档的缓存记录
+    def record_build(self, entry):
+        if self.build_cache is None:
+            return
+        if entry:
+            self.build_cache.record(self.doc_name, entry)
         else:
-            tpl_path = str(Path(EXE_DIR, r'templates', 'TestRecord.docx'))
-            name = "原始记录"
+            self.build_cache.discard(self.doc_name)
+
+    # 查找可以直接使用的上次生成结果：缓存清单保存在输出目录旁边，文件名为“输出目录名.build.json”
+    def find_cached_output(self, is_report):
+        self.is_report = is_report
+        if not Path(self.xlsm_file).exists():
+            return None  # 生成时再报告错误
+        if self.session is None:
+            self.session = WorkbookSession(self.xlsm_file, self.reader_backend)
+        try:
+            key_dic, info_dic, error = self.read_task_info()
+            if error:
+                return None  # 生成时再报告错误
+            dst_dir, _ = formal_names(info_dic, is_report)
+        except (KeyError, TypeError):
+            return None
+        if self.build_cache is None:
+            self.build_cache = BuildCache(Path(self.xlsm_file).parent / f'{dst_dir}.build.json')
+        if self.force:
+            return None
+        return self.build_cache.lookup(self.doc_name, self.build_key())
+
+    def use_cached_output(self, output):
+        self.output_name = output
+        self.output_dir = output.parent
+        self.cached.append(self.doc_name)
+        log_show.info('*' * 60)
+        log_show.info(f"原始记录及引用的文件均未修改，直接使用已生成的{self.doc_name}：")
+        log_show.info(str(output))
+        log_show.info("如需重新生成，请选择“强制重新生成”（命令行使用 --force）")
+        log_show.info('*' * 60)
+        self.rename_xlsm()
+
+    # 执行所有 generate_xxxx 任务，生成模板渲染所需的 context
+    # load_template=False 时不加载Word模板，仅用于并行模式下在主进程中预先完成共用内容的解析
+    def build_context(self, load_template=True):
+        # 根据输入的参数准备其他要用到的变量：
+        tpl_path = str(self.tpl_path)
+        name = self.doc_name
         self.xlsm_dir = self.xlsm_file.parent
-        self.tpl = DocxTemplate(tpl_path)
+        # 模板的预处理和Jinja编译结果缓存在内存和磁盘中（见 template_cache.py）
+        fast_loops = FAST_TABLES if self.table_writer == 'stream' else ()
+        self.tpl = CachedDocxTemplate(tpl_path, fast_loops=fast_loops) if load_template else None
+        self.inputs = {}
         self.template_dir = Path(tpl_path).parent
-        self.workbook = xl.load_workbook(self.xlsm_file)
+        if self.session is None:
+            self.session = WorkbookSession(self.xlsm_file, self.reader_backend)
         # 连续生成报告和记录时，防止重复生成结果内容：
         self.context = {}
         self.test_items = []
+        self.verdicts = None
+        self.counters = Counter()
+        self.trace = StageTrace(name if load_template else f"{name}（预解析）", self.counters)
+        self.traces.append(self.trace)
 
         # 参数都已准备好，开始生成报告：
-        log_show.info('*' * 60)
-        log_show.info(f"开始生成{name}")
-        log_show.info('*' * 60)
+        if load_template:
+            log_show.info('*' * 60)
+            log_show.info(f"开始生成{name}")
+            log_show.info('*' * 60)
         if self.is_report:
             task_names = [
                 ['打开原始记录表格，并读取原始记录中的基本任务信息', 'generate_task_info'],
@@ -249,47 +636,146 @@ class Report(threading.Thread):
             if hasattr(self, task[1]):
                 # info = str(i + 1) + '、正在：' + task[0] + '...'
                 log_show.info(task[0])
-                if getattr(self, task[1])() == CRITICAL_ERROR:
+                with self.trace.stage(task[1], task[0]):
+                    result = getattr(self, task[1])()
+                if result == CRITICAL_ERROR:
                     log_show.critical(f"{task[0]} 任务失败了！！")
                     self.stop()
                     return CRITICAL_ERROR
                     # info = '已完成：' + task[0] + '。'
                     # log_show.info(info)
+
+        if self.counters['image_bytes_in']:
+            size_in = self.counters['image_bytes_in'] / 1024 / 1024
+            size_out = self.counters['image_bytes_out'] / 1024 / 1024
+            log_show.info(f"插入的 {self.counters['images']} 张图片共 {size_in:.1f} MB，"
+                          f"缩小压缩后为 {size_out:.1f} MB（减少 {1 - size_out / size_in:.0%}）")
+
+    # 根据 context 渲染Word模板，并完成附加文档、删除空白页、修订模式、更新域等后续处理
+    # 渲染、附加文档、删除空白页和修订模式都在内存中的同一个文档对象上完成，docx文件只写入磁盘一次
+    def render_document(self):
+        name = self.doc_name
+        stage = self.trace.stage
         # context 中的内容已经更新完毕，返回给调用函数进行word模板文件渲染即可
         log_show.info('开始根据文档模板进行最终结果的渲染')
         # autoescape默认值为False，渲染的文档中如果有 <"&'> 等字符会有问题。
         # autoescape=True 可以解决这一问题
-        self.tpl.render(self.context, autoescape=True)
-        try:
-            self.tpl.save(str(self.output_name))
-        except Exception as e:
-            log_show.critical(f"保存文件失败！请确认下述文件是否已经打开：\n{self.output_name}")
-            self.stop()
-            return CRITICAL_ERROR
+        with stage('render', '模板渲染'):
+            cache = get_template_cache()
+            hits, misses = cache.hits, cache.misses
+            self.tpl.render(self.context, autoescape=True)
+            self.counters['docx_parse'] += 1  # 模板文件
+            self.counters['table_rows_fast'] += self.tpl.fast_rows_written
+            self.counters['template_compiled'] += cache.misses - misses
+        log_show.debug(f"模板缓存：复用 {cache.hits - hits} 次，重新预处理/编译 {cache.misses - misses} 次")
+        # 渲染后的文档对象（没有使用docxtpl的图片替换功能，可以直接使用 tpl.docx 保存）
+        doc = self.tpl.docx
 
         # 如果还有附件文档，则在生成文档的基础上进行处理
         log_show.info('开始处理附加文档')
-        self.generate_attach_document()
+        with stage('generate_attach_document', '处理附加文档'):
+            self.generate_attach_document(doc)
 
         # 删除word文档最后的空白页：
         log_show.info("开始查找并删除文档最后的空白页")
-        self.remove_last_blank_page()
-
-        # 更新Word文档域
-        log_show.info('开始更新word文档中的域')
-        self.update_word_fields()
+        with stage('remove_last_blank_page', '删除最后的空白页'):
+            self.remove_last_blank_page(doc)
 
         # 对于原始记录，打开文档的修订模式：
         if not self.is_report and self.is_revision_mode:
-            self.set_docx_trackRevisions()
+            with stage('set_docx_trackRevisions', '打开修订模式'):
+                self.set_docx_trackRevisions(doc)
             log_show.info('打开原始记录的修订模式')
 
+        # 先在本地计算与分页无关的域（SEQ、DOCPROPERTY、REF等），只有仍然存在依赖分页的域时才需要更新
+        with stage('evaluate_fields', '本地计算域'):
+            fields = FieldEvaluator(doc).evaluate()
+            self.counters['fields_computed'] += sum(fields.computed.values())
+            log_show.debug(fields.summary())
+            if fields.needs_word:
+                # 更新域的后端在保存前需要对文档进行的处理（例如将域标记为需要更新）
+                self.field_backend.prepare(doc)
+        try:
+            with stage('save', '保存文档'):
+                doc.save(str(self.output_name))
+                self.counters['docx_write'] += 1
+                self.counters['bytes_written'] += self.output_name.stat().st_size
+        except Exception as e:
+            log_show.critical(f"保存文件失败！请确认下述文件是否已经打开：\n{self.output_name}")
+            self.stop()
+            return CRITICAL_ERROR
+
+        # 更新Word文档域
+        self.fields_updated = True
+        if fields.needs_word:
+            log_show.info('开始更新word文档中的域')
+            with stage('update_word_fields', '更新Word域'):
+                self.fields_updated = self.update_word_fields()
+        else:
+            log_show.info('文档中的域已在本地计算完成，无需调用Word更新')
+
+        log_show.debug(f"{name}共解析docx文件 {self.counters['docx_parse']} 次，写入磁盘 {self.counters['docx_write']} 次")
+        log_show.info(f"{name}各阶段耗时（共 {self.trace.wall:.2f} 秒）：")
+        for line in self.trace.summary_lines():
+            log_show.info(line)
         log_show.info('*' * 60)
         log_show.info(f'渲染完成，{name}已生成！！')
         log_show.info("请双击左下角博鼎Logo快速打开目录查看")
         log_show.info('*' * 60)
 
-        # 重命名原始记录
+    ##########################################################
+    # 并行模式：报告和记录分别在独立的子进程中渲染（使用进程而不是线程，不受GIL的限制）
+    # 1、主进程先完成与文档类型无关的解析（以原始记录为准，包含全部隐藏行），解析结果传递给子进程；
+    # 2、子进程各自完成模板渲染、附加文档、删除空白页、更新域、修订模式等处理，日志加上文档名称后通过队列返回主进程；
+    # 3、全部完成后，由主进程统一重命名原始记录。
+    ##########################################################
+    def generate_parallel(self, task_lst):
+        log_show.info('并行模式：预先解析报告和记录共用的内容')
+        self.is_report = False
+        if self.build_context(load_template=False) == CRITICAL_ERROR:
+            return CRITICAL_ERROR
+        self.finish_prefetch()
+        self.trace.finish()
+        state = (self.session, self.shared, self.shared_deps, self.file_cache)
+
+        ctx = multiprocessing.get_context('spawn')
+        log_queue = ctx.Queue()
+        listener = QueueListener(log_queue, LoggerForwarder(log_show))
+        listener.start()
+        start = time.perf_counter()
+        try:
+            with ProcessPoolExecutor(max_workers=len(task_lst), mp_context=ctx,
+                                     initializer=init_process_logging,
+                                     initargs=(log_queue, log_show.getEffectiveLevel())) as pool:
+                futures = [pool.submit(render_in_process, str(self.xlsm_file), is_report, self.is_revision_mode,
+                                       self.field_backend.name, self.image_dpi, self.reader_backend,
+                                       self.table_writer, self.file_roots, state)
+                           for is_report in task_lst]
+                results = [future.result() for future in futures]
+        finally:
+            listener.stop()
+        elapsed = time.perf_counter() - start
+
+        run_result = None
+        for is_report, (result, output_name, seconds, trace, entry, others) in zip(task_lst, results):
+            self.traces.append(trace)
+            if others:
+                self.get_others_store().extend(others)
+            self.is_report = is_report
+            self.record_build(entry)
+            if result == CRITICAL_ERROR:
+                run_result = CRITICAL_ERROR
+            elif output_name:
+                self.output_name = Path(output_name)
+        busy = sum(result[2] for result in results)
+        log_show.info(f"并行生成共耗时 {elapsed:.1f} 秒，各文档单独耗时合计 {busy:.1f} 秒，加速比 {busy / elapsed:.2f}")
+
+        if run_result != CRITICAL_ERROR:
+            self.rename_xlsm()
+        return run_result
+
+    # 将原始记录重命名为与生成文档一致的名称
+    def rename_xlsm(self):
         # 获取不包含后缀的文件名：
         new_name = self.output_name.stem
         output_excel = Path(self.xlsm_file).parent / (new_name + '.xlsm')
@@ -297,11 +783,68 @@ class Report(threading.Thread):
             old_xlsm_file = self.xlsm_file
             try:
                 self.xlsm_file = Path(self.xlsm_file).rename(output_excel)
+                if self.session is not None:
+                    self.session.file = self.xlsm_file
             except Exception as e:
                 self.xlsm_file = old_xlsm_file
                 log_show.error(f'重命名原始记录表格文件时发生错误：{str(e)}')
 
 
+    # 关闭原始记录的工作簿会话，并输出节省的解析次数
+    def close_session(self):
+        if self.session is not None:
+            log_show.debug(f"原始记录共读取 {self.session.requests} 次，节省了 {self.session.parses_saved} 次工作簿解析")
+            self.session.close()
+            self.session = None
+
+    # 保存本次任务的耗时记录（JSON），保存失败不影响生成结果
+    def save_trace(self, run_result, seconds):
+        traces = [t for t in self.traces if t]
+        if not traces:
+            return None
+        job = {
+            'input': str(self.xlsm_file),
+            'task_type': self.task_type,
+            'parallel': self.parallel,
+            'field_backend': self.field_backend.name,
+            'result': run_result or 'ok',
+            'duration': round(seconds, 4),
+        }
+        try:
+            self.trace_file = write_trace(self.trace_dir, Path(self.xlsm_file).stem, job, traces)
+            log_show.debug(f"各阶段耗时记录已保存到：{self.trace_file}")
+        except Exception as e:
+            log_show.warning(f"保存耗时记录失败：{e}")
+        return self.trace_file
+
+    # 获取与文档类型（报告/记录）无关的解析结果：第一次调用时执行 func 并保存，之后直接返回保存的结果
+    # 注意：返回的结果在两次生成之间共用，使用时不能修改其中的内容
+    # depends 为 func 使用的其他共用结果（通过参数传入时需要指明，用于判断监视模式下结果是否仍然有效）
+    def get_shared(self, key, func, *args, depends=()):
+        self.shared_used.add(key)
+        if key in self.shared:
+            log_show.debug(f"复用已解析的内容：{key}")
+            deps = self.shared_deps.get(key)
+            for file in (deps.inputs if deps else ()):
+                self.inputs[str(file)] = None  # 与重新解析时一样记入当前文档引用的文件
+        else:
+            deps = Dependencies(depends)
+            self._tracking.append(deps)
+            try:
+                self.shared[key] = func(*args)
+            finally:
+                self._tracking.pop()
+            self.shared_deps[key] = deps
+        for outer in self._tracking:
+            outer.keys.append(key)
+            outer.inputs.extend(deps.inputs if deps else ())
+        return self.shared[key]
+
+    # 记录正在计算的共用结果读取的文件
+    def track_file(self, file):
+        for deps in self._tracking:
+            deps.files[str(file)] = file_state(file)
+
     ##########################################################
     # 结束线程：  因任务时间太短，没有必要使用此函数来暂停任务
     ##########################################################
@@ -312,13 +855,34 @@ class Report(threading.Thread):
     #   当dir_parent='images' 或 ‘data’ 时，返回的是原始记录下对应目录的文件
     #   当dir_parent='template' 及其他字符时，返回的是模板文件夹下‘images’目录下的文件
     def get_file(self, filename, dir_parent='images', makeCopy=True, name=''):
+        # 同一任务中同一文件只查找和拷贝一次：
+        key = (filename, dir_parent, makeCopy, name)
+        if key not in self.file_cache and key in self._prefetch:
+            try:
+                self.file_cache[key] = self._prefetch.pop(key).result()
+            except Exception as e:
+                log_show.debug(f"预先处理“{filename}”失败，重新处理：{e}")
+        if key not in self.file_cache:
+            self.file_cache[key] = self._get_file(filename, dir_parent, makeCopy, name)
+        file = self.file_cache[key]
+        # 当前文档引用的文件记录在缓存清单中；找不到的文件也记录（以后添加了此文件时需要重新生成）
+        path = file or self._file_path(filename, dir_parent)
+        self.inputs[str(path)] = None
+        for deps in self._tracking:  # 正在计算共用结果时，记录查找的文件
+            deps.paths[str(self._file_path(filename, dir_parent))] = file is not None
+            deps.inputs.append(path)
+        return file
+
+    def _file_path(self, filename, dir_parent='images'):
         if '\\' in filename or '/' in filename:  # filename包含路径信息
-            file = Path(filename)
-        else:
-            if dir_parent == 'template':
-                file = Path(self.template_dir, filename.strip())
-            else:
-                file = Path(self.xlsm_dir, dir_parent, filename.strip())
+            return Path(filename)
+        if dir_parent == 'template':
+            return Path(self.template_dir, filename.strip())
+        return Path(self.xlsm_dir, dir_parent, filename.strip())
+
+    def _get_file(self, filename, dir_parent='images', makeCopy=True, name=''):
+        file = self._file_path(filename, dir_parent)
+        self.check_file_root(file)
 
         if not file.exists():
             log_show.error(f"原始记录中找不到“{file}”文件!")
@@ -331,61 +895,161 @@ class Report(threading.Thread):
             else:
                 output_name = self.context['report_number'] + '_' + Path(file).name
 
-            # 在输出目录中新建'others'文件夹，并将文件拷贝到此文件夹中：
-            dest_dir = self.output_dir.joinpath('others')
-            dest_dir.mkdir(parents=True, exist_ok=True)
-            shutil.copy(file, Path(dest_dir.joinpath(output_name)))
+            # 在输出目录中新建'others'文件夹，并将文件存放到此文件夹中（内容相同时跳过，能链接时不拷贝）：
+            action = self.get_others_store().put(file, output_name)
+            with self._counters_lock:  # 可能在预处理图片的线程中执行
+                self.counters[f'others_{action}'] += 1
+                if action == COPY:
+                    self.counters['bytes_copied'] += file.stat().st_size
         return file
 
+    # 引用的文件不在 file_roots 中时任务失败，不读取、不拷贝到输出目录（否则服务模式下客户端可以取回服务器上的任意文件）
+    def check_file_root(self, file):
+        if self.file_roots is None:
+            return
+        resolved = Path(file).resolve()
+        roots = (self.file_roots + [Path(self.template_dir).resolve()]) if self.template_dir else self.file_roots
+        if not any(resolved.is_relative_to(root) for root in roots):
+            raise PermissionError(f"原始记录中引用的文件“{file}”不在允许的目录中")
+
+    def get_others_store(self):
+        dest_dir = self.output_dir.joinpath('others')
+        with self._counters_lock:
+            if self.others_store is None or self.others_store.dest_dir != dest_dir:
+                self.others_store = OthersStore(dest_dir)
+            return self.others_store
+
+    # 保存本次任务'others'文件夹中每个文件的处理方式（跳过/链接/拷贝），文件名为“输出目录名.others.json”
+    def save_others_report(self, run_result):
+        store = self.others_store
+        if store is None or not store.records:
+            return None
+        log_show.info(f"others 文件夹：{store.summary_line()}")
+        output_dir = store.dest_dir.parent
+        job = {'input': str(self.xlsm_file), 'task_type': self.task_type, 'result': run_result or 'ok'}
+        try:
+            self.others_report = store.write_report(output_dir.parent / f'{output_dir.name}.others.json', job)
+        except Exception as e:
+            log_show.warning(f"保存 others 文件夹的处理记录失败：{e}")
+        return self.others_report
+
+
+    # 收集原始记录中引用的所有图片，返回 [(get_file的文件名参数, 目录参数, 显示宽度), ...]
+    # 与 generate_task_info、process_excel_data、generate_attach_images 中的处理一致（报告不包含隐藏的图片）
+    def collect_image_refs(self):
+        refs = []
+        sheets = self.session.sheetnames
+        if '检验样品照片' in sheets:
+            rows = self.get_excel_data(self.xlsm_file, sheet='检验样品照片',
+                                       area=Area(min_row=6, max_row=None, min_col=2, max_col=4)) or []
+            for row in rows:
+                hide = str(row[2]).strip() if row[2] else '否'
+                if row[1] and not (self.is_report and hide == '是'):
+                    refs.append((str(row[1]), 'images', WIDTH_IMAGE))
+        if '检验结果' in sheets:
+            rows = self.get_excel_data(self.xlsm_file, sheet='检验结果',
+                                       area=Area(min_row=2, max_row=None, min_col=1, max_col=7)) or []
+            for row in rows:
+                if '图片' in row[4]:
+                    refs.append((row[4].split('图片')[-1].strip(), 'template', WIDTH_REQ))
+                if '图片' in row[5]:
+                    refs.append((row[5].split('图片')[-1].strip(), 'images', WIDTH_RESULT))
+        if '附件' in sheets:
+            rows = self.get_excel_data(self.xlsm_file, sheet='附件',
+                                       area=Area(min_row=3, max_row=20, min_col=2, max_col=5)) or []
+            for row in rows:
+                hide = str(row[3]).strip() if row[3] else '否'
+                if row[2] and not (self.is_report and hide == '是'):
+                    refs.append((str(row[2]), 'images', WIDTH_IMAGE))
+        return refs
+
+    # 在线程池中并行处理所有引用的图片（查找、拷贝到others目录、缩小压缩），不等待处理完成，
+    # 之后的 get_file 和 inline_image 直接取得处理结果（尚未完成时等待）
+    def prefetch_images(self):
+        widths = {}
+        for filename, dir_parent, width in self.collect_image_refs():
+            key = (filename, dir_parent, True, '')
+            if key not in self.file_cache and key not in self._prefetch:
+                widths.setdefault(key, set()).add(width)
+        if not widths:
+            return
+        pool = ThreadPoolExecutor(max_workers=min(IMAGE_WORKERS, len(widths)), thread_name_prefix='ImagePrep')
+        for key, key_widths in widths.items():
+            self._prefetch[key] = pool.submit(self._prefetch_image, key, key_widths)
+        pool.shutdown(wait=False)
+        log_show.debug(f"开始并行处理原始记录中引用的 {len(widths)} 个图片")
+
+    def _prefetch_image(self, key, widths):
+        file = self._get_file(*key)
+        if file and self.image_preparer:
+            for width in widths:
+                self.image_preparer.prepare(file, width)
+        return file
+
+    # 等待所有预先处理的图片完成，结果保存到 file_cache 中（并行模式下传递给子进程之前调用）
+    def finish_prefetch(self):
+        for key in list(self._prefetch):
+            self.get_file(*key)
 
     # 处理图片内容, tpl 为word 模板文件，file 为图片保存的文件名称
     def get_image(self, file, width=WIDTH_IMAGE, name=None):
         image = {}
         if Path(file).exists():
-            if width:
-                image['image'] = InlineImage(self.tpl, str(file), width=width)
-            else:
-                image['image'] = InlineImage(self.tpl, str(file))
+            image['image'] = self.inline_image(file, width)
             image['name'] = name if name else file.stem
         return image
 
+    # 将检验结果中的 ImageRef 转换为与当前模板绑定的 InlineImage
+    def bind_images(self, item):
+        for key in ('require', 'result'):
+            if isinstance(item[key], ImageRef):
+                item[key] = self.inline_image(item[key].file, item[key].width)
+        return item
+
+    # 生成插入文档的图片：先按显示宽度缩小、重新压缩（见 image_prep.py），再与当前模板绑定
+    def inline_image(self, file, width=None):
+        if width and self.image_preparer:
+            prepared = self.image_preparer.prepare(file, width)
+            self.counters['image_bytes_in'] += prepared.original_size
+            self.counters['image_bytes_out'] += prepared.size
+            file = prepared.file
+        self.counters['images'] += 1
+        if width:
+            return InlineImage(self.tpl, str(file), width=width)
+        return InlineImage(self.tpl, str(file))
+
     # 2023新增
     # 读取Excel文件中的特定区域，并返回列表数据：
     def get_excel_data(self, file, sheet, area):
         if not Path(file).exists():
             log_show.error(f"找不到'{file}'文件！")
             return None
-        workbook = xl.load_workbook(file, read_only=True)
-        if isinstance(sheet, int):  # 传入的sheet是数字，表示的是sheet页的索引Index
-            active_sheet = workbook.worksheets[sheet]
-        else:
-            if sheet in workbook.sheetnames:  # 传入的sheet是sheet页的名称
-                active_sheet = workbook[sheet]
+        # 原始记录本身的数据通过工作簿会话读取，不再重复解析xlsm文件：
+        if self.session is not None and Path(file) == self.xlsm_file:
+            data = self.session.get_data(sheet, area)
+            for deps in self._tracking:
+                deps.reads[(sheet, tuple(area))] = (area, data)
+            if data is None:
+                log_show.warning(f"找不到“{file}”文件的“{sheet}” sheet页！")
             else:
+                self.counters['rows_read'] += len(data)
+            return data
+        self.track_file(file)
+        reader = open_reader(file, self.reader_backend)
+        try:
+            if not reader.has_sheet(sheet):
                 log_show.warning(f"找不到“{file}”文件的“{sheet}” sheet页！")
                 return None
-
-        # 去掉原有表格中的dimensions值，否则 max_row 和 max_column 返回的值可能不正确，特别是仪表和其他程序自动生成的表格经常会返回A1:A1
-        # active_sheet.reset_dimensions()
-        # active_sheet.calculate_dimension(force=True)
-        if not area.max_row:
-            area = area._replace(max_row=active_sheet.max_row)
-        if not area.max_col:
-            area = area._replace(max_col=active_sheet.max_column)
-
-        # log_show(f"“{sheet}” sheet页中，行数为：{area.max_row}，列数为：{area.max_col}", 'blue')
-        data = []
-        for row_number, row in enumerate(active_sheet.iter_rows(*area, values_only=True), start=area.min_row):
-            if any(row):
-                row_data = ['' if i is None else str(i).strip() for i in row]  # 需要考虑单元格为数字0的情况，不能简单归为''
-                # row_data.insert(0, row_number)
-                row_data.append(row_number)
-                data.append(row_data)
-        workbook.close()
+            # 注意：表格中记录的范围（dimension）可能不正确，特别是仪表和其他程序自动生成的表格经常会返回A1:A1，
+            # 仪表数据的读取见 instrument_parsers.py
+            data = read_area(reader, sheet, area)
+        finally:
+            reader.close()
+        self.counters['rows_read'] += len(data)
         return data
 
-    # 处理检验结果sheet页中的数据，生成self.test_items
-    def process_excel_data(self):  # 存放测试结果的字典结构：
+    # 处理检验结果sheet页中的数据，返回 test_items 列表（报告和记录共用，其中的图片为 ImageRef）
+    def process_excel_data(self):  # 存放测试结果的 TestItem 列表（见 result_items.py）：
         # 打开原始记录 ('templates/TestRecord.xlsx')
         max_col = 7
         area = Area(min_row=2, max_row=None, min_col=1, max_col=max_col)
@@ -394,261 +1058,47 @@ class Report(threading.Thread):
             log_show.error(f"不存在”检验结果“sheet页，或者”检验结果“sheet页中没有有效数据！！")
             return None
 
-        keys = ['num', 'name', 'subname', 'unit', 'require', 'result', 'comment', 'row']
-        lst = []  # 用于存储处理后的结果
-        for row in data:
-            lst.append(dict(zip(keys, row)))
-
-        # 1: 判断ti的类型：
-        i = 0  # 初始化指针
-        while i < len(lst):
-            if lst[i]['subname'] == '' and lst[i]['unit'] == '' and lst[i]['require'] == '':  # 标题或说明
-                if '$' in lst[i]['num']:
-                    lst[i]['num'] = str(lst[i]['num']).replace('$', '')
-                    lst[i]['type'] = 10  # 项目编号中含有'$'字符，不是标题，而是说明之类文字
-                else:
-                    lst[i]['type'] = 2  # 为标题
-                i += 1  # 将指针向后移动
-            elif lst[i]['name'] and (not lst[i]['subname']):  # type = 11 or 12
-                if i == len(lst) - 1 or (i < len(lst) - 1 and lst[i + 1]['name']):  # 最后一个元素
-                    lst[i]['type'] = 11
-                    i += 1  # 将指针向后移动
-                else:
-                    j = i + 1  # 初始化另一个指针
-                    lst[i]['type'] = 12
-                    while j < len(lst) and lst[j]['name'] == '' and lst[j]['subname'] == '':
-                        lst[j]['type'] = 120
-                        lst[j]['name'] = lst[i]['name']
-                        j += 1  # 将指针向后移动
-                    i = j  # 将指针移动到下一个区间的起始位置
-            elif lst[i]['name'] and lst[i]['subname']:  # type=13
-                j = i + 1  # 初始化另一个指针
-                lst[i]['type'] = 13
-                while j < len(lst) and lst[j]['name'] == '' and lst[j]['subname']:
-                    lst[j]['type'] = 130
-                    lst[j]['name'] = lst[i]['name']
-                    j += 1  # 将指针向后移动
-                i = j  # 将指针移动到下一个区间的起始位置
-            else:  # 如果该元组不符合以上任何一种情况,数据有误
-                lst[i]['type'] = 21
-                log_show.error(f"原始记录中第 {lst[i]['row']} 行的数据有误，请检查修改！")
-                i += 1  # 将指针向后移动
-
-        # 2：
-        # 判断检测要求和检验结果中是否有图片，以及图片路径是否合法
-        # 增加 verdict 字段：
-        for ti in lst:
-            if ti['type'] < 11:
-                ti['verdict'] = None
-            else:  # 该行不是标题
-                # 检查单位、标准要求及检验结果列是否有空白，如果有，提示后退出程序
-                if not all([ti['unit'], ti['require'], ti['result']]):
-                    log_show.error(f"请检查原始记录中第 {ti['row']} 行，数据可能不完整！")
-
-                # 判断检测要求和检验结果中是否有图片，以及图片路径是否合法
-                if '图片' in ti['require']:  # 检验要求中包含图片
-                    file = ti['require'].split('图片')[-1].strip()  # 截取图片的文件名
-                    file = self.get_file(file, 'template')
-                    image = self.get_image(file, width=WIDTH_REQ)
-                    if image:
-                        ti['require'] = image['image']
-                    else:
-                        log_show.error(f"原始记录中第 {ti['row']} 行检测要求中的图片文件找不到！")
-
-                if '图片' in ti['result']:  # 检验结果中包含图片
-                    file = ti['result'].split('图片')[-1].strip()  # 截取图片的文件名
-                    file = self.get_file(file)
-                    image = self.get_image(file, width=WIDTH_RESULT)
-                    if image:
-                        ti['result'] = image['image']
-                    else:
-                        log_show.error(f"原始记录中第 {ti['row']} 行检验结果中的图片文件找不到！！")
-
-                # # 根据序号（是否带*)判断是否为参考项目；根据 ’result‘ 填写 ’verdict‘
-                # verdict: ['合格', '不合格', '--', 'ref']  含义： ‘--’ 为不支持项
-                if ti['comment'] in ['不合格', 'F', 'Fail', 'Failed']:
-                    ti['verdict'] = '不合格'
-                elif ti['result'] in ['/', '--', '不支持', '不适用', '允许不支持']:
-                    ti['result'] = '不适用'
-                    ti['verdict'] = '--'
-                elif '*' in ti['num']:
-                    ti['verdict'] = 'ref'
-                else:
-                    ti['verdict'] = '合格'
-
-        # 3: 增加 part 字段，判断标题层级：
-        part = 1
-        for ti in lst:
-            num = ti['num']
-            level = len(num.split('.')) if num.split('.')[-1] else (len(num.split('.')) - 1)
-            if ti['type'] < 10:
-                if '第一' in num:
-                    ti['type'] = 0
-                elif '第二' in num:
-                    ti['type'] = 0
-                    part = 2
-                elif level < 2:  # 是一级标题
-                    ti['type'] = 1
-                ti['counter'] = Counter()  # 所有的标题项都加入了‘counter’键，防止后续读取时出现‘key error’
-            ti['part'] = part
-
-        # 4: 增加 stub 字段，对于 stub 标题增加统计项目，并将全部未测试的标题项目删除；
-        # 测试项目中的num按照大排列重新编号
-        i = 0
-        seq = 1
-        while i < len(lst):
-            if i == len(lst) - 1:
-                lst[i]['stub'] = 0
-                self.test_items.append(lst[i])  # 最后一个元素直接加入结果列表
-                i += 1
-            elif lst[i]['type'] < 10 <= lst[i + 1]['type']:
-                j = i + 2
-                while j < len(lst) and lst[j]['type'] >= 10:
-                    j += 1
-                cnt = Counter([cc['verdict'] for cc in lst[(i + 1):j]])
-                cnt['tested'] = cnt['合格'] + cnt['不合格'] + cnt['ref']  # 实测项目数 = 合格项目数 + 不合格项目数 + 参考项数
-                cnt['total'] = cnt['tested'] + cnt['--']  # 应测项目数 = 实测项目数 + 不支持项目数
-                if cnt['tested']:  # 有实际测试的项目时
-                    lst[i]['counter'] = cnt
-                    lst[i]['stub'] = 2
-                    # 测试项目中的num按照大排列重新编号，参考项目序号前加“*”
-                    ii = i + 1
-                    while ii < j:
-                        if lst[ii]['type'] > 10:
-                            if lst[ii]['verdict'] == 'ref':
-                                lst[ii]['num'] = '*' + str(seq)
-                            else:
-                                lst[ii]['num'] = str(seq)
-                            seq += 1
-                        ii += 1
-                    self.test_items.extend(lst[i:j].copy())
-                elif cnt['total']:  # 已测项目数为0，但应测项目数不为0的项目，stub赋值为1
-                    lst[i]['counter'] = Counter()
-                    lst[i]['stub'] = 1
-                    self.test_items.append(lst[i])
-                else:  # 后面都是 type=10 的注释项目：
-                    lst[i]['stub'] = 0
-                    self.test_items.extend(lst[i:j].copy())
-                cnt = Counter()
-                i = j
-            else:
-                lst[i]['stub'] = 0
-                self.test_items.append(lst[i])  # 元素直接加入结果列表
-                i += 1
-
-        # 写入一级标题的统计数据：
-        i = 0
-        while i < len(self.test_items):
-            if self.test_items[i]['type'] == 1:  # 一级标题
-                j = i + 1
-                while j < len(self.test_items) and self.test_items[j]['type'] != 1:
-                    j += 1
-                c1 = Counter([cc['verdict'] for cc in self.test_items[(i + 1):j] if cc['type'] > 10])
-                c1['tested'] = c1['合格'] + c1['不合格'] + c1['ref']  # 实测项目数 = 合格项目数 + 不合格项目数 + 参考项数
-                c1['total'] = c1['tested'] + c1['--'] if c1['tested'] else 0  # 应测项目数 = 实测项目数 + 不支持项目数
-                self.test_items[i]['counter'] = c1
-                i = j
+        # 类型、判定结果、部分/层级、末梢标题的统计和重新编号见 result_items.classify
+        return classify(data, self.resolve_item_images)
+
+    # 判断检测要求和检验结果中是否有图片，以及图片路径是否合法，图片保存为 ImageRef
+    def resolve_item_images(self, ti):
+        if '图片' in ti['require']:  # 检验要求中包含图片
+            file = ti['require'].split('图片')[-1].strip()  # 截取图片的文件名
+            file = self.get_file(file, 'template')
+            if file:
+                ti['require'] = ImageRef(file, Emu(WIDTH_REQ))
             else:
-                i += 1
+                log_show.error(f"原始记录中第 {ti['row']} 行检测要求中的图片文件找不到！")
 
-        # for ti in self.test_items:
-        #     if ti['type'] == 1:
-        #         log_show(ti)
+        if '图片' in ti['result']:  # 检验结果中包含图片
+            file = ti['result'].split('图片')[-1].strip()  # 截取图片的文件名
+            file = self.get_file(file)
+            if file:
+                ti['result'] = ImageRef(file, Emu(WIDTH_RESULT))
+            else:
+                log_show.error(f"原始记录中第 {ti['row']} 行检验结果中的图片文件找不到！！")
 
-    # 读取TestCenter生成的性能表格（XLSX）的数据
+    # 读取仪表（TestCenter、信而泰等）生成的性能表格（XLSX）的数据，仪表类型的识别和解析见 instrument_parsers.py
     def get_performance(self, file_main, file_light=None):
+        self.track_file(file_main)
+        if file_light:
+            self.track_file(file_light)
         if not Path(file_main).exists():
             log_show.error(f"找不到'{file_main}'文件！")
             return None
-        throughput = []
-        latency = []
-        frame_loss = []
-        workbook = xl.load_workbook(file_main, read_only=True)
-        # 判断仪表类型并准备数据:
-        if 'Test Summary Table' in workbook.sheetnames:  # SPIRENT的仪表
-            log_show.debug("使用了SPIRENT的仪表测试性能")
-            area_throughput = Area(min_row=5, max_row=MAX_ROW, min_col=3, max_col=7)
-            sheet_troughput = 'Test Summary Table'
-
-            area_latency = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=6)
-            sheet_latency = 'Advanced Test Summary Ta'
-
-            area_latency10 = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=4)
-            sheet_latency10 = 'Test Summary Table'
-
-        elif '测试汇总表' in workbook.sheetnames:  # 信而泰的仪表
-            log_show.debug("使用了信而泰的仪表测试性能")
-            area_throughput = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=5)
-            sheet_troughput = '测试汇总表'
-
-            area_latency = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=6)
-            sheet_latency = '高级测试汇总表'
-
-            area_latency10 = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=4)
-            sheet_latency10 = '测试汇总表'
-
-        else:
+        result = read_performance(file_main, file_light, self.reader_backend)
+        if result is None:
             log_show.error(f"找不到“{file_main}”文件的性能sheet页！")
             return None
-
-        # 读取性能数据中的吞吐量值:
-        log_show.info('读取性能数据中的吞吐量值')
-        throughput_lst = []
-        rows = self.get_excel_data(file_main, sheet=sheet_troughput, area=area_throughput)
-        if rows:
-            throughput = [[round_liug(row[0]), round_liug(row[4]), round_liug(row[3], 2)] for row in
-                          rows]
-            throughput_lst = [row[3] for row in rows]
-
-        # # 读取性能数据中的吞吐量下时延和丢帧率:
-        log_show.info('读取性能数据中的吞吐量下时延和丢帧率')
-        rows = self.get_excel_data(file_main, sheet=sheet_latency, area=area_latency)
-        if rows:
-            log_show.info('读取性能数据中的线速丢帧率')
-            frame_loss = [[round_liug(row[0]), round_liug(row[3], 3)] for row in rows if round_liug(row[1]) == 100]
-            # 读取性能数据中的吞吐量下时延
-            log_show.info('读取性能数据中的时延')
-            # 读取吞吐量值在前面汇总的列表中、同时丢包率是0的数据：
-            latency = [[round_liug(row[0]), round_liug(row[5], 2)] for row in rows if
-                       row[2] in throughput_lst and round_liug(row[3], 3) == '0.000']
-            # latency = [[round_liug(row[0]), round_liug(row[5], 2)] for row in rows if row[2] in throughput_lst and row[3] == '0']
-        # log_show(latency)
-
-        latency10 = None
-        if Path(file_light).exists():
-            # 读取轻载时延数据，通常在另外一个Excel文件file_light当中
-            log_show.info('读取轻载时延数据')
-            area = Area(min_row=5, max_row=MAX_ROW, min_col=1, max_col=4)
-            rows = self.get_excel_data(file_light, sheet=sheet_latency10, area=area_latency10)
-            if rows:
-                latency10 = [[round_liug(row[0]), round_liug(row[3], 2)] for row in rows]
-        # log_show(latency10)
-
-        return throughput, latency, frame_loss, latency10
+        *performance, rows_read = result
+        self.counters['rows_read'] += rows_read
+        return tuple(performance)
 
     # 生成规范化的文件名称 ：报告编号_厂家_设备名称_设备型号，并将文件名中的非法字符,用‘-’替换
     # 创建输出目录；生成输出的文件名称
     def set_formal_name(self):
-        report_number = self.context['report_number']
-        manufacturer = self.context['manufacturer']
-        equipment_type = self.context['equipment_type']
-        equipment_model = self.context['equipment_model']
-
-        # 去除设备厂商名称中的“技术有限公司“、”技术公司”等信息以简化报告名称：
-        removal = ["科技发展股份有限公司", "科技股份有限公司", "技术股份有限公司", "产业股份有限公司",
-                   "科技有限责任公司", "科技有限公司", "技术有限公司", "股份有限公司", "有限责任公司", "有限公司"]
-        for string in removal:
-            manufacturer = manufacturer.replace(string, "")
-
-        dst_dir = report_number + '_' + manufacturer + '_' + equipment_type + '_' + equipment_model
-        if self.is_report:
-            new_name = report_number + '_报告'
-        else:
-            new_name = report_number + '_记录'
-        new_name = new_name + '_' + manufacturer + '_' + equipment_type + '_' + equipment_model
-        # 去掉文件名中的非法字符,用‘-’替换
-        dst_dir = re.sub(r'[/:*?"<>|+\\\s]', '-', dst_dir)
-        new_name = re.sub(r'[/:*?"<>|+\\\s]', '-', new_name)
+        dst_dir, new_name = formal_names(self.context, self.is_report)
 
         self.output_dir = Path(self.xlsm_dir).joinpath(dst_dir)
         # 创建输出目录
@@ -657,21 +1107,13 @@ class Report(threading.Thread):
         self.output_dir.mkdir(parents=True, exist_ok=True)
         self.output_name = Path(self.output_dir).joinpath(new_name + '.docx')
 
-    # ######################################################################
-    # 以下函数为生成Word的具体内容：
-    # generate_xxxx 函数为最终生成报告内容的方法,返回值如果为None，则为异常退出；正常退出返回True
-    # 生成报告的基本任务信息
-    def generate_task_info(self):
-        if not Path(self.xlsm_file).exists():
-            log_show.critical(f"找不到'{self.xlsm_file}' 原始表格文件！!")
-            return CRITICAL_ERROR
-
+    # 读取“map”页中的变量名称和“基本信息”页中的任务信息，返回 (key_dic, info_dic, 错误信息)
+    def read_task_info(self):
         # 读取 “map” sheet页，获得变量的名称
         area = Area(min_row=2, max_row=None, min_col=3, max_col=4)
         rows = self.get_excel_data(self.xlsm_file, sheet='map', area=area)
         if not rows:
-            log_show.critical("原始记录XLSM文档中未包含'map'页,获取模板中的变量名称失败！！")
-            return CRITICAL_ERROR
+            return None, None, "原始记录XLSM文档中未包含'map'页,获取模板中的变量名称失败！！"
 
         key_dic = {row[0]: row[1] for row in rows if row[1]}
 
@@ -679,8 +1121,7 @@ class Report(threading.Thread):
         area = Area(min_row=2, max_row=None, min_col=3, max_col=4)
         rows = self.get_excel_data(self.xlsm_file, sheet='基本信息', area=area)
         if not rows:
-            log_show.critical("原始记录XLSM文档中未包含'基本信息'页,获取任务基本信息失败！！")
-            return CRITICAL_ERROR
+            return None, None, "原始记录XLSM文档中未包含'基本信息'页,获取任务基本信息失败！！"
         # info_dic = {key_dic[row[0]]: row[1] for row in rows if row[1]}
         info_dic = {}
         for row in rows:
@@ -688,8 +1129,22 @@ class Report(threading.Thread):
                 info_dic[key_dic[row[0]]] = row[1]
 
             elif row[0] and not row[1]:
-                log_show.critical(f"原始记录 “基本信息” sheet页中的 “{row[0]}” 还未填写，请确认！!")
-                return CRITICAL_ERROR
+                return None, None, f"原始记录 “基本信息” sheet页中的 “{row[0]}” 还未填写，请确认！!"
+        return key_dic, info_dic, None
+
+    # ######################################################################
+    # 以下函数为生成Word的具体内容：
+    # generate_xxxx 函数为最终生成报告内容的方法,返回值如果为None，则为异常退出；正常退出返回True
+    # 生成报告的基本任务信息
+    def generate_task_info(self):
+        if not Path(self.xlsm_file).exists():
+            log_show.critical(f"找不到'{self.xlsm_file}' 原始表格文件！!")
+            return CRITICAL_ERROR
+
+        key_dic, info_dic, error = self.read_task_info()
+        if error:
+            log_show.critical(error)
+            return CRITICAL_ERROR
 
         # 对于项目一览表中额外说明信息的处理。如果为“/" 或者 "无" 等字符长度小于2的内容，则处理为空字符。
         other_comment = info_dic.get('toc_other', '')
@@ -703,6 +1158,13 @@ class Report(threading.Thread):
 
         # 生成输出的目录和输出的文件名称：
         self.set_formal_name()
+        # 监视模式下输出目录变化（报告编号等修改）时，文件需要重新拷贝到新的 others 文件夹
+        if self.file_cache_dir is not None and self.file_cache_dir != self.output_dir:
+            self.file_cache.clear()
+        self.file_cache_dir = self.output_dir
+
+        # 输出目录确定后，在后台并行处理原始记录中引用的所有图片：
+        self.prefetch_images()
 
         # 读取 “检验样品照片” sheet页，读取拍摄时间和拍摄地点：
         area = Area(min_row=2, max_row=3, min_col=2, max_col=3)
@@ -778,9 +1240,8 @@ class Report(threading.Thread):
 
         # 读取‘基本信息’ sheet页中的 结论页报告依据中最大条数：
         maxCr = MAX_CRITERIA
-        if '基本信息' in self.workbook.sheetnames:
-            sheet1 = self.workbook['基本信息']
-            maxGet = sheet1['D34'].value
+        if '基本信息' in self.session.sheetnames:
+            maxGet = self.session.cell('基本信息', 'D34')
             if maxGet:
                 maxCr = int(maxGet)
 
@@ -803,24 +1264,19 @@ class Report(threading.Thread):
     def generate_conclusion(self):
         con_ret = []
         for part in range(1, 3):
-            c_part = Counter([t['verdict'] for t in self.test_items if t['type'] > 10 and t['part'] == part])
+            c_part = self.verdicts.count(part)
             # 应测项目数：
             n_total = c_part['合格'] + c_part['不合格'] + c_part['--'] + c_part['ref']
             # 实测项目数：
             n_tested = c_part['合格'] + c_part['不合格'] + c_part['ref']
-            # 不支持项列表
-            na_lst = [t['num'] for t in self.test_items if
-                      t['type'] > 10 and t['part'] == part and t['verdict'] == '--']
-            # 参考项列表
-            ref_lst = [t['num'] for t in self.test_items if
-                       t['type'] > 10 and t['part'] == part and t['verdict'] == 'ref']
-            # 不合格项列表
-            fail_lst = [t['num'] for t in self.test_items if
-                        t['type'] > 10 and t['part'] == part and t['verdict'] == '不合格']
-
-            str_na = '（第' + format_lst(na_lst) + '项）' if len(na_lst) else ''
-            str_ref = '（第' + format_lst(ref_lst) + '项）' if len(ref_lst) else ''
-            str_fail = '（第' + format_lst(fail_lst) + '项）' if len(fail_lst) else ''
+            # 不支持项、参考项、不合格项的序号段
+            na_runs = self.verdicts.number_runs(part, '--')
+            ref_runs = self.verdicts.number_runs(part, 'ref')
+            fail_runs = self.verdicts.number_runs(part, '不合格')
+
+            str_na = '（第' + format_runs(na_runs) + '项）' if len(na_runs) else ''
+            str_ref = '（第' + format_runs(ref_runs) + '项）' if len(ref_runs) else ''
+            str_fail = '（第' + format_runs(fail_runs) + '项）' if len(fail_runs) else ''
 
             if n_total > 0:
                 con_part = "应测项：根据被检设备情况及相应标准，共{0}项；\a".format(str(n_total))
@@ -857,7 +1313,7 @@ class Report(threading.Thread):
         data = {}
         c_total = Counter()
         for part in range(1, 3):
-            tis = [ti for ti in self.test_items if ti['type'] < 10 and ti['part'] == part]
+            tis = self.verdicts.part_headings(part)
             if len(tis) == 0:
                 break
             c_part = Counter()
@@ -896,7 +1352,7 @@ class Report(threading.Thread):
     # 2023New
     # 生成一览表中的允许不支持项情况说明列表：
     def generate_notSupport(self):
-        tis = [ti for ti in self.test_items if ti['type'] > 10 and ti['verdict'] == '--']
+        tis = self.verdicts.not_supported
         # tbl_lst = [{key: tis[key] for key in
         #             ['num', 'name', 'subname', 'comment']}]
         tbl_lst = []
@@ -988,49 +1444,12 @@ class Report(threading.Thread):
         #                   ]
         #       }
 
-        # 调用测试结果的预处理，生成 test_items 列表
-        self.process_excel_data()
-
-        # 初始化变量
-        tbl_result = []
-        tbl = {}
-        data_lst = []
-        i = 0
-        while i < len(self.test_items):
-            tbl['type'] = self.test_items[i]['type']
-            tbl['title'] = self.test_items[i]['name']
-            if tbl['type'] < 11:  # 标题或说明
-                tbl['num'] = self.test_items[i]['num']
-                tbl['data'] = []
-                i += 1
-            elif tbl['type'] == 11:
-                dic_temp = {key: self.test_items[i][key] for key in
-                            ['num', 'name', 'subname', 'unit', 'require', 'result', 'verdict', 'comment']}
-                if dic_temp['verdict'] == 'ref':
-                    dic_temp['verdict'] = '--'
-                tbl['data'] = [dic_temp]
-                i += 1
-            elif tbl['type'] == 12 or tbl['type'] == 13:
-                j = i + 1
-                while j < len(self.test_items) and self.test_items[j]['type'] > 100:
-                    j += 1
-                ii = i
-                while ii < j:
-                    dic_temp = {key: self.test_items[ii][key] for key in
-                                ['num', 'name', 'subname', 'unit', 'require', 'result', 'verdict', 'comment']}
-                    if dic_temp['verdict'] == 'ref':
-                        dic_temp['verdict'] = '--'
-                    data_lst.append(dic_temp)
-                    ii += 1
-                tbl['data'] = data_lst.copy()
-                data_lst = []
-                i = j
-
-            tbl_result.append(tbl.copy())
-            tbl = {}
-
-        # for ti in tbl_result:
-        #     log_show(ti)
+        # 调用测试结果的预处理，生成 test_items 列表（报告和记录共用同一份解析结果）
+        self.test_items = self.get_shared('test_items', self.process_excel_data) or []
+        # 结论、一览表等使用的统计索引，只建立一次
+        self.verdicts = self.get_shared('verdict_index', VerdictIndex, self.test_items, depends=['test_items'])
+
+        tbl_result = result_table(self.test_items, self.bind_images)
         self.context['tbl_result'] = tbl_result
 
     # 2023New:
@@ -1038,7 +1457,7 @@ class Report(threading.Thread):
     def generate_instrument(self):
         # 读取 “检验用仪表” sheet页，获得检验用仪表列表
         area = Area(min_row=2, max_row=None, min_col=1, max_col=11)
-        if '检验用仪表' not in self.workbook.sheetnames:
+        if '检验用仪表' not in self.session.sheetnames:
             log_show.error(f"原始记录中找不到名称为 “检验用仪表” 的sheet页，请确认！")
             return None
         rows = self.get_excel_data(self.xlsm_file, sheet='检验用仪表', area=area)
@@ -1064,7 +1483,7 @@ class Report(threading.Thread):
     def generate_tester_tbl_old(self):
         # ti.type = 0 ：目前只包含两个：第一部分：网络信息安全  、 第二部分：互联互通
         # ti.type = 1 ：1级标题
-        tis = [ti for ti in self.test_items if ti['type'] < 2]
+        tis = self.verdicts.level1
         tbl_lst = []
         tbl_dic = {'num': '', 'title': '', 'type': '', 'tester': '', 'auditor': ''}
         for ti in tis:
@@ -1118,7 +1537,7 @@ class Report(threading.Thread):
     # 生成报告附件中的性能测试表格
     def generate_perform_tbl(self):
         # 读取 “附件” sheet页，获取性能数据的文件名：
-        if '传输性能' not in self.workbook.sheetnames:
+        if '传输性能' not in self.session.sheetnames:
             log_show.warning(f"原始记录中找不到名称为 “传输性能” 的sheet页，请确认!")
             return None
         area = Area(min_row=3, max_row=7, min_col=2, max_col=5)
@@ -1146,8 +1565,10 @@ class Report(threading.Thread):
                     perform['num'] = '\f\n表' + str(num) + ' '
                 perform['title'] = row[0]
                 perform['ports'] = row[3]
+                # 仪表导出的性能数据与文档类型无关，“报告+记录”时只解析一次：
                 perform['throughput'], perform['latency'], perform['frame_loss'], perform[
-                    'latency10'] = self.get_performance(file_main, file_light)
+                    'latency10'] = self.get_shared(('performance', str(file_main), str(file_light)),
+                                                   self.get_performance, file_main, file_light)
                 perform_lst.append(perform.copy())
         # log_show(perform_lst)
         self.context['perform_lst'] = perform_lst
@@ -1156,7 +1577,7 @@ class Report(threading.Thread):
     def generate_attach_images(self):
         # 读取 “附件” sheet页，获取图片的文件名：
         area = Area(min_row=3, max_row=20, min_col=2, max_col=5)
-        if '附件' not in self.workbook.sheetnames:
+        if '附件' not in self.session.sheetnames:
             log_show.warning(f"原始记录中找不到名称为 “附件” 的sheet页。")
             return None
         rows = self.get_excel_data(self.xlsm_file, sheet='附件', area=area)
@@ -1188,8 +1609,8 @@ class Report(threading.Thread):
                 image_lst.append(image_dic.copy())
         self.context['attachment_images'] = image_lst
 
-    # 附件中插入文档
-    def generate_attach_document(self):
+    # 附件中插入文档：直接追加到内存中的文档对象 doc 中
+    def generate_attach_document(self, doc):
         # 读取 “附件” sheet页，获取文档的文件名：
         area = Area(min_row=23, max_row=30, min_col=2, max_col=5)
         rows = self.get_excel_data(self.xlsm_file, sheet='附件', area=area)
@@ -1208,20 +1629,16 @@ class Report(threading.Thread):
             attach_file = self.get_file(str(row[2]), 'data')
             if attach_file and attach_file.exists():
                 attach = Document(str(attach_file))
+                self.counters['docx_parse'] += 1
                 if not middle_docx:  # 第一次时执行
-                    master = Document(str(self.output_name))
-                    # master.add_page_break()   # 文档之间加入分页符
-                    middle_docx = Composer(master)
+                    # doc.add_page_break()   # 文档之间加入分页符
+                    middle_docx = Composer(doc)
                 # attach.add_page_break()
                 middle_docx.append(attach)
-        if middle_docx:
-            middle_docx.save(str(self.output_name))
         return None
 
-    # 打开word文档的修订模式：
-    def set_docx_trackRevisions(self):
-        # 打开文档
-        doc = Document(str(self.output_name))
+    # 打开word文档的修订模式（修改内存中的文档对象 doc）：
+    def set_docx_trackRevisions(self, doc):
         # 在settings.xml中启用修订模式
         settings = doc.part.settings
         settings_xml = settings._element
@@ -1236,62 +1653,13 @@ class Report(threading.Thread):
             # 修改现有标签
             track_revisions.set('w:val', '1')  # '1'=启用, '0'=禁用
 
-        # 保存文档
-        doc.save(str(self.output_name))
-
-    # 更新word文档域
-    # 强制全选并更新（模拟Ctrl+A + F9）
+    # 更新word文档域，具体的更新方式由 field_backend 决定（见 word_fields.py）
     def update_word_fields(self):
-        """
-        使用win32com控制Word应用程序来更新域
-        这种方法模拟Ctrl+A和F9的效果
-        """
-        word = None
-        doc = None
-        try:
-            # 启动Word应用程序
-            word = win32.Dispatch("Word.Application")
-            word.Visible = False  # 隐藏Word窗口
-            word.DisplayAlerts = False  # 禁用所有警告对话框
-
-            # 打开文档
-            doc = word.Documents.Open(str(self.output_name))
-            time.sleep(2)
-            
-            # 方法1: 更新整个文档中的所有域
-            doc.Fields.Update()
-            
-            # 方法2: 全选文档内容并更新域（备用方法）
-            word.Selection.WholeStory()
-            word.Selection.Fields.Update()
-
-            # 保存文档
-            doc.Save()
-
-            log_show.info("Word文档域更新完成")
-
-        except Exception as e:
-            log_show.warning(f"Word文档域更新操作失败: {e}")
+        return self.field_backend.update(self.output_name)
 
-        finally:
-            # 清理资源
-            if doc:
-                try:
-                    doc.Close()
-                except:
-                    pass
-            if word:
-                try:
-                    word.Quit()
-                except:
-                    pass
-
-    # 删除Word文档中最后的空白页
-    def remove_last_blank_page(self):
+    # 删除Word文档中最后的空白页（修改内存中的文档对象 doc）
+    def remove_last_blank_page(self, doc):
         try:
-            # 打开Word文档
-            doc = Document(str(self.output_name))
-
             # 获取文档中的所有段落
             paragraphs = doc.paragraphs
 
@@ -1326,8 +1694,6 @@ class Report(threading.Thread):
                     else:
                         break
 
-            # 保存修改后的文档
-            doc.save(str(self.output_name))
             log_show.info(f"文档已查找并删除最后的空白页。")
 
         except Exception as e:
@@ -0,0 +1,309 @@
+import logging
+from collections import Counter
+
+########################################
+# “检验结果”sheet页中的检验项目（TestItem）及其分类：
+# 1、TestItem 使用 __slots__ 保存各字段，同时支持原来字典方式的访问（ti['type']）；
+# 2、classify 一次遍历完成类型判断、判定结果、部分/层级、末梢标题的统计、重新编号和一级标题的统计，
+#    结果与原来的多次遍历（见 benchmarks/classifier.py 中的 legacy_classify）完全相同；
+# 3、result_table 一次遍历生成“检验结果”表格的数据。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+# 判定为不合格的备注、不适用的检验结果
+FAIL_COMMENTS = ('不合格', 'F', 'Fail', 'Failed')
+NA_RESULTS = ('/', '--', '不支持', '不适用', '允许不支持')
+
+
+##########################################################
+# 检验项目，字段与原来的字典相同：
+# num, name, subname, unit, require, result, comment, row：原始记录中的数据及行号
+# type：  0 第一/第二部分，1 一级标题，2 其他标题，10 说明，11 单行项目，12/120 多行项目（无子项），
+#         13/130 多行项目（有子项），21 数据有误
+# verdict：['合格', '不合格', '--', 'ref', None]  含义： ‘--’ 为不支持项，None 为标题或说明
+# part：所属的部分（1 或 2）
+# stub、counter：标题项目的末梢类型和统计数据（见 classify）
+# 未赋值的字段与原来字典中不存在的键一样，访问时抛出 KeyError
+##########################################################
+class TestItem:
+    __slots__ = ('num', 'name', 'subname', 'unit', 'require', 'result', 'comment', 'row',
+                 'type', 'verdict', 'part', 'stub', 'counter')
+
+    def __init__(self, num, name, subname, unit, require, result, comment, row):
+        self.num = num
+        self.name = name
+        self.subname = subname
+        self.unit = unit
+        self.require = require
+        self.result = result
+        self.comment = comment
+        self.row = row
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return hasattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+    # 转换为原来的字典（只包含已赋值的字段）
+    def as_dict(self):
+        return {key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)}
+
+    # “检验结果”表格中的一行，参考项的判定显示为“--”
+    def table_row(self):
+        return {'num': self.num, 'name': self.name, 'subname': self.subname, 'unit': self.unit,
+                'require': self.require, 'result': self.result,
+                'verdict': '--' if self.verdict == 'ref' else self.verdict, 'comment': self.comment}
+
+    def __repr__(self):
+        return f"TestItem({self.as_dict()!r})"
+
+
+# 统计项目数：实测项目数 = 合格项目数 + 不合格项目数 + 参考项数；应测项目数 = 实测项目数 + 不支持项目数
+def _count_tested(counter):
+    counter['tested'] = counter['合格'] + counter['不合格'] + counter['ref']
+    return counter
+
+
+# 判断类型（见 TestItem）；group 为正在延续的多行项目（12 或 13）的第一行
+def _item_type(item, next_row, group):
+    if group is not None:
+        if group.type == 12 and item.name == '' and item.subname == '':
+            item.name = group.name
+            return 120
+        if group.type == 13 and item.name == '' and item.subname:
+            item.name = group.name
+            return 130
+    if item.subname == '' and item.unit == '' and item.require == '':  # 标题或说明
+        if '$' in item.num:
+            item.num = str(item.num).replace('$', '')
+            return 10  # 项目编号中含有'$'字符，不是标题，而是说明之类文字
+        return 2  # 为标题
+    if item.name and not item.subname:
+        if next_row is None or next_row[1]:  # 最后一行，或下一行有项目名称
+            return 11
+        return 12
+    if item.name and item.subname:
+        return 13
+    log_show.error(f"原始记录中第 {item.row} 行的数据有误，请检查修改！")
+    return 21
+
+
+# 判定结果；resolve_images(item) 处理检测要求和检验结果中的图片
+def _verdict(item, resolve_images):
+    # 检查单位、标准要求及检验结果列是否有空白，如果有，提示
+    if not all([item.unit, item.require, item.result]):
+        log_show.error(f"请检查原始记录中第 {item.row} 行，数据可能不完整！")
+    if resolve_images:
+        resolve_images(item)
+    # 根据序号（是否带*)判断是否为参考项目；根据 ’result‘ 填写 ’verdict‘
+    if item.comment in FAIL_COMMENTS:
+        return '不合格'
+    if item.result in NA_RESULTS:
+        item.result = '不适用'
+        return '--'
+    if '*' in item.num:
+        return 'ref'
+    return '合格'
+
+
+##########################################################
+# 将“检验结果”sheet页中的数据（get_excel_data 返回的行，每行最后为行号）转换为 test_items 列表：
+# 每行只处理一次，标题后面的检验项目（一个“段”）在遇到下一个标题时整体处理：
+# stub = 0：非末梢标题（后面没有检验项目，或只有说明）
+# stub = 1：末梢标题，但全部为不支持项，counter = {}，后面的检验项目不输出
+# stub = 2：末梢标题，counter 为判定结果的统计，后面的检验项目按顺序重新编号，参考项目序号前加“*”
+# 一级标题的 counter 为其下所有输出的检验项目的统计
+##########################################################
+def classify(rows, resolve_images=None):
+    test_items = []
+    part = 1
+    seq = 1
+    group = None  # 正在延续的多行项目
+    heading = None  # 当前段的标题
+    section = []  # 当前段中的项目
+    level1 = None  # 当前的一级标题
+    level1_counter = Counter()
+
+    def emit(item):
+        nonlocal level1, level1_counter
+        if item.type == 1:
+            close_level1()
+            level1 = item
+            level1_counter = Counter()
+        elif item.type > 10 and level1 is not None:
+            level1_counter[item.verdict] += 1
+        test_items.append(item)
+
+    def close_level1():
+        if level1 is not None:
+            c1 = _count_tested(level1_counter)
+            c1['total'] = c1['tested'] + c1['--'] if c1['tested'] else 0
+            level1.counter = c1
+
+    def close_section():
+        nonlocal seq
+        if heading is None:
+            return
+        if not section:
+            heading.stub = 0
+            emit(heading)
+            return
+        cnt = _count_tested(Counter(item.verdict for item in section))
+        cnt['total'] = cnt['tested'] + cnt['--']
+        if cnt['tested']:  # 有实际测试的项目时
+            heading.counter = cnt
+            heading.stub = 2
+            emit(heading)
+            for item in section:
+                if item.type > 10:
+                    item.num = ('*' + str(seq)) if item.verdict == 'ref' else str(seq)
+                    seq += 1
+                emit(item)
+        elif cnt['total']:  # 已测项目数为0，但应测项目数不为0的项目
+            heading.counter = Counter()
+            heading.stub = 1
+            emit(heading)
+        else:  # 后面都是 type=10 的说明
+            heading.stub = 0
+            emit(heading)
+            for item in section:
+                emit(item)
+
+    last = len(rows) - 1
+    for i, row in enumerate(rows):
+        item = TestItem(*row)
+        item.type = _item_type(item, rows[i + 1] if i < last else None, group)
+        if item.type in (12, 13):
+            group = item
+        elif item.type not in (120, 130):
+            group = None
+
+        if item.type < 11:
+            item.verdict = None
+        else:
+            item.verdict = _verdict(item, resolve_images)
+
+        if item.type < 10:  # 标题：判断层级
+            num = item.num
+            level = len(num.split('.')) if num.split('.')[-1] else (len(num.split('.')) - 1)
+            if '第一' in num:
+                item.type = 0
+            elif '第二' in num:
+                item.type = 0
+                part = 2
+            elif level < 2:  # 是一级标题
+                item.type = 1
+            item.counter = Counter()  # 所有的标题项都有 counter，防止后续读取时出现 KeyError
+        item.part = part
+
+        if item.type < 10:
+            close_section()
+            heading = item
+            section = []
+        elif heading is not None:
+            section.append(item)
+        else:  # 第一个标题之前的项目
+            item.stub = 0
+            emit(item)
+    close_section()
+    close_level1()
+    return test_items
+
+
+##########################################################
+# 生成“检验结果”表格的数据（一次遍历）：
+# 标题、说明和单行项目各为一个表格，多行项目（12、13）及其后续行（120、130）合并为一个表格；
+# tbl = {'type': ti.type, 'title': ti.name, 'num': ti.num（只有标题和说明）, 'data': [ti.table_row(), ...]}
+# bind_images(row) 将行中的图片与模板绑定（报告和记录共用 test_items，所以每行生成新的字典）
+##########################################################
+def result_table(test_items, bind_images=None):
+    tbl_result = []
+    tbl = None
+    for ti in test_items:
+        if ti.type > 100:
+            if tbl is not None and tbl['type'] in (12, 13):
+                tbl['data'].append(_table_row(ti, bind_images))
+            continue
+        tbl = {'type': ti.type, 'title': ti.name}
+        if ti.type < 11:  # 标题或说明
+            tbl['num'] = ti.num
+            tbl['data'] = []
+        elif ti.type in (11, 12, 13):
+            tbl['data'] = [_table_row(ti, bind_images)]
+        else:  # 数据有误的行（type=21）已在解析时报错，不输出
+            tbl = None
+            continue
+        tbl_result.append(tbl)
+    return tbl_result
+
+
+def _table_row(ti, bind_images):
+    row = ti.table_row()
+    return bind_images(row) if bind_images else row
+
+
+# 项目序号（可能带“*”）列表中的连续序号段：['1', '3', '*4', '5'] -> [(1, 1), (3, 5)]
+def number_runs(nums):
+    runs = []
+    for num in nums:
+        num = int(num.replace('*', ''))
+        if runs and num == runs[-1][1] + 1:
+            runs[-1][1] = num
+        else:
+            runs.append([num, num])
+    return [tuple(run) for run in runs]
+
+
+##########################################################
+# test_items 的统计索引，在 process_excel_data 之后只建立一次（一次遍历），供结论、一览表、不支持项说明和检验人员表使用：
+# counts[part]：           各部分检验项目（type > 10）的判定结果统计
+# numbers[(part, verdict)]：各部分各判定结果的项目序号列表，runs 为其连续序号段（用于 format_runs）
+# headings[part]：         各部分的标题（type < 10）
+# level1：                 部分标题和一级标题（type < 2）
+# not_supported：          全部不支持项（verdict 为 '--'），按顺序
+##########################################################
+class VerdictIndex:
+    def __init__(self, test_items):
+        self.counts = {}
+        self.numbers = {}
+        self.headings = {}
+        self.level1 = []
+        self.not_supported = []
+        for ti in test_items:
+            if ti.type > 10:
+                self.counts.setdefault(ti.part, Counter())[ti.verdict] += 1
+                self.numbers.setdefault((ti.part, ti.verdict), []).append(ti.num)
+                if ti.verdict == '--':
+                    self.not_supported.append(ti)
+            elif ti.type < 10:
+                self.headings.setdefault(ti.part, []).append(ti)
+                if ti.type < 2:
+                    self.level1.append(ti)
+        self.runs = {}
+
+    def count(self, part):
+        return self.counts.get(part, Counter())
+
+    def nums(self, part, verdict):
+        return self.numbers.get((part, verdict), [])
+
+    # 连续序号段在第一次使用时计算并保存
+    def number_runs(self, part, verdict):
+        key = (part, verdict)
+        if key not in self.runs:
+            self.runs[key] = number_runs(self.nums(part, verdict))
+        return self.runs[key]
+
+    def part_headings(self, part):
+        return self.headings.get(part, [])
@@ -0,0 +1,57 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN
+
+########################################
+# 我国科学技术委员会正式颁布的《数字修约规则》，通常称为“四舍六入五成双”法则,即四舍六入五考虑。
+# 当[尾数]≤4时舍去，尾数为6时进位。当尾数为5时，则应看末位数是奇数还是偶数，5前为偶数应将5舍去，5前为奇数应将5进位。
+# 使用十进制精确计算：按单元格中显示的数字（字符串）修约，不受二进制浮点数表示误差的影响（如 2.675、1.005）。
+# 仪表数据按列修约（round_column），同一列中相同的值只计算一次。
+########################################
+_QUANTS = {}
+
+
+def _quant(poi):
+    if poi not in _QUANTS:
+        _QUANTS[poi] = Decimal(1).scaleb(-poi)
+    return _QUANTS[poi]
+
+
+def _to_decimal(num):
+    if isinstance(num, float):
+        num = repr(num)  # 最短的十进制表示，与单元格中显示的数字一致
+    elif not isinstance(num, str):
+        num = str(num)
+    try:
+        value = Decimal(num.strip())
+    except InvalidOperation:
+        raise ValueError(f"could not convert to number: {num!r}") from None
+    if not value.is_finite():
+        raise ValueError(f"could not round: {num!r}")
+    return value
+
+
+# 修约到小数点后 poi 位：poi 为 0 时返回整数，否则返回保留 poi 位小数的字符串
+def round_half_even(num, poi=0):
+    value = _to_decimal(num)
+    if poi == 0:
+        return int(value.to_integral_value(ROUND_HALF_EVEN))
+    value = value.quantize(_quant(poi), ROUND_HALF_EVEN)
+    if not value:
+        value = abs(value)  # 不输出“-0.000”
+    if poi <= 6:
+        return str(value)  # 指数为 -poi（不小于-6）时，str 不使用科学计数法，比 format 快
+    return f"{value:.{poi}f}"
+
+
+# 原有的函数名
+round_liug = round_half_even
+
+
+# 对一列数据修约，返回与 values 等长的列表；结果与逐个调用 round_half_even 相同
+def round_column(values, poi=0):
+    results = {}
+    column = []
+    for value in values:
+        if value not in results:
+            results[value] = round_half_even(value, poi)
+        column.append(results[value])
+    return column
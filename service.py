@@ -0,0 +1,646 @@
+import sys
+import json
+import signal
+import time
+import uuid
+import shutil
+import logging
+import zipfile
+import argparse
+import tempfile
+import threading
+import statistics
+import multiprocessing
+from pathlib import Path
+from collections import OrderedDict, deque
+from urllib.parse import urlsplit, parse_qs, quote, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from main_cli import run_job, setup_logging, TASK_TYPES
+from template_cache import get_template_cache
+from word_fields import FIELD_BACKENDS
+from image_prep import DEFAULT_IMAGE_DPI
+from xlsx_reader import DEFAULT_BACKEND, READERS
+from report_worker import TABLE_WRITERS
+
+########################################
+# 服务模式：在一台配置较好的电脑上常驻运行，各工程师通过HTTP提交生成任务，不再各自运行程序：
+# 1、任务可以是服务端能访问的原始记录路径（如网络共享目录上的xlsm），也可以上传xlsm
+#    或包含xlsm及其 images、data 文件夹的zip；
+# 2、任务进入先进先出的队列（长度有上限，队列满时返回503），由固定数量的常驻工作进程执行，
+#    工作进程启动时即导入生成文档的模块、创建模板缓存，之后的任务不再重复导入和编译；
+#    同一目录下的原始记录不会同时生成（生成时会重命名原始记录、写入同一输出目录）；
+# 3、客户端轮询任务状态，完成后下载生成的文档（单个文件或整个输出目录的zip，zip在任务完成时打包一次，保留到任务被删除）；
+# 4、/stats 返回队列长度、运行中的任务数、排队和生成耗时的统计、吞吐量等。
+# 用法：
+#   python service.py --host 0.0.0.0 --port 8750 --workers 4 --allow \\192.168.0.200\PublicData
+# 按路径提交的任务只能是 --allow 指定目录中的原始记录，没有指定 --allow 时只接受上传的原始记录
+# 日志输出到名字为“report”的Logger中（工作进程的日志直接输出到标准错误，行首为原始记录的名称）
+########################################
+logger = logging.getLogger("report")
+
+DEFAULT_PORT = 8750
+DEFAULT_WORKERS = 2
+MAX_QUEUE = 100
+# 保留多少个已结束的任务（更早的任务及其上传的文件被删除）
+MAX_HISTORY = 500
+# 上传文件的大小上限（字节）
+MAX_UPLOAD = 1024 * 2 ** 20
+# 统计最近多少个已结束任务的耗时，以及吞吐量的统计时间（秒）
+STATS_WINDOW = 200
+THROUGHPUT_WINDOWS = (60, 600, 3600)
+CHUNK = 2 ** 20
+
+# 任务状态
+QUEUED, RUNNING, OK, FAILED, CANCELLED = 'queued', 'running', 'ok', 'failed', 'cancelled'
+FINISHED = (OK, FAILED, CANCELLED)
+
+
+# 队列已满
+class QueueFull(Exception):
+    pass
+
+
+# 提交的任务有误（返回400）
+class JobError(Exception):
+    pass
+
+
+# 工作进程启动时执行：导入生成文档的模块（导入本模块时已导入）并创建模板缓存；
+# 控制台中按 Ctrl+C 时工作进程不退出，由主进程等待运行中的任务完成后再结束进程池
+def warm_up(log_level):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    setup_logging(log_level)
+    get_template_cache()
+
+
+def _noop():
+    return None
+
+
+def _timestamp(t):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) if t else None
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+# 一组耗时（秒）的统计，没有数据时为 None
+def _summary(values):
+    if not values:
+        return None
+    return {'mean': round(statistics.fmean(values), 3), 'p50': round(_percentile(values, 50), 3),
+            'p95': round(_percentile(values, 95), 3), 'max': round(max(values), 3)}
+
+
+# 耗时记录（JSON）中各阶段的耗时合计：{阶段: 秒}
+def stage_totals(trace_file):
+    try:
+        data = json.loads(Path(trace_file).read_text(encoding='utf-8'))
+    except (OSError, ValueError, TypeError):
+        return {}
+    totals = {}
+    for document in data.get('documents', []):
+        for stage in document.get('stages', []):
+            totals[stage['stage']] = round(totals.get(stage['stage'], 0.0) + stage['wall'], 3)
+    return totals
+
+
+# 解压上传的zip（zip中有指向目录外的路径时报错），返回其中的原始记录
+def extract_upload(archive, dest):
+    dest = dest.resolve()
+    with zipfile.ZipFile(archive) as zf:
+        for info in zf.infolist():
+            target = (dest / info.filename).resolve()
+            if not target.is_relative_to(dest):
+                raise JobError(f"zip中的路径无效：{info.filename}")
+            zf.extract(info, dest)
+    records = [f for f in dest.rglob('*.xlsm') if not f.name.startswith('~$')]
+    if len(records) != 1:
+        raise JobError(f"zip中应当只有一个原始记录（xlsm），实际为 {len(records)} 个")
+    return records[0]
+
+
+##########################################################
+# 一个生成任务：状态、各时间点和生成结果（main_cli.run_job 的返回值）
+##########################################################
+class Job:
+    def __init__(self, xlsm_file, task_type, is_revision_mode, force=False, upload_dir=None, roots=()):
+        self.id = uuid.uuid4().hex[:12]
+        self.xlsm_file = Path(xlsm_file).resolve()  # 同一文件的不同写法（相对路径、符号链接等）得到相同的 key
+        self.task_type = task_type
+        self.is_revision_mode = is_revision_mode
+        self.force = force
+        self.upload_dir = upload_dir  # 上传的任务：保存上传文件的目录
+        # 原始记录引用的文件只能在这些目录中（上传的任务为上传目录），见 Report.check_file_root
+        self.roots = [upload_dir] if upload_dir else list(roots)
+        self.status = QUEUED
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.result = {}
+        self.stages = {}
+        self.archive = None  # 成功的任务：打包好的输出目录（zip）
+
+    # 同一目录下的原始记录不同时生成
+    @property
+    def key(self):
+        return str(self.xlsm_file.parent).lower()
+
+    @property
+    def output_dir(self):
+        output = self.result.get('output')
+        return Path(output).parent if output else None
+
+    def outputs(self):
+        if self.output_dir is None or not self.output_dir.is_dir():
+            return []
+        return sorted(f.name for f in self.output_dir.glob('*.docx') if not f.name.startswith('~$'))
+
+    def to_dict(self, position=None):
+        wait = (self.started or time.time()) - self.submitted if self.status != CANCELLED else None
+        run = (self.finished or time.time()) - self.started if self.started else None
+        return {
+            'id': self.id,
+            'status': self.status,
+            'input': str(self.xlsm_file),
+            'source': 'upload' if self.upload_dir else 'path',
+            'type': next(name for name, value in TASK_TYPES.items() if value == self.task_type),
+            'revision': self.is_revision_mode,
+            'force': self.force,
+            'position': position,  # 排队的任务在队列中的位置（从1开始）
+            'submitted': _timestamp(self.submitted),
+            'started': _timestamp(self.started),
+            'finished': _timestamp(self.finished),
+            'wait': round(wait, 3) if wait is not None else None,
+            'run': round(run, 3) if run is not None else None,
+            'record': self.result.get('record'),
+            'outputs': self.outputs() if self.status == OK else [],
+            'cached': self.result.get('cached', []),
+            'error': self.result.get('error'),
+            'stages': self.stages,
+        }
+
+
+##########################################################
+# 任务队列和工作进程池：
+# service = JobService(workers=4)
+# service.start()                        启动工作进程（预先导入模块）和分派线程
+# job = service.submit(Job(...))         加入队列，队列已满时抛出 QueueFull
+# service.get(job_id) / service.cancel(job_id) / service.stats()
+# service.close()                        取消排队的任务，等待运行中的任务完成
+##########################################################
+class JobService:
+    def __init__(self, workers=DEFAULT_WORKERS, max_queue=MAX_QUEUE, history=MAX_HISTORY, log_level=logging.INFO,
+                 archive_dir=None, **options):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.history = history
+        self.log_level = log_level
+        self.options = options  # 传给 run_job 的其他参数：fields、image_dpi、reader、table_writer、trace_dir
+        self.jobs = OrderedDict()  # id -> Job，按提交顺序
+        self.pending = deque()
+        self.running = set()  # 运行中任务的 key
+        self.pool = None
+        # 任务结束后的处理（读取耗时记录、打包输出目录）在单独的线程中执行，不占用进程池接收结果的线程
+        self.finisher = None
+        # 打包好的输出目录的保存目录，为空时使用临时目录（停止服务时删除）
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+        self._own_archive_dir = archive_dir is None
+        self.started = None
+        self.pool_starts = 0
+        self.finished = deque(maxlen=STATS_WINDOW)  # 最近结束的任务：(结束时间, 排队耗时, 生成耗时, 状态)
+        self.completions = deque()  # 最近一小时内结束的任务的结束时间
+        self.counts = {OK: 0, FAILED: 0, CANCELLED: 0}
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread = None
+
+    def start(self):
+        self.started = time.time()
+        if self.archive_dir is None:
+            self.archive_dir = Path(tempfile.mkdtemp(prefix='report_archives_'))
+        self.archive_dir.mkdir(parents=True, exist_ok=True)
+        self.finisher = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='JobFinisher')
+        self._start_pool()
+        self._thread = threading.Thread(target=self._dispatch, name='JobService', daemon=True)
+        self._thread.start()
+
+    # 创建进程池，每个工作进程都先执行一个空任务，使所有进程立即启动并导入模块
+    def _start_pool(self):
+        ctx = multiprocessing.get_context('spawn')
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=ctx, initializer=warm_up,
+                                        initargs=(self.log_level,))
+        for _ in range(self.workers):
+            self.pool.submit(_noop)
+        self.pool_starts += 1
+
+    def submit(self, job):
+        with self._cond:
+            if self._closing:
+                raise QueueFull("服务正在停止")
+            if len(self.pending) >= self.max_queue:
+                raise QueueFull(f"队列已满（{self.max_queue} 个任务）")
+            self.jobs[job.id] = job
+            self.pending.append(job)
+            self._cond.notify_all()
+        logger.info(f"[{job.id}] 加入队列：{job.xlsm_file}")
+        return job
+
+    def get(self, job_id):
+        with self._cond:
+            return self.jobs.get(job_id)
+
+    # 返回任务的状态（字典），排队的任务包括在队列中的位置
+    def describe(self, job):
+        with self._cond:
+            position = next((i for i, j in enumerate(self.pending, 1) if j is job), None)
+            return job.to_dict(position)
+
+    def list_jobs(self):
+        with self._cond:
+            positions = {j.id: i for i, j in enumerate(self.pending, 1)}
+            return [job.to_dict(positions.get(job.id)) for job in self.jobs.values()]
+
+    # 取消排队的任务，运行中的任务不能取消
+    def cancel(self, job_id):
+        with self._cond:
+            job = self.jobs.get(job_id)
+            if job is None or job.status != QUEUED:
+                return False
+            self.pending.remove(job)
+            self._finish(job, CANCELLED)
+            return True
+
+    # 队列中第一个所在目录没有正在生成的任务
+    def _next_job(self):
+        for job in self.pending:
+            if job.key not in self.running:
+                return job
+        return None
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._closing and (len(self.running) >= self.workers or self._next_job() is None):
+                    self._cond.wait()
+                if self._closing:
+                    return
+                job = self._next_job()
+                self.pending.remove(job)
+                self.running.add(job.key)
+                job.status, job.started = RUNNING, time.time()
+                pool = self.pool
+            logger.info(f"[{job.id}] 开始生成（排队 {job.started - job.submitted:.1f} 秒）")
+            try:
+                future = pool.submit(run_job, str(job.xlsm_file), job.task_type, job.is_revision_mode,
+                                     log_level=self.log_level, in_worker=True, force=job.force,
+                                     file_roots=[str(root) for root in job.roots] or None, **self.options)
+            except (BrokenProcessPool, RuntimeError) as e:
+                self._done(job, pool, None, e)
+                continue
+            future.add_done_callback(lambda f, job=job, pool=pool: self.finisher.submit(self._done, job, pool, f))
+
+    def _done(self, job, pool, future, error=None):
+        if future is not None:
+            try:
+                job.result = future.result()
+            except Exception as e:
+                error = e
+        if isinstance(error, BrokenProcessPool):
+            job.result = {'status': FAILED, 'error': f"工作进程异常退出：{error}"}
+        elif error is not None:
+            job.result = {'status': FAILED, 'error': f"执行任务时发生错误：{error}"}
+        job.stages = stage_totals(job.result['trace']) if job.result.get('trace') else {}
+        if job.result.get('status') == 'ok' and job.output_dir is not None:
+            job.archive = self.build_archive(job)  # 在释放同一目录的下一个任务之前打包
+        with self._cond:
+            self.running.discard(job.key)
+            if isinstance(error, BrokenProcessPool) and pool is self.pool and not self._closing:
+                logger.warning("工作进程异常退出，重新启动进程池")
+                pool.shutdown(wait=False, cancel_futures=True)
+                self._start_pool()
+            self._finish(job, OK if job.result.get('status') == 'ok' else FAILED)
+        message = job.result.get('output') or job.result.get('error')
+        logger.info(f"[{job.id}] {job.status}：{message}（生成 {job.finished - job.started:.1f} 秒）")
+
+    # 打包输出目录（包括 others 文件夹），返回zip文件，失败时返回 None（仍可单独下载各文件）
+    # docx、图片等已经是压缩格式，zip中不再压缩
+    def build_archive(self, job):
+        archive = self.archive_dir / f'{job.id}.zip'
+        tmp = archive.with_name(archive.name + '.tmp')
+        try:
+            with zipfile.ZipFile(tmp, 'w', zipfile.ZIP_STORED) as zf:
+                for file in sorted(job.output_dir.rglob('*')):
+                    if file.is_file() and not file.name.startswith('~$'):
+                        zf.write(file, file.relative_to(job.output_dir).as_posix())
+            tmp.replace(archive)
+        except OSError as e:
+            logger.warning(f"[{job.id}] 打包输出目录失败：{e}")
+            tmp.unlink(missing_ok=True)
+            return None
+        return archive
+
+    # 在 self._cond 中调用
+    def _finish(self, job, status):
+        job.status, job.finished = status, time.time()
+        self.counts[status] += 1
+        if status != CANCELLED:
+            self.finished.append((job.finished, job.started - job.submitted, job.finished - job.started, status))
+            self.completions.append(job.finished)
+        self._evict()
+        self._cond.notify_all()
+
+    # 只保留最近 history 个已结束的任务，删除更早的任务上传的文件和打包的输出目录
+    def _evict(self):
+        done = [job for job in self.jobs.values() if job.status in FINISHED]
+        for job in done[:max(0, len(done) - self.history)]:
+            del self.jobs[job.id]
+            if job.upload_dir:
+                shutil.rmtree(job.upload_dir, ignore_errors=True)
+            if job.archive:
+                job.archive.unlink(missing_ok=True)
+
+    def stats(self):
+        now = time.time()
+        with self._cond:
+            while self.completions and now - self.completions[0] > max(THROUGHPUT_WINDOWS):
+                self.completions.popleft()
+            recent = list(self.finished)
+            completions = list(self.completions)
+            result = {
+                'workers': self.workers,
+                'pool_starts': self.pool_starts,
+                'uptime': round(now - self.started, 1) if self.started else 0,
+                'queued': len(self.pending),
+                'running': len(self.running),
+                'max_queue': self.max_queue,
+                'counts': dict(self.counts),
+            }
+        waits = [r[1] for r in recent]
+        runs = [r[2] for r in recent if r[3] == OK]
+        result['recent'] = len(recent)  # 以下耗时统计使用的任务数
+        result['wait'] = _summary(waits)
+        result['run'] = _summary(runs)  # 只统计成功的任务
+        # 吞吐量：各时间段内平均每分钟完成的任务数
+        uptime = max(now - self.started, 1e-9) if self.started else 1e-9
+        result['throughput'] = {f'{window}s': round(sum(1 for t in completions if now - t <= window) * 60 /
+                                                    min(window, uptime), 2)
+                                for window in THROUGHPUT_WINDOWS}
+        return result
+
+    def close(self):
+        with self._cond:
+            self._closing = True
+            for job in list(self.pending):
+                self.pending.remove(job)
+                self._finish(job, CANCELLED)
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        if self.finisher is not None:
+            self.finisher.shutdown(wait=True)
+        if self._own_archive_dir and self.archive_dir is not None:
+            shutil.rmtree(self.archive_dir, ignore_errors=True)
+
+
+##########################################################
+# HTTP接口（返回JSON，出错时为 {"error": 说明}）：
+# POST   /jobs                 提交任务：JSON {"xlsm": 路径, "type": "both", "revision": true, "force": false}；
+#                              或上传文件（请求体为xlsm或zip），选项在查询参数中：?name=记录.xlsm&type=both&revision=1
+# GET    /jobs                 所有任务的状态
+# GET    /jobs/<id>            任务的状态
+# DELETE /jobs/<id>            取消排队的任务
+# GET    /jobs/<id>/output     下载输出目录（zip，包括 others 文件夹）
+# GET    /jobs/<id>/output/<文件名>   下载输出目录中的一个文件（如生成的docx）
+# GET    /jobs/<id>/trace      各阶段耗时记录（JSON）
+# GET    /stats                队列长度、耗时统计和吞吐量
+##########################################################
+class ServiceHandler(BaseHTTPRequestHandler):
+    server_version = 'ReportWorker'
+    service = None  # JobService
+    upload_dir = None
+    allowed = ()  # 允许按路径提交的原始记录所在的目录，为空时不接受按路径提交的任务
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def send_json(self, data, status=200, headers=()):
+        body = json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_json(self, status, message, headers=()):
+        self.send_json({'error': message}, status, headers)
+
+    def send_file(self, file, name, content_type='application/octet-stream'):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(Path(file).stat().st_size))
+        self.send_header('Content-Disposition', f"attachment; filename*=UTF-8''{quote(name)}")
+        self.end_headers()
+        with open(file, 'rb') as f:
+            shutil.copyfileobj(f, self.wfile, CHUNK)
+
+    def route(self):
+        url = urlsplit(self.path)
+        parts = [unquote(p) for p in url.path.strip('/').split('/') if p]
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        return parts, query
+
+    def do_GET(self):
+        parts, query = self.route()
+        if parts == ['stats']:
+            return self.send_json(self.service.stats())
+        if parts == ['jobs']:
+            return self.send_json(self.service.list_jobs())
+        if len(parts) < 2 or parts[0] != 'jobs':
+            return self.send_error_json(404, "不存在的路径")
+        job = self.service.get(parts[1])
+        if job is None:
+            return self.send_error_json(404, f"不存在的任务：{parts[1]}")
+        if len(parts) == 2:
+            return self.send_json(self.service.describe(job))
+        if parts[2] == 'trace' and len(parts) == 3:
+            trace = job.result.get('trace')
+            if not trace or not Path(trace).is_file():
+                return self.send_error_json(404, "没有耗时记录")
+            return self.send_file(trace, Path(trace).name, 'application/json; charset=utf-8')
+        if parts[2] != 'output' or len(parts) > 4:
+            return self.send_error_json(404, "不存在的路径")
+        if job.status != OK or job.output_dir is None:
+            return self.send_error_json(409, f"任务状态为 {job.status}，没有可下载的文件")
+        if len(parts) == 4:
+            file = job.output_dir / parts[3]
+            if Path(parts[3]).name != parts[3] or not file.is_file():
+                return self.send_error_json(404, f"输出目录中没有此文件：{parts[3]}")
+            return self.send_file(file, file.name)
+        if job.archive is None or not job.archive.is_file():
+            return self.send_error_json(404, "输出目录打包失败，请单独下载各文件")
+        self.send_file(job.archive, f'{job.output_dir.name}.zip', 'application/zip')
+
+    def do_DELETE(self):
+        parts, _ = self.route()
+        if len(parts) != 2 or parts[0] != 'jobs':
+            return self.send_error_json(404, "不存在的路径")
+        if not self.service.cancel(parts[1]):
+            return self.send_error_json(409, "只能取消排队中的任务")
+        self.send_json(self.service.describe(self.service.get(parts[1])))
+
+    def do_POST(self):
+        parts, query = self.route()
+        if parts != ['jobs']:
+            return self.send_error_json(404, "不存在的路径")
+        upload = None
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            if length > MAX_UPLOAD:
+                return self.send_error_json(413, f"上传的文件超过 {MAX_UPLOAD // 2 ** 20} MB")
+            if self.headers.get_content_type() == 'application/json':
+                options = json.loads(self.rfile.read(length) or b'{}')
+                if not isinstance(options, dict):
+                    raise JobError("请求体应为JSON对象，例如 {\"xlsm\": 路径, \"type\": \"both\"}")
+                job = Job(self.check_path(options.get('xlsm')), *self.job_options(options), roots=self.allowed)
+            else:
+                upload = self.upload_dir / uuid.uuid4().hex[:12]
+                job = Job(self.save_upload(upload, length, query.get('name', '')), *self.job_options(query),
+                          upload_dir=upload)
+            self.service.submit(job)
+        except (JobError, ValueError, TypeError) as e:
+            if upload:
+                shutil.rmtree(upload, ignore_errors=True)
+            return self.send_error_json(400, str(e))
+        except QueueFull as e:
+            if upload:
+                shutil.rmtree(upload, ignore_errors=True)
+            return self.send_error_json(503, str(e), [('Retry-After', '30')])
+        self.send_json(self.service.describe(job), 202, [('Location', f'/jobs/{job.id}')])
+
+    # 任务的选项：(task_type, is_revision_mode, force)，查询参数中的布尔值为 1/0、true/false
+    @staticmethod
+    def job_options(options):
+        def flag(name, default):
+            value = options.get(name, default)
+            return value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes', 'on')
+        task_type = options.get('type', 'both')
+        if task_type not in TASK_TYPES:
+            raise JobError(f"type 应为 {'、'.join(TASK_TYPES)} 之一")
+        return TASK_TYPES[task_type], flag('revision', True), flag('force', False)
+
+    def check_path(self, xlsm):
+        if not self.allowed:
+            raise JobError("服务未指定 --allow，不接受按路径提交的任务，请上传原始记录")
+        if not xlsm:
+            raise JobError("缺少原始记录的路径（xlsm）")
+        file = Path(xlsm).resolve()
+        # 先检查目录，不向客户端透露允许的目录以外的文件是否存在
+        if not any(file.is_relative_to(root) for root in self.allowed):
+            raise JobError(f"不允许生成此目录下的原始记录：{xlsm}")
+        if file.suffix.lower() != '.xlsm' or not file.is_file():
+            raise JobError(f"服务端找不到原始记录：{xlsm}")
+        return file
+
+    # 保存上传的xlsm或zip，返回原始记录
+    def save_upload(self, upload, length, name):
+        name = Path(name).name
+        suffix = Path(name).suffix.lower()
+        if suffix not in ('.xlsm', '.zip'):
+            raise JobError("上传时需要在查询参数 name 中给出文件名（.xlsm 或 .zip）")
+        if length <= 0:
+            raise JobError("上传的文件为空")
+        upload.mkdir(parents=True)
+        file = upload / name
+        remaining = length
+        with open(file, 'wb') as f:
+            while remaining > 0:
+                data = self.rfile.read(min(CHUNK, remaining))
+                if not data:
+                    raise JobError("上传的文件不完整")
+                f.write(data)
+                remaining -= len(data)
+        if suffix == '.xlsm':
+            return file
+        try:
+            return extract_upload(file, upload / 'record')
+        except zipfile.BadZipFile:
+            raise JobError("上传的文件不是有效的zip文件")
+        finally:
+            file.unlink()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="报告自动化生成工具（服务模式）")
+    parser.add_argument('--host', default='127.0.0.1', help="监听的地址，默认只接受本机的连接，0.0.0.0 为所有网卡")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"监听的端口，默认为{DEFAULT_PORT}")
+    parser.add_argument('-j', '--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f"同时生成的任务数（工作进程数），默认为{DEFAULT_WORKERS}")
+    parser.add_argument('--max-queue', type=int, default=MAX_QUEUE, help=f"排队任务数的上限，默认为{MAX_QUEUE}")
+    parser.add_argument('--history', type=int, default=MAX_HISTORY,
+                        help=f"保留的已结束任务数，默认为{MAX_HISTORY}（更早任务上传的文件被删除）")
+    parser.add_argument('--allow', nargs='+', default=[],
+                        help="允许按路径提交的原始记录所在的目录（包括子目录），原始记录引用的文件也必须在这些目录中；"
+                             "不指定时只接受上传的原始记录")
+    parser.add_argument('--upload-dir', help="保存上传文件的目录，默认为临时目录")
+    parser.add_argument('--fields', choices=FIELD_BACKENDS.keys(),
+                        help="更新Word域的方式：word=调用Word更新，dirty=标记后由Word打开时更新，none=不更新；"
+                             "默认在Windows上使用Word，其他系统使用dirty")
+    parser.add_argument('--image-dpi', type=int, default=DEFAULT_IMAGE_DPI,
+                        help=f"插入的图片按显示宽度和此分辨率缩小、重新压缩，默认为{DEFAULT_IMAGE_DPI}，0表示插入原图")
+    parser.add_argument('--reader', choices=READERS.keys(), default=DEFAULT_BACKEND,
+                        help="读取Excel表格的方式：stream=直接流式解析（默认），openpyxl=使用openpyxl")
+    parser.add_argument('--table-writer', choices=TABLE_WRITERS, default='stream',
+                        help="“检验结果”表格的生成方式：stream=由行的XML骨架直接生成（默认），jinja=由模板逐行渲染")
+    parser.add_argument('--trace-dir', help="各阶段耗时记录（JSON）的保存目录，默认为 %%LOCALAPPDATA%%\\ReportWorker\\traces")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出调试日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    log_level = logging.DEBUG if args.verbose else logging.INFO
+    setup_logging(log_level)
+
+    service = JobService(workers=max(1, args.workers), max_queue=args.max_queue, history=args.history,
+                         log_level=log_level, fields=args.fields, image_dpi=args.image_dpi, reader=args.reader,
+                         table_writer=args.table_writer, trace_dir=args.trace_dir)
+    handler = type('Handler', (ServiceHandler,), {'service': service,
+                                                  'allowed': [Path(p).resolve() for p in args.allow]})
+    try:
+        server = ThreadingHTTPServer((args.host, args.port), handler)
+    except OSError as e:
+        logger.error(f"无法监听 {args.host}:{args.port}：{e}")
+        return 2
+    upload_root = Path(args.upload_dir or tempfile.mkdtemp(prefix='report_uploads_'))
+    upload_root.mkdir(parents=True, exist_ok=True)
+    handler.upload_dir = upload_root
+    service.start()
+    logger.info(f"服务已启动：http://{args.host}:{args.port}，工作进程 {service.workers} 个，"
+                f"上传文件保存在 {upload_root}，按 Ctrl+C 退出")
+    if not args.allow:
+        logger.info("未指定 --allow，只接受上传的原始记录")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info("正在停止服务，等待运行中的任务完成...")
+    finally:
+        server.server_close()
+        service.close()
+        if not args.upload_dir:
+            shutil.rmtree(upload_root, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    # 打包为exe后，进程池使用的子进程需要此调用
+    multiprocessing.freeze_support()
+    sys.exit(main())
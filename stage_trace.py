@@ -0,0 +1,119 @@
+import os
+import re
+import time
+import json
+import itertools
+from pathlib import Path
+from collections import Counter
+from contextlib import contextmanager
+
+##########################################################
+# 生成任务各阶段的耗时记录：
+# 1、每个阶段记录墙钟时间、CPU时间（当前线程）以及阶段内各计数器的增量（读取行数、插入图片数、写入字节数等）；
+# 2、一个任务（一个原始记录）的所有文档记录保存为一个JSON文件，方便比较不同原始记录、不同版本的耗时，
+#    默认保存在用户目录下（default_trace_dir），每个原始记录只保留最近的 MAX_TRACES 个；
+# 3、每个文档生成完成后，在日志中输出各阶段耗时的汇总表格。
+# 注意：Word更新域在专用的COM线程中执行，其CPU时间不计入当前线程。
+##########################################################
+class StageTrace:
+    def __init__(self, name, counters=None):
+        self.name = name
+        # 计数器由调用方在各处累加，阶段结束时记录增量
+        self.counters = counters if counters is not None else Counter()
+        self.stages = []
+        self.started = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._finished = None  # (墙钟时间, CPU时间)
+
+    @contextmanager
+    def stage(self, name, label=''):
+        before = self.counters.copy()
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            self.stages.append({
+                'stage': name,
+                'label': label,
+                'wall': round(time.perf_counter() - wall, 4),
+                'cpu': round(time.thread_time() - cpu, 4),
+                'counters': dict(self.counters - before),
+            })
+
+    @property
+    def wall(self):
+        if self._finished:
+            return self._finished[0]
+        return time.perf_counter() - self._wall
+
+    # 文档生成结束时调用，之后的总耗时不再变化
+    def finish(self):
+        if self._finished is None:
+            self._finished = (time.perf_counter() - self._wall, time.thread_time() - self._cpu)
+
+    def to_dict(self):
+        self.finish()
+        wall, cpu = self._finished
+        return {
+            'name': self.name,
+            'started': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.started)),
+            'wall': round(wall, 4),
+            'cpu': round(cpu, 4),
+            'counters': dict(self.counters),
+            'stages': self.stages,
+        }
+
+    # 各阶段耗时的汇总表格（按文本行返回，便于逐行输出到日志）
+    def summary_lines(self):
+        total = sum(s['wall'] for s in self.stages) or 1
+        lines = [f"{'阶段':<28}{'耗时(秒)':>10}{'CPU(秒)':>10}{'占比':>8}  计数",
+                 '-' * 72]
+        for s in self.stages:
+            counters = ' '.join(f"{k}={v}" for k, v in s['counters'].items())
+            lines.append(f"{s['stage']:<28}{s['wall']:>10.3f}{s['cpu']:>10.3f}{s['wall'] / total:>8.1%}  {counters}")
+        lines.append('-' * 72)
+        lines.append(f"{'合计':<28}{sum(s['wall'] for s in self.stages):>10.3f}"
+                     f"{sum(s['cpu'] for s in self.stages):>10.3f}")
+        return lines
+
+
+# 每个原始记录只保留最近的若干个耗时记录，更早的自动删除
+MAX_TRACES = 20
+
+
+# 耗时记录的默认保存目录：Windows 上为 %LOCALAPPDATA%\ReportWorker\traces，其他系统为 ~/.cache/ReportWorker/traces
+# （不保存在原始记录所在的目录中，避免在共享目录中不断增加文件）
+def default_trace_dir():
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base, 'ReportWorker', 'traces')
+
+
+# 文件名为“原始记录名_日期-时间-毫秒.json”，同一毫秒内已有同名文件时再加序号
+def _trace_name(file, stem):
+    match = re.fullmatch(rf"{re.escape(stem)}_(\d{{8}}-\d{{6}}-\d{{3}})(?:-(\d+))?\.json", file.name)
+    return (match.group(1), int(match.group(2) or 0)) if match else None
+
+
+# 保存一个任务的耗时记录，返回保存的文件路径；trace_dir 为空时保存在 default_trace_dir 中
+def write_trace(trace_dir, stem, job, traces, keep=MAX_TRACES):
+    trace_dir = Path(trace_dir) if trace_dir else default_trace_dir()
+    trace_dir.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    name = f"{stem}_{time.strftime('%Y%m%d-%H%M%S', time.localtime(now))}-{int(now * 1000) % 1000:03d}"
+    data = dict(job, documents=[t if isinstance(t, dict) else t.to_dict() for t in traces])
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    for i in itertools.count():
+        file = trace_dir / (f"{name}-{i}.json" if i else f"{name}.json")
+        try:
+            with open(file, 'x', encoding='utf-8') as f:  # 不覆盖同时保存的其他耗时记录（多个进程）
+                f.write(text)
+            break
+        except FileExistsError:
+            continue
+    # 删除同一原始记录更早的耗时记录
+    files = sorted((key, f) for f in trace_dir.iterdir() if (key := _trace_name(f, stem)))
+    for _, old in files[:-keep]:
+        old.unlink(missing_ok=True)
+    return file
@@ -0,0 +1,258 @@
+import re
+import logging
+from lxml import etree
+from jinja2 import nodes, Undefined
+from markupsafe import Markup, escape
+
+########################################
+# 大表格（“检验结果”等）的快速生成：不经过Jinja逐行渲染，直接由行的XML骨架填入数值生成。
+# 1、从预处理后的模板中取出 {% for a in tbl_result %} ... {% endfor %} 循环，模板中只留下一个调用，
+#    渲染到此处时按顺序生成所有行（图片等与文档顺序有关的内容与Jinja渲染的顺序相同），文档中只输出一个标记；
+# 2、行的骨架：对每种表格类型（a.type），用占位符代替 a、b 的各字段，渲染数据为0~3行的表格得到
+#    （单独一行、第一行、中间行、最后一行）；填入数值时的转义与Jinja的 autoescape 相同；
+# 3、解析文档（docxtpl 的 fix_tables）后，各行分批解析并插入到标记的位置，不再拼接成一个完整的大字符串；
+# 4、只支持简单的循环：输出只能是 a.字段、b.字段（不能使用过滤器），条件只能使用 a.type 和 loop.first、loop.last，
+#    内层循环只能是 for b in a.data；不满足时使用原来的Jinja渲染，结果完全相同。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+FAST_ROWS = '_fast_rows'  # 模板中生成各行的函数名称
+MARKER = 'fast-rows:'  # 文档中的标记（XML注释）
+CHUNK_ROWS = 500  # 每次解析的行数
+LISTING_CHARS = ('\t', '\a', '\n', '\f')  # docxtpl 的 resolve_listing 处理的字符
+ROW_PATTERN = re.compile(r'<w:tr[ >].*?</w:tr>', re.DOTALL)
+SENTINEL_OPEN, SENTINEL_CLOSE = '\ue000', '\ue001'  # 占位符的首尾（Unicode私用区的字符，Jinja不转义）
+SENTINEL = re.compile(SENTINEL_OPEN + r'(\d+)' + SENTINEL_CLOSE)
+DOCXTPL_ESCAPES = (('{_{', '{{'), ('}_}', '}}'), ('{_%', '{%'), ('%_}', '%}'))
+_TAG = re.compile(r'{%-?\s*(for|endfor)\b.*?-?%}', re.DOTALL)
+
+
+class UnsupportedLoop(Exception):
+    pass
+
+
+# 预处理后的XML中 “for 变量 in name” 循环的位置：返回 (开始, 结束)，找不到时返回 None
+def find_loop(xml, name):
+    start = re.search(r'{%-?\s*for\s+\w+\s+in\s+' + re.escape(name) + r'\s*-?%}', xml)
+    if not start:
+        return None
+    depth = 0
+    for tag in _TAG.finditer(xml, start.start()):
+        depth += 1 if tag.group(1) == 'for' else -1
+        if depth == 0:
+            return start.start(), tag.end()
+    return None
+
+
+##########################################################
+# 一个表格循环的快速生成：
+# writer = LoopWriter(env, name, source)    检查循环是否符合要求，不符合时抛出 UnsupportedLoop
+# writer.prepare(types)                     生成各表格类型的骨架
+# writer.rows(tables)                       生成各行的XML（字符串）
+##########################################################
+class LoopWriter:
+    def __init__(self, env, name, source):
+        self.env = env
+        self.name = name
+        self.template = env.from_string(source)
+        # 与Jinja输出 {{ a.字段 }} 相同：autoescape 时转义（Markup 不转义），否则直接转换为字符串
+        self.escape = escape if env.autoescape else str
+        self.fields = []  # [(0: a / 1: b, 字段名)]
+        self.skeletons = {}  # 表格类型 -> 骨架
+        self._check(env.parse(source))
+
+    # 检查循环的结构，记录输出的字段
+    def _check(self, ast):
+        body = [node for node in ast.body if not _is_blank(node)]
+        if len(body) != 1 or not isinstance(body[0], nodes.For):
+            raise UnsupportedLoop("模板中的表格不是单独的循环")
+        loop = body[0]
+        if not isinstance(loop.target, nodes.Name) or loop.else_ or loop.test or loop.recursive:
+            raise UnsupportedLoop("不支持的循环形式")
+        self.outer = loop.target.name
+        self.inner = None
+        for node in loop.body:
+            self._check_node(node, in_inner=False)
+
+    def _check_node(self, node, in_inner):
+        if isinstance(node, nodes.Output):
+            for child in node.nodes:
+                if isinstance(child, nodes.TemplateData):
+                    continue
+                self._field(child, in_inner)
+        elif isinstance(node, nodes.If):
+            self._check_test(node.test, in_inner)
+            for child in node.body + node.elif_ + node.else_:
+                self._check_node(child, in_inner)
+        elif isinstance(node, nodes.For) and not in_inner:
+            ok = (isinstance(node.target, nodes.Name) and isinstance(node.iter, nodes.Getattr)
+                  and isinstance(node.iter.node, nodes.Name) and node.iter.node.name == self.outer
+                  and node.iter.attr == 'data' and not node.else_ and not node.test and not node.recursive)
+            if not ok or (self.inner and self.inner != node.target.name):
+                raise UnsupportedLoop("内层循环只能是 for b in a.data")
+            self.inner = node.target.name
+            for child in node.body:
+                self._check_node(child, in_inner=True)
+        else:
+            raise UnsupportedLoop(f"不支持的模板语句：{type(node).__name__}")
+
+    def _field(self, node, in_inner):
+        if not (isinstance(node, nodes.Getattr) and isinstance(node.node, nodes.Name)):
+            raise UnsupportedLoop("表格中只能输出 a.字段 或 b.字段")
+        owner = node.node.name
+        if owner == self.outer:
+            key = (0, node.attr)
+        elif in_inner and owner == self.inner:
+            key = (1, node.attr)
+        else:
+            raise UnsupportedLoop(f"不支持的变量：{owner}")
+        if key[1] in ('type', 'data') or hasattr(dict, key[1]):
+            raise UnsupportedLoop(f"不支持的字段：{key[1]}")
+        if key not in self.fields:
+            self.fields.append(key)
+
+    def _check_test(self, node, in_inner):
+        if isinstance(node, (nodes.Const,)):
+            return
+        if isinstance(node, nodes.Getattr) and isinstance(node.node, nodes.Name):
+            if node.node.name == self.outer and node.attr == 'type':
+                return
+            if in_inner and node.node.name == 'loop' and node.attr in ('first', 'last'):
+                return
+        elif isinstance(node, nodes.Compare):
+            self._check_test(node.expr, in_inner)
+            for operand in node.ops:
+                self._check_test(operand.expr, in_inner)
+            return
+        elif isinstance(node, nodes.Not):
+            self._check_test(node.node, in_inner)
+            return
+        elif isinstance(node, (nodes.And, nodes.Or)):
+            self._check_test(node.left, in_inner)
+            self._check_test(node.right, in_inner)
+            return
+        raise UnsupportedLoop("条件中只能使用 a.type、loop.first 和 loop.last")
+
+    # 生成各表格类型的骨架，有不支持的类型时抛出 UnsupportedLoop
+    def prepare(self, types):
+        for table_type in types:
+            if table_type not in self.skeletons:
+                self.skeletons[table_type] = self._capture(table_type)
+
+    # 渲染数据为 0~3 行的表格，由结果得到骨架：
+    # ('fixed', [行...])：各行与数据无关；('rows', 单独一行, 第一行, 中间行, 最后一行)：每行数据对应一行
+    def _capture(self, table_type):
+        a_values = {attr: _sentinel(i) for i, (owner, attr) in enumerate(self.fields) if owner == 0}
+        b_values = {attr: _sentinel(i) for i, (owner, attr) in enumerate(self.fields) if owner == 1}
+        rows = []
+        for count in range(4):
+            table = dict(a_values, type=table_type, data=[dict(b_values) for _ in range(count)])
+            xml = self.template.render({self.name: [table]})
+            found = ROW_PATTERN.findall(xml)
+            if ''.join(found) != xml:
+                raise UnsupportedLoop(f"类型为 {table_type} 的表格中有行以外的内容")
+            rows.append([_split(row) for row in found])
+        if all(r == rows[0] for r in rows):
+            return 'fixed', rows[0]
+        if [len(r) for r in rows] == [0, 1, 2, 3]:
+            return 'rows', rows[1][0], rows[2][0], rows[3][1], rows[2][1]
+        raise UnsupportedLoop(f"类型为 {table_type} 的表格的行数与数据不对应")
+
+    # 按顺序生成所有表格的行，post(row) 为 docxtpl 对渲染结果的处理
+    def rows(self, tables, post=None):
+        getattr_ = self.env.getattr
+        for table in tables:
+            kind, *skeleton = self.skeletons[getattr_(table, 'type')]
+            if kind == 'fixed':
+                for parts in skeleton[0]:
+                    yield self._fill(parts, table, None, post)
+                continue
+            data = getattr_(table, 'data')
+            data = [] if isinstance(data, Undefined) else list(data)
+            single, first, middle, last = skeleton
+            if len(data) == 1:
+                yield self._fill(single, table, data[0], post)
+            elif data:
+                yield self._fill(first, table, data[0], post)
+                for item in data[1:-1]:
+                    yield self._fill(middle, table, item, post)
+                yield self._fill(last, table, data[-1], post)
+
+    def types(self, tables):
+        return {self.env.getattr(table, 'type') for table in tables}
+
+    # 按骨架填入数值：字段的取值和转义与Jinja相同（是否转义取决于环境的 autoescape），按模板中的顺序求值
+    def _fill(self, parts, a, b, post):
+        getattr_ = self.env.getattr
+        escape_ = self.escape
+        out = [parts[0]]
+        for i in range(1, len(parts), 2):
+            owner, attr = self.fields[parts[i]]
+            out.append(str(escape_(getattr_(a if owner == 0 else b, attr))))
+            out.append(parts[i + 1])
+        row = ''.join(out)
+        for old, new in DOCXTPL_ESCAPES:
+            if old in row:
+                row = row.replace(old, new)
+        if post and any(char in row for char in LISTING_CHARS):
+            row = post(row)
+        return row
+
+
+def _is_blank(node):
+    return isinstance(node, nodes.Output) and all(
+        isinstance(child, nodes.TemplateData) and not child.data.strip() for child in node.nodes)
+
+
+def _sentinel(index):
+    return f'{SENTINEL_OPEN}{index}{SENTINEL_CLOSE}'
+
+
+# 骨架：字面内容和字段序号交替的列表
+def _split(row):
+    parts = SENTINEL.split(row)
+    for i in range(1, len(parts), 2):
+        parts[i] = int(parts[i])
+    return parts
+
+
+##########################################################
+# 模板渲染过程中各表格的行：
+# 渲染时调用 emit(序号) 生成行并返回标记；解析文档后 insert(tree) 将各行插入标记所在的位置
+##########################################################
+class FastRows:
+    def __init__(self, writers, context, post=None):
+        self.writers = writers  # [LoopWriter]
+        self.context = context
+        self.post = post
+        self.rows = {}
+        self.count = 0
+
+    def emit(self, index):
+        writer = self.writers[index]
+        tables = self.context.get(writer.name) or []
+        self.rows[index] = list(writer.rows(tables, self.post))
+        self.count += len(self.rows[index])
+        return Markup(f'<!--{MARKER}{index}-->')
+
+    def insert(self, tree):
+        parser = etree.XMLParser(recover=True)  # 与 docxtpl 的 fix_tables 相同
+        for comment in list(tree.iter(etree.Comment)):
+            if not (comment.text or '').startswith(MARKER):
+                continue
+            rows = self.rows.pop(int(comment.text[len(MARKER):]), [])
+            parent = comment.getparent()
+            namespaces = ' '.join(f'xmlns:{prefix}="{uri}"' if prefix else f'xmlns="{uri}"'
+                                  for prefix, uri in parent.nsmap.items())
+            for i in range(0, len(rows), CHUNK_ROWS):
+                chunk = etree.fromstring(f'<w:tbl {namespaces}>{"".join(rows[i:i + CHUNK_ROWS])}</w:tbl>', parser)
+                for row in list(chunk):
+                    comment.addprevious(row)
+            if comment.tail:
+                previous = comment.getprevious()
+                if previous is not None:
+                    previous.tail = (previous.tail or '') + comment.tail
+                else:
+                    parent.text = (parent.text or '') + comment.tail
+            parent.remove(comment)
@@ -0,0 +1,203 @@
+import os
+import hashlib
+import logging
+import threading
+from pathlib import Path
+import docxtpl
+from docxtpl import DocxTemplate
+from jinja2 import Environment, FileSystemBytecodeCache
+from table_writer import FAST_ROWS, FastRows, LoopWriter, UnsupportedLoop, find_loop
+
+########################################
+# Word模板的编译缓存：
+# docxtpl 每次渲染都要对模板中的每个部分（正文、页眉、页脚等）做XML预处理（patch_xml，大量正则替换），
+# 再由Jinja从头编译，而 templates 目录下的模板在两次生成之间不会变化。
+# 1、预处理后的XML按原始XML的哈希缓存在内存和磁盘中；
+# 2、Jinja模板按预处理后XML的哈希缓存：内存中保存编译好的 Template，磁盘上使用Jinja的字节码缓存；
+# 3、模板修改后哈希随之变化，自动重新编译；docxtpl、Jinja版本变化时缓存也会失效；
+# 4、指定的大表格循环（fast_loops）不经过Jinja逐行渲染，见 table_writer.py，LoopWriter 按循环的内容缓存在内存中。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+
+# 缓存目录：Windows 上为 %LOCALAPPDATA%\ReportWorker\cache\<name>，其他系统为 ~/.cache/ReportWorker/cache/<name>
+# （打包为exe后程序目录是临时目录，不能保存缓存）
+def default_cache_dir(name='templates'):
+    base = os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base, 'ReportWorker', 'cache', name)
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class TemplateCache:
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            bytecode_cache = FileSystemBytecodeCache(str(self.cache_dir))
+        except OSError as e:
+            log_show.debug(f"模板缓存目录不可用，只使用内存缓存：{e}")
+            self.cache_dir = None
+            bytecode_cache = None
+        # 是否转义（autoescape）会影响编译结果，分别使用不同的环境
+        self.envs = {autoescape: CachingEnvironment(self, autoescape=autoescape, bytecode_cache=bytecode_cache)
+                     for autoescape in (True, False)}
+        self._patched = {}  # 原始XML的哈希 -> 预处理后的XML
+        self._templates = {}  # (autoescape, 预处理后XML的哈希) -> Template
+        self._writers = {}  # (autoescape, 循环的哈希) -> LoopWriter，不支持的循环为 None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # 预处理后的XML，按原始XML的哈希缓存
+    def patch_xml(self, src_xml, patch):
+        key = text_hash(f"{docxtpl.__version__}\n{src_xml}")
+        with self._lock:
+            if key in self._patched:
+                self.hits += 1
+                return self._patched[key]
+        file = self.cache_dir / f'{key}.xml' if self.cache_dir else None
+        if file and file.exists():
+            xml = file.read_text(encoding='utf-8')
+            self.hits += 1
+        else:
+            xml = patch(src_xml)
+            self.misses += 1
+            if file:
+                try:
+                    tmp = file.with_name(file.name + f'.{os.getpid()}.tmp')
+                    tmp.write_text(xml, encoding='utf-8')
+                    tmp.replace(file)
+                except OSError:
+                    pass
+        with self._lock:
+            self._patched[key] = xml
+        return xml
+
+    # 编译好的Jinja模板：内存中没有时，先尝试磁盘上的字节码缓存，最后才重新编译
+    def get_template(self, env, source):
+        key = (env.autoescape, text_hash(source))
+        with self._lock:
+            template = self._templates.get(key)
+        if template is not None:
+            self.hits += 1
+            return template
+        name = f'{key[0]}-{key[1]}'
+        bucket = env.bytecode_cache.get_bucket(env, name, None, source) if env.bytecode_cache else None
+        if bucket is not None and bucket.code is not None:
+            code = bucket.code
+            self.hits += 1
+        else:
+            code = env.compile(source)
+            self.misses += 1
+            if bucket is not None:
+                bucket.code = code
+                try:
+                    env.bytecode_cache.set_bucket(bucket)
+                except OSError:
+                    pass
+        template = env.template_class.from_code(env, code, env.make_globals(None))
+        with self._lock:
+            self._templates[key] = template
+        return template
+
+
+    # 表格循环的快速生成器，循环不符合要求时返回 None
+    def loop_writer(self, env, name, source):
+        key = (env.autoescape, text_hash(source))
+        with self._lock:
+            if key in self._writers:
+                return self._writers[key]
+        try:
+            writer = LoopWriter(env, name, source)
+        except UnsupportedLoop as e:
+            log_show.debug(f"“{name}”表格使用Jinja渲染：{e}")
+            writer = None
+        with self._lock:
+            self._writers[key] = writer
+        return writer
+
+
+# from_string 使用缓存的Jinja环境（docxtpl 渲染每个部分时都调用 jinja_env.from_string）
+class CachingEnvironment(Environment):
+    def __init__(self, cache, **options):
+        super().__init__(**options)
+        self.template_cache = cache
+
+    def from_string(self, source, globals=None, template_class=None):
+        if globals or template_class:
+            return super().from_string(source, globals, template_class)
+        return self.template_cache.get_template(self, source)
+
+
+##########################################################
+# 使用编译缓存的 DocxTemplate：用法与 DocxTemplate 相同
+# fast_loops：快速生成的表格循环的名称（如 ['tbl_result']），渲染后 fast_rows_written 为快速生成的行数
+##########################################################
+class CachedDocxTemplate(DocxTemplate):
+    def __init__(self, template_file, cache=None, fast_loops=()):
+        super().__init__(template_file)
+        self.template_cache = cache or get_template_cache()
+        self.fast_loops = tuple(fast_loops)
+        self.fast_rows = None
+        self.fast_rows_written = 0
+
+    def patch_xml(self, src_xml):
+        return self.template_cache.patch_xml(src_xml, super().patch_xml)
+
+    # 正文：快速生成的表格循环替换为对 FastRows.emit 的调用，其余部分仍由Jinja渲染
+    def build_xml(self, context, jinja_env=None):
+        self.fast_rows = None
+        self.fast_rows_written = 0
+        if not self.fast_loops or jinja_env is None:
+            return super().build_xml(context, jinja_env)
+        xml = self.patch_xml(self.get_xml())
+        writers = []
+        for name in self.fast_loops:
+            span = find_loop(xml, name)
+            if span is None:
+                continue
+            writer = self.template_cache.loop_writer(jinja_env, name, xml[span[0]:span[1]])
+            if writer is None:
+                continue
+            try:
+                writer.prepare(writer.types(context.get(name) or []))
+            except UnsupportedLoop as e:
+                log_show.debug(f"“{name}”表格使用Jinja渲染：{e}")
+                continue
+            xml = f"{xml[:span[0]]}{{{{ {FAST_ROWS}({len(writers)}) }}}}{xml[span[1]:]}"
+            writers.append(writer)
+        if writers:
+            self.fast_rows = FastRows(writers, context, self.resolve_listing)
+            context = dict(context, **{FAST_ROWS: self.fast_rows.emit})
+        return self.render_xml_part(xml, self.docx._part, context, jinja_env)
+
+    # 解析正文后插入快速生成的行
+    def fix_tables(self, xml):
+        tree = super().fix_tables(xml)
+        if self.fast_rows:
+            self.fast_rows.insert(tree)
+            self.fast_rows_written = self.fast_rows.count
+            self.fast_rows = None
+        return tree
+
+    def render(self, context, jinja_env=None, autoescape=False):
+        if jinja_env is None:
+            jinja_env = self.template_cache.envs[bool(autoescape)]
+        super().render(context, jinja_env, autoescape)
+
+
+# 进程内共用一个模板缓存
+_template_cache = None
+_template_cache_lock = threading.Lock()
+
+
+def get_template_cache():
+    global _template_cache
+    with _template_cache_lock:
+        if _template_cache is None:
+            _template_cache = TemplateCache()
+        return _template_cache
@@ -0,0 +1,160 @@
+import os
+import time
+import zipfile
+import logging
+import threading
+from pathlib import Path
+from collections import namedtuple
+
+########################################
+# 监视模式：监视原始记录（xlsm）及其所在目录下的 images、data 文件夹，文件修改后自动重新生成
+# 1、定时比较文件的修改时间和大小（只使用标准库，网络共享目录上也可以使用，GUI进程中不导入生成文档的模块）；
+# 2、忽略Excel打开文件时产生的 ~$ 临时文件、保存时产生的临时文件（.tmp、没有后缀的文件）等；
+# 3、防抖：Excel保存时会先写临时文件、再删除和重命名，检测到变化后，等到 DEBOUNCE 秒内不再变化、
+#    且原始记录存在并且是完整的xlsm（zip）文件时，才通知重新生成；
+# 4、生成过程中原始记录会被重命名，生成结束后调用 retarget 改为监视新的文件；
+#    生成期间的修改不会丢失（与生成开始前的状态比较）；
+# 5、重新生成时只执行受影响的部分，见 report_worker.ReuseState。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+WATCH_DIRS = ('images', 'data')
+# 文件不再变化多少秒后重新生成，以及检查的间隔（秒）
+DEBOUNCE = 1.5
+POLL_INTERVAL = 0.5
+IGNORED_NAMES = ('thumbs.db', 'desktop.ini', '.ds_store')
+IGNORED_SUFFIXES = ('.tmp', '.temp', '.bak', '.crdownload', '.part')
+
+# 一次修改：xlsm 为原始记录是否修改，images、data 为各文件夹中修改（包括新增、删除）的文件
+Change = namedtuple("Change", "xlsm, images, data")
+
+
+# 临时文件等不需要监视的文件
+def ignored(name):
+    lower = name.lower()
+    return (name.startswith(('~', '.')) or lower in IGNORED_NAMES or lower.endswith(IGNORED_SUFFIXES)
+            or not Path(name).suffix)
+
+
+def _state(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+# 原始记录存在，且是完整的xlsm（zip）文件
+def _complete(file):
+    try:
+        return zipfile.is_zipfile(file)
+    except OSError:
+        return False
+
+
+# 修改内容的说明，例如：“原始记录、images 文件夹中的 2 个文件”
+def describe(change):
+    parts = ['原始记录'] if change.xlsm else []
+    for name in WATCH_DIRS:
+        files = getattr(change, name)
+        if files:
+            parts.append(f"{name} 文件夹中的 {len(files)} 个文件")
+    return '、'.join(parts)
+
+
+##########################################################
+# 监视一个原始记录：
+# watcher = RecordWatcher(xlsm_file)
+# change = watcher.wait()            阻塞直到有修改（命令行）；watcher.poll() 为不阻塞的检查
+# watcher.start(callback)            在后台线程中检查，有修改时调用 callback(change)（GUI）；watcher.stop() 停止
+# watcher.retarget(new_file)         原始记录被重命名后改为监视新的文件
+##########################################################
+class RecordWatcher:
+    def __init__(self, xlsm_file, debounce=DEBOUNCE, interval=POLL_INTERVAL):
+        self.xlsm_file = Path(xlsm_file)
+        self.debounce = debounce
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._pending = None  # 检测到变化后最近一次的快照，及其开始的时间
+        self._pending_since = 0.0
+        self._thread = None
+        self._stop_event = threading.Event()
+        self.baseline = self.snapshot()
+
+    # 所有监视文件的状态：{文件: (修改时间, 大小)}，原始记录不存在时为 None
+    def snapshot(self):
+        files = {str(self.xlsm_file): _state(self.xlsm_file)}
+        for name in WATCH_DIRS:
+            for root, dirs, names in os.walk(self.xlsm_file.parent / name):
+                dirs[:] = [d for d in dirs if not d.startswith(('~', '.'))]
+                for file in names:
+                    if not ignored(file):
+                        path = os.path.join(root, file)
+                        files[path] = _state(path)
+        return files
+
+    # 原始记录被重命名为 xlsm_file（生成过程中的重命名不算修改）
+    def retarget(self, xlsm_file):
+        xlsm_file = Path(xlsm_file)
+        with self._lock:
+            if xlsm_file != self.xlsm_file:
+                self.baseline[str(xlsm_file)] = self.baseline.pop(str(self.xlsm_file), None)
+                self.xlsm_file = xlsm_file
+                self._pending = None
+
+    # 以当前状态为基准（之前的修改不再通知）
+    def reset(self):
+        with self._lock:
+            self.baseline = self.snapshot()
+            self._pending = None
+
+    # 检查一次：有修改且已稳定时返回 Change，否则返回 None
+    def poll(self):
+        with self._lock:
+            current = self.snapshot()
+            now = time.monotonic()
+            if current == self.baseline:
+                self._pending = None
+                return None
+            if current != self._pending:
+                self._pending, self._pending_since = current, now
+                return None
+            if now - self._pending_since < self.debounce or not _complete(self.xlsm_file):
+                return None  # 仍在保存，或者原始记录暂时不存在（Excel保存过程中）
+            changed = {path for path in current.keys() | self.baseline.keys()
+                       if current.get(path) != self.baseline.get(path)}
+            self.baseline, self._pending = current, None
+        folders = {name: str(self.xlsm_file.parent / name) + os.sep for name in WATCH_DIRS}
+        return Change(xlsm=str(self.xlsm_file) in changed,
+                      **{name: sorted(p for p in changed if p.startswith(folder)) for name, folder in folders.items()})
+
+    def wait(self):
+        while True:
+            change = self.poll()
+            if change:
+                return change
+            time.sleep(self.interval)
+
+    def start(self, callback):
+        self.stop()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(callback, self._stop_event),
+                                        name='RecordWatcher', daemon=True)
+        self._thread.start()
+
+    def _run(self, callback, stop_event):
+        while not stop_event.wait(self.interval):
+            try:
+                change = self.poll()
+            except Exception as e:  # 网络共享目录暂时无法访问等
+                log_show.debug(f"检查文件修改失败：{e}")
+                continue
+            if change:
+                callback(change)
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
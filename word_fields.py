@@ -0,0 +1,566 @@
+import re
+import sys
+import time
+import copy
+import atexit
+import logging
+import threading
+from queue import Queue
+from collections import Counter
+from concurrent.futures import Future
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls, qn
+from docx.opc.part import XmlPart
+
+try:
+    import pythoncom
+    import win32com.client as win32
+except ImportError:  # 非Windows环境（或未安装pywin32）时，无法使用Word更新域
+    pythoncom = None
+    win32 = None
+
+########################################
+# 更新Word文档域的后端
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+# Word 打开文档后，等待文档就绪的最长时间（秒）和轮询间隔
+WORD_READY_TIMEOUT = 30
+WORD_POLL_INTERVAL = 0.05
+
+
+##########################################################
+# 更新域后端的接口：
+# prepare(doc)：docx写入磁盘之前，在内存中的文档对象上执行
+# update(docx_file)：docx写入磁盘之后执行，返回True表示已完成更新
+##########################################################
+class FieldBackend:
+    name = ''
+
+    def prepare(self, doc):
+        pass
+
+    def update(self, docx_file):
+        return True
+
+    def close(self):
+        pass
+
+
+##########################################################
+# 不更新域：用于在Linux上测试及性能测试，记录调用过的文档
+##########################################################
+class NullFieldBackend(FieldBackend):
+    name = 'none'
+
+    def __init__(self):
+        self.prepared = 0
+        self.updated = []
+
+    def prepare(self, doc):
+        self.prepared += 1
+
+    def update(self, docx_file):
+        self.updated.append(str(docx_file))
+        log_show.debug(f"未更新Word文档域（{self.name}）：{docx_file}")
+        return True
+
+
+##########################################################
+# 标记所有的域需要更新，由Word在打开文档时更新：
+# 1、settings.xml 中加入 <w:updateFields w:val="true"/>，Word打开文档时会提示更新域；
+# 2、所有复杂域的开始标记 <w:fldChar w:fldCharType="begin"/> 加上 w:dirty="true"。
+# 不需要在本机启动Word，适合没有安装Word的电脑或者命令行批量生成
+##########################################################
+class DirtyFieldBackend(FieldBackend):
+    name = 'dirty'
+
+    def prepare(self, doc):
+        settings_xml = doc.part.settings._element
+        update_fields = settings_xml.find(qn('w:updateFields'))
+        if update_fields is None:
+            settings_xml.append(parse_xml(f'<w:updateFields {nsdecls("w")} w:val="true"/>'))
+        else:
+            update_fields.set(qn('w:val'), 'true')
+
+        count = 0
+        for part in iter_story_parts(doc):
+            for fld_char in part.element.iter(qn('w:fldChar')):
+                if fld_char.get(qn('w:fldCharType')) == 'begin':
+                    fld_char.set(qn('w:dirty'), 'true')
+                    count += 1
+            for fld_simple in part.element.iter(qn('w:fldSimple')):
+                fld_simple.set(qn('w:dirty'), 'true')
+                count += 1
+        log_show.debug(f"已将 {count} 个域标记为需要更新")
+
+    def update(self, docx_file):
+        log_show.info("已标记文档中的域，Word打开文档时将自动更新")
+        return True
+
+
+# 文档中包含域的部分：正文、页眉、页脚、脚注、尾注（python-docx 未解析的部分会被跳过）
+def iter_story_parts(doc):
+    main = doc.part
+    yield main
+    for rel in main.rels.values():
+        if rel.is_external:
+            continue
+        if rel.reltype.split('/')[-1] in ('header', 'footer', 'footnotes', 'endnotes') \
+                and isinstance(rel.target_part, XmlPart):
+            yield rel.target_part
+
+
+##########################################################
+# 在Python中直接计算与分页无关的域，只有仍然存在依赖分页的域时才需要调用Word：
+# 1、SEQ（题注编号）、DOCPROPERTY（文档属性）、REF（书签内容）、SET（书签赋值）直接计算并写入域结果；
+# 2、PAGE、NUMPAGES、SECTIONPAGES、PAGEREF、TOC 依赖分页，只能由Word更新；
+#    其中页眉页脚中的页码类域在Word分页显示时会自动更新，不需要调用Word；
+# 3、无法识别的域（或包含嵌套域、不支持的格式开关）保守处理，同样交给Word更新。
+##########################################################
+W_FLDCHAR = qn('w:fldChar')
+W_FLDSIMPLE = qn('w:fldSimple')
+W_INSTRTEXT = qn('w:instrText')
+W_T = qn('w:t')
+W_BOOKMARK_START = qn('w:bookmarkStart')
+W_BOOKMARK_END = qn('w:bookmarkEnd')
+
+# 依赖分页结果的域
+LAYOUT_FIELDS = {'PAGE', 'NUMPAGES', 'SECTIONPAGES', 'PAGEREF', 'TOC'}
+# 页眉页脚中Word分页时会自动更新的域
+HEADER_AUTO_FIELDS = {'PAGE', 'NUMPAGES', 'SECTIONPAGES', 'PAGEREF'}
+# 带参数的开关
+SWITCHES_WITH_ARG = {'\\*', '\\#', '\\@', '\\r', '\\s', '\\b', '\\f', '\\d', '\\l', '\\o', '\\t'}
+# DOCPROPERTY 属性名与 python-docx 核心属性的对应关系
+DOC_PROPERTIES = {
+    'TITLE': 'title', 'SUBJECT': 'subject', 'AUTHOR': 'author', 'KEYWORDS': 'keywords',
+    'COMMENTS': 'comments', 'CATEGORY': 'category', 'LASTSAVEDBY': 'last_modified_by',
+}
+
+
+class Field:
+    def __init__(self, part_type, begin=None, simple=None, bookmarks=()):
+        self.part_type = part_type  # document / header / footer / footnotes / endnotes
+        self.begin = begin  # 复杂域的 <w:fldChar w:fldCharType="begin"/>
+        self.separate = None
+        self.end = None
+        self.simple = simple  # 简单域 <w:fldSimple>
+        self.code = [] if simple is None else [simple.get(qn('w:instr')) or '']
+        self.result = []  # 域结果中的 <w:t>
+        self.parent = None
+        self.children = []  # 嵌套的域
+        self.bookmarks = list(bookmarks)  # 域所在的书签
+        self.status = None  # computed / auto / inert / word
+
+    @property
+    def instr(self):
+        return ''.join(self.code).strip()
+
+    # 域代码拆分为：域类型、参数、开关
+    def parse(self):
+        tokens = [t[1:-1] if len(t) > 1 and t.startswith('"') and t.endswith('"') else t
+                  for t in re.findall(r'"[^"]*"|\S+', self.instr)]
+        if not tokens:
+            return '', [], []
+        args, switches = [], []
+        i = 1
+        while i < len(tokens):
+            token = tokens[i]
+            if token.startswith('\\'):
+                name, arg = token[:2], token[2:]
+                if not arg and name in SWITCHES_WITH_ARG and i + 1 < len(tokens):
+                    i += 1
+                    arg = tokens[i]
+                switches.append((name, arg))
+            else:
+                args.append(token)
+            i += 1
+        return tokens[0].upper(), args, switches
+
+    # 写入域结果：保留第一个结果文本的格式，其余结果文本清空
+    def set_result(self, text):
+        if self.result:
+            self.result[0].text = text
+            self.result[0].set('{http://www.w3.org/XML/1998/namespace}space', 'preserve')
+            for t in self.result[1:]:
+                t.text = ''
+            return
+        run = parse_xml(f'<w:r {nsdecls("w")}><w:t xml:space="preserve"></w:t></w:r>')
+        run[0].text = text
+        if self.simple is not None:
+            self.simple.append(run)
+            return
+        begin_run = self.begin.getparent()
+        rpr = begin_run.find(qn('w:rPr'))
+        if rpr is not None:
+            run.insert(0, copy.deepcopy(rpr))
+        if self.separate is None:
+            separate_run = parse_xml(f'<w:r {nsdecls("w")}><w:fldChar w:fldCharType="separate"/></w:r>')
+            self.end.getparent().addprevious(separate_run)
+            self.separate = separate_run[0]
+        self.separate.getparent().addnext(run)
+
+
+class FieldEvaluator:
+    def __init__(self, doc):
+        self.doc = doc
+        self.fields = []
+        self.bookmarks = {}  # 书签名称 -> 书签内容中的 <w:t>
+        self.bookmark_fields = {}  # 书签名称 -> 书签内容中的域
+        self.values = {}  # SET 域设置的书签值
+        self.sequences = Counter()
+        self.computed = Counter()
+        self.remaining = Counter()
+
+    # 是否还有需要Word更新的域
+    @property
+    def needs_word(self):
+        return bool(self.remaining)
+
+    def evaluate(self):
+        for part in iter_story_parts(self.doc):
+            self._scan(part)
+
+        referenced = {args[0] for kind, args, _ in (f.parse() for f in self.fields)
+                      if kind in ('REF', 'PAGEREF') and args}
+        refs = []
+        for field in self.fields:
+            kind, args, switches = field.parse()
+            if field.parent is not None and field.parent.status == 'inert':
+                field.status = 'inert'
+            elif field.children:
+                # SET 的值使用了嵌套域（如 SET l6 { PAGE }），但书签没有被引用时，不影响文档内容
+                if kind == 'SET' and args and args[0] not in referenced:
+                    field.status = 'inert'
+                else:
+                    field.status = 'word'
+            elif kind in LAYOUT_FIELDS:
+                field.status = 'auto' if field.part_type in ('header', 'footer') \
+                    and kind in HEADER_AUTO_FIELDS else 'word'
+            elif kind == 'REF':
+                refs.append((field, args, switches))
+                continue
+            else:
+                value = self._compute(field, kind, args, switches)
+                field.status = 'word' if value is None else 'computed'
+                if value is not None and kind != 'SET':
+                    field.set_result(value)
+            self._count(field, kind)
+
+        # REF 在其他域计算完成后再计算，书签内容中的域结果已经是最新的
+        for field, args, switches in refs:
+            value = self._ref(args, switches)
+            field.status = 'word' if value is None else 'computed'
+            if value is not None:
+                field.set_result(value)
+            self._count(field, 'REF')
+        return self
+
+    def _count(self, field, kind):
+        if field.status == 'computed':
+            self.computed[kind] += 1
+        elif field.status == 'word':
+            self.remaining[kind or '?'] += 1
+
+    def summary(self):
+        computed = '、'.join(f'{k}×{v}' for k, v in self.computed.items()) or '无'
+        remaining = '、'.join(f'{k}×{v}' for k, v in self.remaining.items()) or '无'
+        return f"已在本地计算的域：{computed}；需要Word更新的域：{remaining}"
+
+    # 按文档顺序扫描一个部分中的域和书签
+    def _scan(self, part):
+        part_type = 'document' if part is self.doc.part else re.sub(r'\d*\.xml$', '', part.partname.split('/')[-1])
+        stack = []
+        open_bookmarks = {}  # 书签 id -> 名称
+        for el in part.element.iter(W_FLDCHAR, W_FLDSIMPLE, W_INSTRTEXT, W_T, W_BOOKMARK_START, W_BOOKMARK_END):
+            tag = el.tag
+            if tag == W_FLDCHAR:
+                fld_type = el.get(qn('w:fldCharType'))
+                if fld_type == 'begin':
+                    field = Field(part_type, begin=el, bookmarks=open_bookmarks.values())
+                    self._add_field(field, stack)
+                    stack.append(field)
+                elif fld_type == 'separate' and stack:
+                    stack[-1].separate = el
+                elif fld_type == 'end' and stack:
+                    stack.pop().end = el
+            elif tag == W_INSTRTEXT:
+                if stack and stack[-1].separate is None:
+                    stack[-1].code.append(el.text or '')
+            elif tag == W_T:
+                for name in open_bookmarks.values():
+                    self.bookmarks[name].append(el)
+                if stack and stack[-1].separate is not None:
+                    stack[-1].result.append(el)
+            elif tag == W_FLDSIMPLE:
+                field = Field(part_type, simple=el, bookmarks=open_bookmarks.values())
+                field.result = list(el.iter(W_T))
+                self._add_field(field, stack)
+            elif tag == W_BOOKMARK_START:
+                name = el.get(qn('w:name'))
+                open_bookmarks[el.get(qn('w:id'))] = name
+                self.bookmarks.setdefault(name, [])
+                self.bookmark_fields.setdefault(name, [])
+            elif tag == W_BOOKMARK_END:
+                open_bookmarks.pop(el.get(qn('w:id')), None)
+
+    def _add_field(self, field, stack):
+        if stack:
+            field.parent = stack[-1]
+            stack[-1].children.append(field)
+        for name in field.bookmarks:
+            self.bookmark_fields[name].append(field)
+        self.fields.append(field)
+
+    def _compute(self, field, kind, args, switches):
+        if kind == 'SET':
+            if not args:
+                return None
+            self.values[args[0]] = ' '.join(args[1:])
+            return ''
+        if kind == 'SEQ':
+            return self._seq(field, args, switches)
+        if kind == 'DOCPROPERTY':
+            if not args or args[0].upper() not in DOC_PROPERTIES:
+                return None
+            value = getattr(self.doc.core_properties, DOC_PROPERTIES[args[0].upper()]) or ''
+            return format_text(str(value), switches)
+        return None
+
+    # SEQ 编号：按文档顺序计数，支持 \c（重复上一编号）、\n（下一编号）、\r（重置为指定值）、\h（隐藏）
+    def _seq(self, field, args, switches):
+        if not args or field.part_type != 'document':
+            return None
+        name = args[0]
+        hidden = False
+        number = self.sequences[name] + 1
+        for switch, arg in switches:
+            if switch == '\\c':
+                number = self.sequences[name]
+            elif switch == '\\r':
+                if not arg.isdigit():
+                    return None
+                number = int(arg)
+            elif switch == '\\h':
+                hidden = True
+            elif switch not in ('\\n', '\\*'):
+                return None  # \s（按标题级别重新编号）等需要Word处理
+        self.sequences[name] = number
+        if hidden:
+            return ''
+        return format_number(number, switches)
+
+    # REF 书签内容：书签中包含无法在本地计算的域时，交给Word处理
+    def _ref(self, args, switches):
+        if not args:
+            return None
+        name = args[0]
+        if any(switch not in ('\\h', '\\*') for switch, _ in switches):
+            return None  # \n、\r、\w（段落编号）、\p（相对位置）等需要Word处理
+        if name in self.values:
+            return format_text(self.values[name], switches)
+        if name not in self.bookmarks:
+            return None
+        if any(f.status not in ('computed', 'inert') for f in self.bookmark_fields[name]):
+            return None
+        return format_text(''.join(t.text or '' for t in self.bookmarks[name]), switches)
+
+
+# 域结果的通用格式开关 \*：只处理常用的大小写和数字格式，其他格式返回None（交给Word处理）
+def format_text(text, switches):
+    for switch, arg in switches:
+        if switch != '\\*':
+            continue
+        arg = arg.upper()
+        if arg in ('MERGEFORMAT', 'CHARFORMAT'):
+            continue
+        elif arg == 'UPPER':
+            text = text.upper()
+        elif arg == 'LOWER':
+            text = text.lower()
+        elif arg == 'FIRSTCAP':
+            text = text[:1].upper() + text[1:]
+        elif arg == 'CAPS':
+            text = ' '.join(w[:1].upper() + w[1:] for w in text.split(' '))
+        else:
+            return None
+    return text
+
+
+def format_number(number, switches):
+    text = str(number)
+    for switch, arg in switches:
+        if switch != '\\*' or arg.upper() in ('MERGEFORMAT', 'CHARFORMAT', 'ARABIC'):
+            continue
+        if arg.upper() == 'ALPHABETIC' and number > 0:
+            # Word 的字母编号：a…z, aa…zz, aaa…
+            text = chr(ord('a') + (number - 1) % 26) * ((number - 1) // 26 + 1)
+        elif arg.upper() == 'ROMAN' and number > 0:
+            text = to_roman(number).lower()
+        else:
+            return None
+        if arg[0].isupper():
+            text = text.upper()
+    return text
+
+
+def to_roman(number):
+    numerals = [(1000, 'm'), (900, 'cm'), (500, 'd'), (400, 'cd'), (100, 'c'), (90, 'xc'),
+                (50, 'l'), (40, 'xl'), (10, 'x'), (9, 'ix'), (5, 'v'), (4, 'iv'), (1, 'i')]
+    result = ''
+    for value, numeral in numerals:
+        count, number = divmod(number, value)
+        result += numeral * count
+    return result
+
+
+##########################################################
+# 长期运行的Word会话：
+# 1、Word.Application 只启动一次，多个文档、多个任务共用，进程退出时才关闭；
+# 2、所有COM调用都在同一个专用线程中串行执行（COM对象不能跨线程使用）；
+# 3、打开文档后轮询文档是否就绪，代替固定的 time.sleep(2)。
+##########################################################
+class WordSessionBackend(FieldBackend):
+    name = 'word'
+
+    def __init__(self, timeout=WORD_READY_TIMEOUT):
+        self.timeout = timeout
+        self.word = None
+        self.documents = 0
+        self._queue = Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    # 在COM线程中执行 func，并等待返回结果
+    def _call(self, func, *args):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='WordSession', daemon=True)
+                self._thread.start()
+        future = Future()
+        self._queue.put((future, func, args))
+        return future.result()
+
+    def _worker(self):
+        pythoncom.CoInitialize()
+        try:
+            while True:
+                future, func, args = self._queue.get()
+                if func is None:
+                    future.set_result(None)
+                    break
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            self._quit_word()
+            pythoncom.CoUninitialize()
+
+    def _get_word(self):
+        if self.word is not None:
+            try:
+                self.word.Documents.Count  # Word 已被关闭或崩溃时会抛出异常
+                return self.word
+            except Exception:
+                log_show.warning("Word会话已失效，重新启动Word")
+                self.word = None
+        start = time.perf_counter()
+        # 使用独立的Word进程，不影响用户已经打开的Word文档
+        self.word = win32.DispatchEx("Word.Application")
+        self.word.Visible = False  # 隐藏Word窗口
+        self.word.DisplayAlerts = False  # 禁用所有警告对话框
+        log_show.debug(f"已启动Word，耗时 {time.perf_counter() - start:.1f} 秒")
+        return self.word
+
+    def _quit_word(self):
+        if self.word is not None:
+            try:
+                self.word.Quit()
+            except Exception:
+                pass
+            self.word = None
+
+    # 轮询文档是否已经打开完成，Word 忙时访问文档对象会抛出异常（如 RPC_E_CALL_REJECTED）
+    def _wait_ready(self, doc):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                doc.Content.End
+                doc.Fields.Count
+                return
+            except Exception:
+                if time.monotonic() > deadline:
+                    raise TimeoutError(f"等待Word打开文档超时（{self.timeout} 秒）")
+                time.sleep(WORD_POLL_INTERVAL)
+
+    def _update(self, docx_file):
+        word = self._get_word()
+        doc = word.Documents.Open(str(docx_file), False, False, False)  # ConfirmConversions, ReadOnly, AddToRecentFiles
+        try:
+            self._wait_ready(doc)
+            # 原始记录保存前已经打开了修订模式，更新域时需要暂时关闭，否则域的更新会被记录为修订
+            track_revisions = doc.TrackRevisions
+            doc.TrackRevisions = False
+            # 依次更新正文、页眉页脚、脚注等所有部分中的域（每个域只更新一次）
+            for story in doc.StoryRanges:
+                while story is not None:
+                    story.Fields.Update()
+                    story = story.NextStoryRange
+            doc.TrackRevisions = track_revisions
+            doc.Save()
+        finally:
+            doc.Close(False)
+        self.documents += 1
+
+    def update(self, docx_file):
+        if win32 is None:
+            log_show.warning("Word文档域更新操作失败: 未安装pywin32，无法调用Word")
+            return False
+        start = time.perf_counter()
+        try:
+            self._call(self._update, docx_file)
+        except Exception as e:
+            log_show.warning(f"Word文档域更新操作失败: {e}")
+            return False
+        log_show.info(f"Word文档域更新完成（耗时 {time.perf_counter() - start:.1f} 秒）")
+        return True
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._call(None)
+        self._thread = None
+
+
+# 各后端在进程内只创建一个，多个任务共用（Word会话在进程退出时关闭）
+FIELD_BACKENDS = {
+    'word': WordSessionBackend,
+    'dirty': DirtyFieldBackend,
+    'none': NullFieldBackend,
+}
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+# 获取更新域的后端：name 为空时，Windows上安装了pywin32时使用Word会话，否则标记域由Word打开时更新
+def get_field_backend(name=None):
+    if not name:
+        name = 'word' if win32 is not None and sys.platform == 'win32' else 'dirty'
+    if name not in FIELD_BACKENDS:
+        raise ValueError(f"不支持的更新域方式：{name}，可选：{'、'.join(FIELD_BACKENDS)}")
+    with _backends_lock:
+        if name not in _backends:
+            _backends[name] = FIELD_BACKENDS[name]()
+        return _backends[name]
+
+
+@atexit.register
+def close_field_backends():
+    with _backends_lock:
+        for backend in _backends.values():
+            try:
+                backend.close()
+            except Exception:
+                pass
+        _backends.clear()
@@ -0,0 +1,372 @@
+import zipfile
+import posixpath
+import logging
+from io import BytesIO
+from collections import namedtuple
+from xml.etree.ElementTree import iterparse, fromstring
+import openpyxl as xl
+from openpyxl.utils.cell import coordinate_to_tuple, range_boundaries
+from openpyxl.utils.datetime import from_excel, from_ISO8601, WINDOWS_EPOCH, CALENDAR_MAC_1904
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.formula.translate import Translator
+
+########################################
+# 读取xlsx/xlsm表格的后端：
+# 1、stream：直接从zip中流式解析sheet页的XML和共享字符串，不创建openpyxl的单元格对象，读到所需区域的最后一行即停止；
+# 2、openpyxl：openpyxl的只读模式，stream 无法处理的表格（数组公式、非标准格式等）使用此后端。
+# 两个后端返回的单元格值相同（数字、字符串、日期、布尔值、公式文本的类型和转换规则与openpyxl一致），
+# read_area 将其转换为与 Report.get_excel_data 相同的格式：非空行的字符串列表，每行最后附加行号。
+# 日志输出到名字为“report”的Logger中
+########################################
+log_show = logging.getLogger("report")
+
+MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+PKG_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+ROW_TAG = f'{{{MAIN_NS}}}row'
+CELL_TAG = f'{{{MAIN_NS}}}c'
+VALUE_TAG = f'{{{MAIN_NS}}}v'
+FORMULA_TAG = f'{{{MAIN_NS}}}f'
+INLINE_STRING = f'{{{MAIN_NS}}}is'
+DIMENSION_TAG = f'{{{MAIN_NS}}}dimension'
+TEXT_TAG = f'{{{MAIN_NS}}}t'
+RUN_TAG = f'{{{MAIN_NS}}}r'
+STRING_TAG = f'{{{MAIN_NS}}}si'
+
+# 读取的区域：起止行、起止列，结束行、结束列为空时使用表格中记录的范围
+Area = namedtuple("Area", "min_row, max_row, min_col, max_col", defaults=(1, None, 1, None))
+
+DEFAULT_BACKEND = 'stream'
+
+
+# stream 后端不能处理的内容，调用方应改用 openpyxl 后端
+class UnsupportedContent(Exception):
+    pass
+
+
+def _cast_number(value):
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+_COLUMNS = {}
+
+
+# 单元格坐标（如 'AB12'）中的列号
+def _column_index(coordinate):
+    letters = coordinate.rstrip('0123456789')
+    column = _COLUMNS.get(letters)
+    if column is None:
+        column = _COLUMNS[letters] = coordinate_to_tuple(coordinate)[1]
+    return column
+
+
+# 与 openpyxl 的 Text.content 相同：<t> 及各个 <r><t> 的文本（不包括注音 <rPh>）
+def _text_content(element):
+    snippets = []
+    plain = element.find(TEXT_TAG)
+    if plain is not None and plain.text is not None:
+        snippets.append(plain.text)
+    for run in element.findall(RUN_TAG):
+        text = run.find(TEXT_TAG)
+        if text is not None and text.text is not None:
+            snippets.append(text.text)
+    return ''.join(snippets)
+
+
+##########################################################
+# 流式读取：source 为文件路径或文件内容（bytes）
+##########################################################
+class StreamingReader:
+    name = 'stream'
+
+    def __init__(self, source):
+        self._source = source
+        self._fallback = None
+        self._zip = zipfile.ZipFile(BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        try:
+            self._read_workbook()
+        except UnsupportedContent:
+            self._zip.close()
+            raise
+        except (KeyError, SyntaxError) as e:
+            self._zip.close()
+            raise UnsupportedContent(f"无法解析工作簿结构：{e}") from e
+        self._strings = None
+        self._date_formats = None
+        self._timedelta_formats = None
+
+    def _rels(self, part):
+        folder, name = posixpath.split(part)
+        rels_part = posixpath.join(folder, '_rels', name + '.rels')
+        rels = {}
+        for rel in fromstring(self._zip.read(rels_part)).iter(f'{{{PKG_REL_NS}}}Relationship'):
+            target = rel.get('Target')
+            if rel.get('TargetMode') == 'External':
+                continue
+            target = target.lstrip('/') if target.startswith('/') else posixpath.normpath(posixpath.join(folder, target))
+            rels[rel.get('Id')] = (rel.get('Type', '').rsplit('/', 1)[-1], target)
+        return rels
+
+    def _read_workbook(self):
+        package = self._rels('')
+        parts = [target for kind, target in package.values() if kind == 'officeDocument']
+        if not parts:
+            raise UnsupportedContent("找不到工作簿")
+        self._workbook_part = parts[0]
+        root = fromstring(self._zip.read(self._workbook_part))
+        if root.tag != f'{{{MAIN_NS}}}workbook':
+            raise UnsupportedContent(f"不支持的工作簿格式：{root.tag}")
+        rels = self._rels(self._workbook_part)
+        pr = root.find(f'{{{MAIN_NS}}}workbookPr')
+        self.epoch = WINDOWS_EPOCH
+        if pr is not None and pr.get('date1904') in ('1', 'true'):
+            self.epoch = CALENDAR_MAC_1904
+
+        self.sheetnames = []
+        self._sheets = {}  # sheet页名称 -> XML部件
+        self._worksheets = []  # 工作表（不包括图表页）的名称，按顺序
+        for sheet in root.iter(f'{{{MAIN_NS}}}sheet'):
+            name = sheet.get('name')
+            self.sheetnames.append(name)
+            kind, target = rels.get(sheet.get(f'{{{REL_NS}}}id'), ('', ''))
+            if kind == 'worksheet':
+                self._sheets[name] = target
+                self._worksheets.append(name)
+        self._rel_parts = {kind: target for kind, target in rels.values()}
+
+    # 共享字符串，第一次使用时读取
+    @property
+    def shared_strings(self):
+        if self._strings is None:
+            self._strings = []
+            part = self._rel_parts.get('sharedStrings')
+            if part and part in self._zip.namelist():
+                with self._zip.open(part) as src:
+                    for _, node in iterparse(src):
+                        if node.tag == STRING_TAG:
+                            self._strings.append(_text_content(node).replace('x005F_', ''))
+                            node.clear()
+        return self._strings
+
+    # 日期和时间间隔格式的单元格样式（与openpyxl的判断规则相同），第一次使用时读取
+    def _load_styles(self):
+        self._date_formats, self._timedelta_formats = set(), set()
+        part = self._rel_parts.get('styles')
+        if not part or part not in self._zip.namelist():
+            return
+        root = fromstring(self._zip.read(part))
+        custom = {int(fmt.get('numFmtId')): fmt.get('formatCode')
+                  for fmt in root.iter(f'{{{MAIN_NS}}}numFmt')}
+        cell_xfs = root.find(f'{{{MAIN_NS}}}cellXfs')
+        if cell_xfs is None:
+            return
+        for idx, xf in enumerate(cell_xfs.findall(f'{{{MAIN_NS}}}xf')):
+            num_fmt = int(xf.get('numFmtId', 0))
+            fmt = custom[num_fmt] if num_fmt in custom else BUILTIN_FORMATS.get(num_fmt)
+            if is_date_format(fmt):
+                self._date_formats.add(idx)
+            if is_timedelta_format(fmt):
+                self._timedelta_formats.add(idx)
+
+    def _sheet_part(self, sheet):
+        if isinstance(sheet, int):  # 传入的sheet是数字，表示的是sheet页的索引Index
+            sheet = self._worksheets[sheet]
+        return self._sheets.get(sheet)
+
+    def has_sheet(self, sheet):
+        if isinstance(sheet, int):
+            return -len(self._worksheets) <= sheet < len(self._worksheets)
+        return sheet in self._sheets
+
+    # 逐行返回 (行号, 单元格值的元组)，规则与 openpyxl 只读模式的 iter_rows(values_only=True) 相同：
+    # 未指定 max_row、max_col 时使用表格中记录的范围（use_dimension=False 时忽略记录的范围，读到数据结束）；
+    # 不存在的单元格为 None，不存在的行不返回
+    def iter_rows(self, sheet, min_row=1, max_row=None, min_col=1, max_col=None, use_dimension=True):
+        part = self._sheet_part(sheet)
+        if part is None:
+            raise KeyError(sheet)
+        if self._date_formats is None:
+            self._load_styles()
+        strings = None
+        shared_formulae = {}
+        row_counter = 0
+        with self._zip.open(part) as src:
+            # 只需要 dimension（在 sheetData 之前）和 row 元素
+            for _, element in iterparse(src):
+                if element.tag == DIMENSION_TAG:
+                    if use_dimension:
+                        _, _, dim_col, dim_row = range_boundaries(element.get('ref'))
+                        max_row = max_row or dim_row
+                        max_col = max_col or dim_col
+                    continue
+                if element.tag != ROW_TAG:
+                    continue
+
+                r = element.get('r')
+                row_counter = int(float(r)) if r else row_counter + 1
+                if max_row is not None and row_counter > max_row:
+                    break
+                if row_counter < min_row:
+                    element.clear()
+                    continue
+
+                cells = []
+                col_counter = 0
+                for c in element:
+                    coordinate = c.get('r')
+                    if coordinate:
+                        col_counter = _column_index(coordinate)
+                    else:
+                        col_counter += 1
+                    if col_counter < min_col or (max_col is not None and col_counter > max_col):
+                        continue
+                    data_type = c.get('t', 'n')
+                    formula = c.find(FORMULA_TAG)
+                    if formula is not None:
+                        value = self._formula(formula, coordinate, shared_formulae)
+                    elif data_type == 'inlineStr':
+                        child = c.find(INLINE_STRING)
+                        value = _text_content(child) if child is not None else None
+                    else:
+                        value = c.findtext(VALUE_TAG, None) or None
+                        if value is not None:
+                            if data_type == 'n':
+                                value = _cast_number(value)
+                                style_id = int(c.get('s', 0))
+                                if style_id in self._date_formats:
+                                    try:
+                                        value = from_excel(value, self.epoch,
+                                                           timedelta=style_id in self._timedelta_formats)
+                                    except (OverflowError, ValueError):
+                                        value = '#VALUE!'
+                            elif data_type == 's':
+                                if strings is None:
+                                    strings = self.shared_strings
+                                value = strings[int(value)]
+                            elif data_type == 'b':
+                                value = bool(int(value))
+                            elif data_type == 'd':
+                                value = from_ISO8601(value)
+                    cells.append((col_counter, value))
+                element.clear()
+
+                width = max_col if max_col is not None else (cells[-1][0] if cells else min_col - 1)
+                values = [None] * (width + 1 - min_col)
+                for column, value in cells:
+                    values[column - min_col] = value
+                yield row_counter, tuple(values)
+
+    # 公式单元格的值为公式文本（openpyxl 默认 data_only=False）；数组公式、模拟运算表由openpyxl处理
+    @staticmethod
+    def _formula(formula, coordinate, shared_formulae):
+        kind = formula.get('t')
+        value = '=' + (formula.text or '')
+        if kind == 'shared':
+            idx = formula.get('si')
+            if idx in shared_formulae:
+                return shared_formulae[idx].translate_formula(coordinate)
+            if value == '=':  # 共享公式的主单元格不在读取的范围内
+                raise UnsupportedContent(f"单元格{coordinate}的共享公式找不到主单元格")
+            shared_formulae[idx] = Translator(value, coordinate)
+        elif kind in ('array', 'dataTable'):
+            raise UnsupportedContent(f"单元格{coordinate}包含数组公式或模拟运算表")
+        return value
+
+    # 读取单个单元格的值，例如：cell('基本信息', 'D34')
+    def cell(self, sheet, coordinate):
+        row, column = coordinate_to_tuple(coordinate)
+        try:
+            for _, values in self.iter_rows(sheet, row, row, column, column):
+                return values[0]
+        except UnsupportedContent as e:
+            log_show.debug(f"使用openpyxl读取“{sheet}”：{e}")
+            return self.fallback().cell(sheet, coordinate)
+        return None
+
+    # 同一表格的openpyxl后端，用于处理本后端不支持的内容
+    def fallback(self):
+        if self._fallback is None:
+            self._fallback = OpenpyxlReader(self._source)
+        return self._fallback
+
+    def close(self):
+        self._zip.close()
+        if self._fallback is not None:
+            self._fallback.close()
+            self._fallback = None
+
+
+##########################################################
+# openpyxl 只读模式，接口与 StreamingReader 相同
+##########################################################
+class OpenpyxlReader:
+    name = 'openpyxl'
+
+    def __init__(self, source):
+        if isinstance(source, (bytes, bytearray)):
+            source = BytesIO(source)
+        self._workbook = xl.load_workbook(source, read_only=True)
+        self.sheetnames = self._workbook.sheetnames
+
+    def _sheet(self, sheet):
+        if isinstance(sheet, int):
+            return self._workbook.worksheets[sheet]
+        return self._workbook[sheet]
+
+    def has_sheet(self, sheet):
+        if isinstance(sheet, int):
+            return -len(self._workbook.worksheets) <= sheet < len(self._workbook.worksheets)
+        return sheet in self.sheetnames
+
+    def iter_rows(self, sheet, min_row=1, max_row=None, min_col=1, max_col=None, use_dimension=True):
+        active_sheet = self._sheet(sheet)
+        if not use_dimension:
+            active_sheet.reset_dimensions()
+        elif not max_row or not max_col:
+            max_row = max_row or active_sheet.max_row
+            max_col = max_col or active_sheet.max_column
+        rows = active_sheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                                      values_only=True)
+        return enumerate(rows, start=min_row)
+
+    def cell(self, sheet, coordinate):
+        return self._sheet(sheet)[coordinate].value
+
+    def close(self):
+        self._workbook.close()
+
+
+READERS = {'stream': StreamingReader, 'openpyxl': OpenpyxlReader}
+
+
+# 打开表格：stream 后端无法打开时改用 openpyxl
+def open_reader(source, backend=DEFAULT_BACKEND):
+    if backend == 'stream':
+        try:
+            return StreamingReader(source)
+        except (UnsupportedContent, zipfile.BadZipFile) as e:
+            log_show.debug(f"使用openpyxl读取表格：{e}")
+    return OpenpyxlReader(source)
+
+
+# 读取区域中的数据，返回非空行的字符串列表，每行最后附加行号；
+# 区域的结束行、结束列为空时使用表格中记录的范围（use_dimension=False 时读到数据结束）
+def read_area(reader, sheet, area, use_dimension=True):
+    try:
+        return _read_area(reader, sheet, area, use_dimension)
+    except UnsupportedContent as e:
+        log_show.debug(f"使用openpyxl读取“{sheet}”：{e}")
+        return _read_area(reader.fallback(), sheet, area, use_dimension)
+
+
+def _read_area(reader, sheet, area, use_dimension):
+    data = []
+    for row_number, row in reader.iter_rows(sheet, area.min_row, area.max_row, area.min_col, area.max_col,
+                                            use_dimension):
+        if any(row):
+            row_data = ['' if i is None else str(i).strip() for i in row]  # 需要考虑单元格为数字0的情况，不能简单归为''
+            row_data.append(row_number)
+            data.append(row_data)
+    return data